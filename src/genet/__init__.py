@@ -8,6 +8,7 @@ from genet.input.read import (
     read_csv,
     read_geojson_network,
     read_gtfs,
+    read_gtfs_feeds,
     read_json,
     read_json_network,
     read_json_schedule,
@@ -88,47 +88,18 @@ def _read_network(
     return network
 
 
-def _cast_catchment(network_spatial_tree, df_stops, distance):
-    return network_spatial_tree.closest_links(
-        gdf_points=df_stops, distance_radius=distance
-    ).dropna()
-
-
 def _find_closest_links_by_step(
     network_spatial_tree, df_stops, step_size=10, distance_threshold=None
 ):
-    def threshold_reached(d):
-        if distance_threshold is not None:
-            return d <= distance_threshold
-        else:
-            return True
-
-    distance = step_size
-    logging.info(f"Processing catchment: {distance}")
-    nodes = _cast_catchment(
-        network_spatial_tree=network_spatial_tree,
-        df_stops=df_stops.loc[:, ["id", "geometry"]].copy(),
-        distance=distance,
+    # catchments grow by step size until each stop has closest links or reached threshold
+    logging.info(
+        f"Processing catchments in steps of {step_size} up to threshold: {distance_threshold}"
     )
-    nodes["catchment"] = distance
-    stop_ids = set(df_stops["id"])
-
-    while set(nodes.index) != stop_ids and threshold_reached(distance):
-        # increase distance by step size until all stops have closest links or reached threshold
-        distance += step_size
-        logging.info(
-            f"Processing catchment: {distance}, {len(stop_ids - set(nodes.index))} stops remaining"
-        )
-        _df = _cast_catchment(
-            network_spatial_tree=network_spatial_tree,
-            df_stops=df_stops.loc[
-                df_stops["id"].isin(stop_ids - set(nodes.index)), ["id", "geometry"]
-            ].copy(),
-            distance=distance,
-        )
-        _df["catchment"] = distance
-        nodes = pd.concat([nodes, _df])
-    return nodes
+    return network_spatial_tree.closest_links(
+        gdf_points=df_stops.loc[:, ["id", "geometry"]].copy(),
+        distance_radius=distance_threshold,
+        step_size=step_size,
+    ).dropna(subset=["link_id"])
 
 
 def _generate_modal_network_geojsons(network, modes, output_dir, filename_suffix):
@@ -219,6 +190,40 @@ def osm(required: bool = True):
     return wrapper
 
 
+def osm_region(func):
+    func = click.option(
+        "-ob",
+        "--osm_bbox",
+        help="Bounding box to clip the osm file to while reading it: min lon, min lat, max lon, max lat",
+        type=float,
+        nargs=4,
+        default=None,
+        required=False,
+    )(func)
+    func = click.option(
+        "-or",
+        "--osm_region",
+        help="Region to clip the osm file to while reading it: path to a geojson file or comma separated hex "
+        "tokens of Google's S2 geometry. Cannot be combined with `--osm_bbox`",
+        type=str,
+        default=None,
+        required=False,
+    )(func)
+    return click.option(
+        "-kc",
+        "--keep_crossing_ways",
+        help="Keep osm ways crossing the boundary of `--osm_bbox`/`--osm_region` whole rather than clipping them",
+        is_flag=True,
+        default=False,
+    )(func)
+
+
+def _osm_region(osm_bbox: Optional[tuple], osm_region: Optional[str]):
+    if osm_bbox and osm_region is not None:
+        raise click.UsageError("Only one of `--osm_bbox` and `--osm_region` can be given")
+    return tuple(osm_bbox) if osm_bbox else osm_region
+
+
 def gtfs(func):
     func = click.option(
         "-g",
@@ -672,7 +677,12 @@ def intermodal_access_egress_network(
                 )
 
             # Let's create some handy geojson outputs to verify our snapping
-            selected_links[["catchment", "geometry"]].to_file(
+            stop_catchments = gpd.GeoDataFrame(
+                selected_links[["catchment", "geometry"]], geometry="geometry", crs=EPSG4326
+            )
+            stop_catchments = stop_catchments.to_crs(stop_catchments.estimate_utm_crs())
+            stop_catchments["geometry"] = stop_catchments.buffer(stop_catchments["catchment"])
+            stop_catchments.to_crs(EPSG4326).to_file(
                 os.path.join(supporting_outputs, f"{snap_mode}_stop_catchments.geojson"),
                 driver="GeoJSON",
             )
@@ -733,6 +743,7 @@ def intermodal_access_egress_network(
 @projection
 @output_dir
 @osm(required=False)
+@osm_region
 @gtfs
 @processes
 @click.option(
@@ -743,16 +754,39 @@ def intermodal_access_egress_network(
     type=float,
     required=False,
 )
+@click.option(
+    "-sv",
+    "--solver",
+    help="Solver for snapping stops to the network: a pyomo MILP solver name (e.g. `cbc`, `glpk`), "
+    "`scipy` for the in-process scipy MILP solver or `greedy` for a fast, approximate heuristic",
+    default="cbc",
+    type=str,
+    required=False,
+)
+@click.option(
+    "-cp",
+    "--checkpoint_dir",
+    help="Directory to save the snapping result of each service to, as soon as it is available. "
+    "Rerunning with the same network skips services saved there",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    required=False,
+)
 def make_pt_network(
     path_to_network: Path,
     projection: str,
     output_dir: Path,
     path_to_osm: Path,
     path_to_osm_config: Path,
+    osm_bbox: Optional[tuple],
+    osm_region: Optional[str],
+    keep_crossing_ways: bool,
     path_to_gtfs: Path,
     gtfs_day: str,
     processes: int,
     snapping_distance: float,
+    solver: str,
+    checkpoint_dir: Optional[Path],
 ):
     """Create a PT MATSim network"""
 
@@ -760,7 +794,13 @@ def make_pt_network(
 
     if path_to_osm is not None:
         logging.info(f"Reading in network at {path_to_osm}")
-        network = read_osm(path_to_osm, path_to_osm_config, num_processes=processes)
+        network = read_osm(
+            path_to_osm,
+            path_to_osm_config,
+            num_processes=processes,
+            region=_osm_region(osm_bbox, osm_region),
+            keep_crossing_ways=keep_crossing_ways,
+        )
         logging.info("Simplifying network")
         network.simplify(no_processes=processes)
         logging.info(
@@ -785,7 +825,11 @@ def make_pt_network(
         f"Snapping and routing the schedule onto the network with distance threshold {snapping_distance}"
     )
     unsnapped_services = network.route_schedule(
-        distance_threshold=snapping_distance, additional_modes={"bus": "car"}
+        distance_threshold=snapping_distance,
+        additional_modes={"bus": "car"},
+        solver=solver,
+        processes=processes,
+        checkpoint_dir=checkpoint_dir,
     )
     logging.info(
         f"Snapping resulted in {len(unsnapped_services)} unsnapped services: {unsnapped_services}. Trying them again."
@@ -794,6 +838,9 @@ def make_pt_network(
         distance_threshold=snapping_distance,
         additional_modes={"bus": "car"},
         services=unsnapped_services,
+        solver=solver,
+        processes=processes,
+        checkpoint_dir=checkpoint_dir,
     )
     logging.info(
         f"Second snapping attempt resulted in {len(unsnapped_services)} unsnapped services: {unsnapped_services}"
@@ -810,6 +857,7 @@ def make_pt_network(
 
 @cli.command()
 @osm(required=True)
+@osm_region
 @projection
 @processes
 @output_dir
@@ -825,6 +873,9 @@ def make_road_only_network(
     output_dir: Path,
     path_to_osm: Path,
     path_to_osm_config: Path,
+    osm_bbox: Optional[tuple],
+    osm_region: Optional[str],
+    keep_crossing_ways: bool,
     processes: int,
     connected_components: int,
 ):
@@ -836,6 +887,8 @@ def make_road_only_network(
         osm_read_config=path_to_osm_config,
         num_processes=processes,
         epsg=projection,
+        region=_osm_region(osm_bbox, osm_region),
+        keep_crossing_ways=keep_crossing_ways,
     )
     for mode in ["walk", "car", "bike"]:
         network.retain_n_connected_subgraphs(n=connected_components, mode=mode)
@@ -1,6 +1,9 @@
+import functools
+import hashlib
 import itertools
 import json
 import logging
+import operator
 import os
 import traceback
 import uuid
@@ -11,6 +14,7 @@ import geopandas as gpd
 import networkx as nx
 import numpy as np
 import pandas as pd
+import shapely
 from keplergl import KeplerGl
 from pyproj import Transformer
 from s2sphere import CellId
@@ -60,6 +64,9 @@ class Network:
         # link_id_mapping maps between (usually string literal) index per edge to the from and to nodes that are
         # connected by the edge
         self.link_id_mapping = {}
+        # service_routing_versions maps Service IDs to the change log index at which they were last snapped and routed,
+        # later changes to the network are used to find Services that need rerouting
+        self.service_routing_versions = {}
         if kwargs:
             self.add_additional_attributes(kwargs)
 
@@ -299,7 +306,12 @@ class Network:
         else:
             self.transformer = None
 
-    def simplify(self, no_processes: int = 1, keep_loops: bool = False):
+    def simplify(
+        self,
+        no_processes: int = 1,
+        keep_loops: bool = False,
+        region: Optional[Union[str, BaseGeometry, set, list]] = None,
+    ):
         """Simplifies network graph in-place, retaining only nodes that are junctions.
 
         Args:
@@ -311,19 +323,41 @@ class Network:
                 Simplification often leads to self-loops.
                 These will be removed unless keep_loops=`True`.
                 Defaults to False.
+            region (Optional[Union[str, BaseGeometry, set, list]], optional):
+                If given, only paths lying entirely within this region are simplified, e.g. after a local edit of an
+                already simplified network. Either a collection of node IDs or a spatial region, in EPSG:4326,
+                accepted by `nodes_on_spatial_condition`:
+                - path to a geojson file, can have multiple features.
+                - string with comma separated hex tokens of Google's S2 geometry.
+                - shapely.geometry object, e.g. Polygon or a shapely.geometry.GeometryCollection of such objects.
+                The link simplification map is updated rather than replaced and the network is not marked as simplified.
+                Defaults to None (the whole network).
 
         Raises:
-            RuntimeError: Can only simply the network once.
+            RuntimeError: Can only simply the whole network once.
         """
-        if self.is_simplified():
-            raise RuntimeError(
-                "This network has already been simplified. You cannot simplify the graph twice."
-            )
-        simplification.simplify_graph(self, no_processes)
-
-        df = self.link_attribute_data_under_keys(keys=["from", "to"])
-        df = df[df["from"] == df["to"]]
-        loops = set(df.index)
+        if region is None:
+            if self.is_simplified():
+                raise RuntimeError(
+                    "This network has already been simplified. You cannot simplify the graph twice."
+                )
+            nodes = None
+        else:
+            if isinstance(region, (str, BaseGeometry)):
+                region = self._nodes_in_region(region)
+            nodes = {node for node in region if node in self.graph}
+        new_link_map = simplification.simplify_graph(self, no_processes, nodes=nodes)
+
+        if nodes is None:
+            df = self.link_attribute_data_under_keys(keys=["from", "to"])
+            df = df[df["from"] == df["to"]]
+            loops = set(df.index)
+        else:
+            loops = {
+                link_id
+                for link_id in set(new_link_map.values())
+                if self.link(link_id)["from"] == self.link(link_id)["to"]
+            }
         # pt stops can be loops
         pt_stop_loops = set(self.schedule.stop_attribute_data(keys=["linkRefId"])["linkRefId"])
         useless_self_loops = loops - pt_stop_loops
@@ -346,8 +380,9 @@ class Network:
                     if v not in useless_self_loops
                 }
 
-        # mark graph as having been simplified
-        self._mark_as_simplified()
+        if nodes is None:
+            # mark graph as having been simplified
+            self._mark_as_simplified()
 
     def _mark_as_simplified(self):
         self.attributes["simplified"] = True
@@ -878,6 +913,45 @@ class Network:
         else:
             raise NotImplementedError("Only `intersect` and `contain` options for `how` param.")
 
+    def _nodes_in_region(self, region: Union[str, BaseGeometry]) -> list:
+        """Node IDs intersecting `region`, as given by `nodes_on_spatial_condition`, found by querying a spatial index.
+
+        Shapely regions query an STRtree of node points, S2 regions look up the ID ranges of their cells in the sorted
+        S2 cell IDs of nodes. Unlike `nodes_on_spatial_condition`, nodes and links are not converted to GeoDataFrames.
+
+        Args:
+            region (Union[str, BaseGeometry]): Region in EPSG:4326, see `nodes_on_spatial_condition`.
+
+        Returns:
+            list: Node IDs.
+        """
+        region = spatial.read_region(region)
+        node_ids = list(self.graph.nodes)
+        if isinstance(region, BaseGeometry):
+            points = shapely.points(
+                np.array([lon for _, lon in self.graph.nodes(data="lon")], dtype=float),
+                np.array([lat for _, lat in self.graph.nodes(data="lat")], dtype=float),
+            )
+            indices = shapely.STRtree(points).query(region, predicate="intersects")
+        else:
+            s2_ids = np.array(
+                [s2_id for _, s2_id in self.graph.nodes(data="s2_id")], dtype=np.uint64
+            )
+            order = np.argsort(s2_ids)
+            cell_ranges = np.array(
+                [(cell.range_min().id(), cell.range_max().id()) for cell in region.cell_ids()],
+                dtype=np.uint64,
+            ).reshape(-1, 2)
+            starts = np.searchsorted(s2_ids[order], cell_ranges[:, 0], side="left")
+            ends = np.searchsorted(s2_ids[order], cell_ranges[:, 1], side="right")
+            indices = order[
+                np.concatenate(
+                    [np.arange(start, end) for start, end in zip(starts, ends)]
+                    + [np.array([], dtype=int)]
+                )
+            ]
+        return [node_ids[i] for i in np.unique(indices)]
+
     def _find_node_ids_on_s2_geometry(self, s2_input):
         cell_union = spatial.s2_hex_to_cell_union(s2_input)
         return [
@@ -2026,6 +2100,9 @@ class Network:
         step_size: int = 10,
         additional_modes: Optional[dict] = None,
         allow_directional_split: bool = False,
+        processes: int = 1,
+        incremental: bool = False,
+        checkpoint_dir: Optional[str] = None,
     ) -> Optional[set]:
         """Method to find relationship between all Services in Schedule and the Network.
 
@@ -2049,6 +2126,9 @@ class Network:
                 Another good open source choice is GLPK: https://www.gnu.org/software/glpk/.
                 You specify it as a string e.g. 'glpk', 'cbc', 'gurobi'.
                 The solver needs to support MILP - mixed integer linear programming.
+                'scipy' solves the sparse MILP in-process with `scipy.optimize.milp` (no pyomo model, no subprocess).
+                'greedy' uses a fast heuristic (greedy choice and local search) for very large problems;
+                its solutions are not guaranteed to be optimal.
             allow_partial (bool, optional):
                 If there isn't a link available for snapping within threshold and, under modal conditions,
                 an artificial self-loop link will be created as well as any connecting links to that unsnapped stop.
@@ -2073,11 +2153,46 @@ class Network:
                 This usually results in stops snapping to multiple links.
                 Routes' stops and their network routes are updated based on direction too.
                 You may like to investigate directional split for different services using a Service object method: `split_graph`.
+            processes (int, optional):
+                Snapping problems are split into independent components (e.g. stretches of a route separated by stops with a single candidate link).
+                Components which need the solver are solved across this many parallel processes.
+                Defaults to 1.
+            incremental (bool, optional):
+                If True, only Services affected by changes to the network since they were last routed are snapped and routed
+                (see `services_affected_by_changes`), all other Services keep their current network routes.
+                Combined with `services`, only affected Services out of those given are routed.
+                Defaults to False.
+            checkpoint_dir (Optional[str], optional):
+                If given, the result of routing each Service is saved in this directory as soon as it is available,
+                under the fingerprint of the network (see `fingerprint`).
+                Rerunning with the same network and parameters skips the Services saved there, unless their Stops
+                or Routes have changed since.
+                Saved results can also be applied on their own with `apply_routing_checkpoint`.
+                Defaults to None.
 
         Returns:
             Optional[set]: Set of unsnapped services, empty if all snapped, updates Network object and the Schedule object within.
         """
         if self.schedule:
+            if incremental:
+                affected_services = self.services_affected_by_changes(
+                    distance_threshold=distance_threshold
+                )
+                if services is not None:
+                    affected_services &= set(services)
+                logging.info(
+                    f"Incremental routing: {len(affected_services)} Services are affected by changes to the network"
+                )
+                # Services which are not affected are up to date with the network at the end of this run
+                up_to_date_services = (
+                    set(self.schedule.service_ids()) if services is None else set(services)
+                ) - affected_services
+                services = affected_services
+                if not services:
+                    self._record_routing_version(up_to_date_services)
+                    return set()
+            else:
+                up_to_date_services = set()
             logging.info("Building Spatial Tree")
             spatial_tree = spatial.SpatialTree(self)
             if additional_modes is None:
@@ -2086,7 +2201,7 @@ class Network:
                 for k, v in additional_modes.items():
                     additional_modes[k] = persistence.setify(v)
 
-            changeset = None
+            changesets = []
             route_data = self.schedule.route_attribute_data(keys=["ordered_stops"])
             service_modes = self.schedule.route_attribute_data(
                 keys=["mode"], index_name="route_id"
@@ -2102,6 +2217,32 @@ class Network:
             service_modes["mode"] = service_modes["mode"].apply(lambda x: tuple(sorted(x)))
             service_modes = service_modes.groupby("mode")["service_id"].apply(set).T.to_dict()
 
+            checkpoint = None
+            checkpointed_services = {}
+            if checkpoint_dir is not None:
+                checkpoint = modify_schedule.routing_checkpoint_dir(
+                    checkpoint_dir,
+                    self.fingerprint(),
+                    parameters={
+                        "solver": solver,
+                        "allow_partial": allow_partial,
+                        "distance_threshold": distance_threshold,
+                        "step_size": step_size,
+                        "additional_modes": {k: sorted(v) for k, v in additional_modes.items()},
+                        "allow_directional_split": allow_directional_split,
+                    },
+                )
+                service_fingerprints = {
+                    service.id: modify_schedule.service_fingerprint(service)
+                    for service in self.schedule.services()
+                }
+                checkpointed_services = modify_schedule.read_routing_checkpoints(
+                    checkpoint, service_fingerprints
+                )
+                logging.info(
+                    f"Found {len(checkpointed_services)} Services already routed in checkpoint: {checkpoint}"
+                )
+
             unsnapped_services = set()
             for modes, service_ids in service_modes.items():
                 modes = set(modes)
@@ -2109,6 +2250,15 @@ class Network:
                 for m in modes & set(additional_modes.keys()):
                     buffed_modes |= additional_modes[m]
 
+                for service_id in service_ids & checkpointed_services.keys():
+                    if checkpointed_services[service_id]["changeset"] is not None:
+                        changesets.append(checkpointed_services[service_id]["changeset"])
+                    if checkpointed_services[service_id]["unsnapped"]:
+                        unsnapped_services.add(service_id)
+                service_ids = service_ids - checkpointed_services.keys()
+                if not service_ids:
+                    continue
+
                 try:
                     logging.info(f"Extracting Modal SubTree for modes: {modes}")
                     sub_tree = spatial_tree.modal_subtree(buffed_modes)
@@ -2133,6 +2283,7 @@ class Network:
                             graph_groups = [service.reference_edges()]
                         service_g = service.graph()
 
+                        service_changeset = None
                         for route_group, graph_group in zip(routes, graph_groups):
                             route_group = list(route_group)
                             try:
@@ -2144,19 +2295,36 @@ class Network:
                                     allow_partial=allow_partial,
                                     distance_threshold=distance_threshold,
                                     step_size=step_size,
+                                    processes=processes,
                                 )
-                                if changeset is None:
-                                    changeset = mss.to_changeset(route_data.loc[route_group, :])
+                                if service_changeset is None:
+                                    service_changeset = mss.to_changeset(
+                                        route_data.loc[route_group, :]
+                                    )
                                 else:
-                                    changeset += mss.to_changeset(route_data.loc[route_group, :])
+                                    service_changeset += mss.to_changeset(
+                                        route_data.loc[route_group, :]
+                                    )
                             except Exception:
                                 logging.error(
                                     f"\nRouting Service: `{service_id}` resulted in the following Exception:"
                                     f"\n{traceback.format_exc()}"
                                 )
                                 unsnapped_services.add(service_id)
-            if changeset is not None:
-                self._apply_max_stable_changes(changeset)
+                        if checkpoint is not None:
+                            modify_schedule.write_routing_checkpoint(
+                                checkpoint,
+                                service_id,
+                                service_fingerprints[service_id],
+                                service_changeset,
+                                unsnapped=service_id in unsnapped_services,
+                            )
+                        if service_changeset is not None:
+                            changesets.append(service_changeset)
+            if changesets:
+                self._apply_max_stable_changes(functools.reduce(operator.add, changesets))
+            routed_services = set().union(*service_modes.values()) - unsnapped_services
+            self._record_routing_version(routed_services | up_to_date_services)
             return unsnapped_services
         else:
             logging.warning("Schedule object not found")
@@ -2172,6 +2340,7 @@ class Network:
         step_size: int = 10,
         additional_modes: Optional[dict] = None,
         allow_directional_split: bool = False,
+        processes: int = 1,
     ) -> Optional[Union[str, int]]:
         """Method to find relationship between the Service with ID 'service_id' in the Schedule and the Network.
 
@@ -2197,6 +2366,9 @@ class Network:
                 Another good open source choice is GLPK: https://www.gnu.org/software/glpk/.
                 You specify it as a string e.g. 'glpk', 'cbc', 'gurobi'.
                 The solver needs to support MILP - mixed integer linear programming.
+                'scipy' solves the sparse MILP in-process with `scipy.optimize.milp` (no pyomo model, no subprocess).
+                'greedy' uses a fast heuristic (greedy choice and local search) for very large problems;
+                its solutions are not guaranteed to be optimal.
             allow_partial (bool, optional):
                 If there isn't a link available for snapping within threshold and, under modal conditions,
                 an artificial self-loop link will be created as well as any connecting links to that unsnapped stop.
@@ -2221,6 +2393,10 @@ class Network:
                 This usually results in stops snapping to multiple links.
                 Routes' stops and their network routes are updated based on direction too.
                 You may like to investigate directional split for different services using a Service object method: `split_graph`.
+            processes (int, optional):
+                Snapping problems are split into independent components (e.g. stretches of a route separated by stops with a single candidate link).
+                Components which need the solver are solved across this many parallel processes.
+                Defaults to 1.
 
 
         Returns:
@@ -2257,12 +2433,14 @@ class Network:
                     allow_partial=allow_partial,
                     distance_threshold=distance_threshold,
                     step_size=step_size,
+                    processes=processes,
                 )
                 if changeset is None:
                     changeset = mss.to_changeset(route_data.loc[route_group, :])
                 else:
                     changeset += mss.to_changeset(route_data.loc[route_group, :])
             self._apply_max_stable_changes(changeset)
+            self._record_routing_version({service.id})
         except exceptions.EmptySpatialTree:
             logging.warning(
                 f"Service {service.id} cannot be snapped to the Network with modes = {modes}. The "
@@ -2372,6 +2550,199 @@ class Network:
         self.schedule.apply_attributes_to_stops(stop_linkrefids)
         self.schedule.apply_attributes_to_routes(routes)
 
+    def _record_routing_version(self, service_ids: set):
+        version = self.change_log._next_index()
+        for service_id in service_ids:
+            self.service_routing_versions[service_id] = version
+
+    def _unrouted_services(self) -> set:
+        """Services with any Stop missing a `linkRefId` or any Route missing network routes."""
+        stops = self.schedule.stop_attribute_data(keys=["linkRefId", "services"])
+        unrouted_services = set()
+        if "linkRefId" not in stops.columns:
+            unrouted_services |= set().union(*stops["services"])
+        else:
+            unrouted_services |= set().union(*stops.loc[stops["linkRefId"].isnull(), "services"])
+        route_links = self.schedule.route_attribute_data(keys=["network_links"])
+        if "network_links" not in route_links.columns:
+            unrouted_routes = route_links.index
+        else:
+            unrouted_routes = route_links.index[~route_links["network_links"].map(bool)]
+        route_to_service_map = self.schedule.graph().graph["route_to_service_map"]
+        return unrouted_services | {route_to_service_map[route_id] for route_id in unrouted_routes}
+
+    def _record_routing_version_of_routed_services(self):
+        """Records Services which are snapped and routed, e.g. as read from file, as up to date with the network."""
+        if self.schedule:
+            self._record_routing_version(
+                set(self.schedule.service_ids()) - self._unrouted_services()
+            )
+
+    def _links_changed_since(self, version: int) -> set:
+        changes = self.change_log[self.change_log.index >= version]
+        link_changes = changes[changes["object_type"] == "link"]
+        changed_links = set(link_changes["old_id"].dropna()) | set(link_changes["new_id"].dropna())
+        node_changes = changes[changes["object_type"] == "node"]
+        changed_nodes = (
+            set(node_changes["old_id"].dropna()) | set(node_changes["new_id"].dropna())
+        ) & set(self.graph.nodes)
+        if changed_nodes:
+            # links move with their nodes
+            changed_links |= {
+                data["id"]
+                for edges in [self.graph.out_edges, self.graph.in_edges]
+                for _, _, data in edges(changed_nodes, data=True)
+            }
+        return changed_links
+
+    def fingerprint(self) -> str:
+        """Content hash of the network's nodes and links.
+
+        Covers the IDs and coordinates of nodes and the IDs, end nodes, modes, lengths and geometries of links;
+        i.e. everything snapping and routing PT depends on.
+        Networks with the same fingerprint are interchangeable for routing, regardless of the order of nodes and links.
+
+        Returns:
+            str: Hex digest of the network's contents.
+        """
+        nodes = pd.DataFrame(
+            [(node, data.get("x"), data.get("y")) for node, data in self.graph.nodes(data=True)],
+            columns=["id", "x", "y"],
+        )
+        links = pd.DataFrame(
+            [
+                (
+                    data.get("id"),
+                    u,
+                    v,
+                    sorted(map(str, persistence.setify(data.get("modes")))),
+                    data.get("length"),
+                    getattr(data.get("geometry"), "wkt", None),
+                )
+                for u, v, data in self.graph.edges(data=True)
+            ],
+            columns=["id", "from", "to", "modes", "length", "geometry"],
+        )
+        digest = hashlib.sha256()
+        for df in [nodes, links]:
+            df = df.astype(str).sort_values("id")
+            digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def apply_routing_checkpoint(self, checkpoint_dir: str) -> set:
+        """Applies Service routing results saved by `route_schedule` with `checkpoint_dir`, without routing the rest.
+
+        Only results saved for this network (i.e. with the same `fingerprint`) and for Services of this schedule with
+        unchanged Stops and Routes (see `genet.modify.schedule.service_fingerprint`) are applied; others are skipped
+        with a warning.
+
+        Args:
+            checkpoint_dir (str): `checkpoint_dir` passed to `route_schedule`.
+
+        Returns:
+            set: Services which failed to snap, out of those saved in the checkpoint.
+        """
+        checkpoint = os.path.join(checkpoint_dir, self.fingerprint())
+        records = modify_schedule.read_routing_checkpoints(
+            checkpoint,
+            {
+                service.id: modify_schedule.service_fingerprint(service)
+                for service in self.schedule.services()
+            },
+        )
+        if not records:
+            logging.warning(f"No routing results found for this network in: {checkpoint_dir}")
+            return set()
+        logging.info(f"Applying routing results of {len(records)} Services from: {checkpoint}")
+        changesets = [r["changeset"] for r in records.values() if r["changeset"] is not None]
+        if changesets:
+            self._apply_max_stable_changes(functools.reduce(operator.add, changesets))
+        unsnapped_services = {service_id for service_id, r in records.items() if r["unsnapped"]}
+        self._record_routing_version(set(records) - unsnapped_services)
+        return unsnapped_services
+
+    def services_affected_by_changes(self, distance_threshold: float = 30) -> set:
+        """Finds Services which may snap or route differently because of changes to the network since they were last routed.
+
+        Changes are read from the change log, starting from the version recorded when each Service was last snapped and
+        routed by `route_schedule`, `route_service` or `reroute`, or when it was read already routed together with
+        the network (`read_matsim`, `read_json`). Services with no recorded version, or with Stops missing `linkRefId`s
+        or Routes missing network routes, have never been routed with this network and are always affected.
+
+        A Service is affected if any of its Routes' network routes or its Stops' `linkRefId`s use a changed (or removed)
+        link, or if any of its Stops is within `distance_threshold` of a changed link (i.e. a new or moved link falls
+        within the Stop's snapping catchment).
+
+        Args:
+            distance_threshold (float, optional): In metres, the snapping catchment of Stops. Defaults to 30.
+
+        Returns:
+            set: IDs of affected Services.
+        """
+        affected_services = set()
+        if not self.schedule:
+            return affected_services
+
+        service_ids = set(self.schedule.service_ids())
+        affected_services = (
+            service_ids - set(self.service_routing_versions)
+        ) | self._unrouted_services()
+        versions = pd.Series(
+            {
+                service_id: self.service_routing_versions[service_id]
+                for service_id in service_ids - affected_services
+            },
+            dtype=int,
+        )
+        route_links = self.schedule.route_attribute_data(keys=["network_links"])
+        route_links["service_id"] = route_links.index.map(
+            self.schedule.graph().graph["route_to_service_map"]
+        )
+        stops = self.schedule.to_geodataframe()["nodes"].to_crs(self.epsg)
+
+        for version, service_ids in versions.groupby(versions).groups.items():
+            service_ids = set(service_ids)
+            changed_links = self._links_changed_since(version)
+            if not changed_links:
+                continue
+            _route_links = route_links[route_links["service_id"].isin(service_ids)]
+            affected_services |= set(
+                _route_links.loc[
+                    _route_links["network_links"].map(lambda x: bool(changed_links & set(x or []))),
+                    "service_id",
+                ]
+            )
+            _stops = stops[stops["services"].map(lambda x: bool(service_ids & set(x)))]
+            if "linkRefId" in _stops.columns:
+                affected_services |= service_ids & set().union(
+                    *_stops.loc[_stops["linkRefId"].isin(changed_links), "services"]
+                )
+
+            existing_changed_links = [
+                (
+                    self.link_id_mapping[link_id]["from"],
+                    self.link_id_mapping[link_id]["to"],
+                    self.link_id_mapping[link_id]["multi_edge_idx"],
+                )
+                for link_id in changed_links
+                if link_id in self.link_id_mapping
+            ]
+            if existing_changed_links and not _stops.empty:
+                links = spatial_output.generate_geodataframes(
+                    self.graph.edge_subgraph(existing_changed_links)
+                )["links"]
+                metric_crs = links.estimate_utm_crs()
+                links = links.to_crs(metric_crs)
+                links["geometry"] = links.buffer(distance_threshold)
+                stops_in_catchment = gpd.sjoin(
+                    _stops[["services", "geometry"]].to_crs(metric_crs),
+                    links[["geometry"]],
+                    how="inner",
+                    predicate="intersects",
+                )
+                affected_services |= service_ids & set().union(*stops_in_catchment["services"])
+        return affected_services
+
     def _apply_max_stable_changes(self, max_stable_set_changeset):
         self.schedule._graph.add_nodes_from(max_stable_set_changeset.new_stops.items())
         self.schedule._graph.add_edges_from(max_stable_set_changeset.new_pt_edges)
@@ -2432,6 +2803,7 @@ class Network:
         logging.info(f"Rerouting Service `{_id}`")
         for route_id in service.route_ids():
             self._reroute_route(route_id, additional_modes)
+        self._record_routing_version({_id})
 
     def _reroute_route(self, _id, additional_modes=None):
         route = self.schedule.route(_id)
@@ -3046,16 +3418,39 @@ class Network:
         self.change_log.export(os.path.join(output_dir, "network_change_log.csv"))
         self.write_auxiliary_files(os.path.join(output_dir, "auxiliary_files"))
 
-    def write_to_matsim(self, output_dir: str):
+    def write_to_matsim(
+        self,
+        output_dir: str,
+        compression: Optional[Literal["gzip", "zstd"]] = None,
+        compression_level: Optional[int] = None,
+        compression_threads: int = 1,
+    ):
         """Writes Network and Schedule (if applicable) to MATSim xml format.
 
         Args:
             output_dir (str): Output directory.
+            compression (Optional[Literal["gzip", "zstd"]], optional):
+                If given, MATSim files are compressed as they are written, e.g. to `network.xml.gz` for "gzip"
+                or `network.xml.zst` for "zstd". Defaults to None.
+            compression_level (Optional[int], optional):
+                Compression level. Defaults to None (6 for gzip, 3 for zstandard).
+            compression_threads (int, optional): Number of threads compressing the outputs. Defaults to 1.
         """
         persistence.ensure_dir(output_dir)
-        matsim_xml_writer.write_matsim_network(output_dir, self)
+        matsim_xml_writer.write_matsim_network(
+            output_dir,
+            self,
+            compression=compression,
+            compression_level=compression_level,
+            compression_threads=compression_threads,
+        )
         if self.schedule:
-            self.schedule.write_to_matsim(output_dir)
+            self.schedule.write_to_matsim(
+                output_dir,
+                compression=compression,
+                compression_level=compression_level,
+                compression_threads=compression_threads,
+            )
         self.write_extras(output_dir)
 
     def to_json(self):
@@ -3145,6 +3540,14 @@ class Network:
         schedule_csv_folder = os.path.join(output_dir, "schedule")
         persistence.ensure_dir(network_csv_folder)
         csv_network = self.to_encoded_geometry_dataframe()
+        if "modes" in csv_network["links"].columns:
+            csv_network["links"]["modes"] = csv_network["links"]["modes"].map(
+                lambda modes: json.dumps(sorted(modes)), na_action="ignore"
+            )
+        if "attributes" in csv_network["links"].columns:
+            csv_network["links"]["attributes"] = csv_network["links"]["attributes"].map(
+                sanitiser.encode_for_csv, na_action="ignore"
+            )
         logging.info(f"Saving Network to CSV in {network_csv_folder}")
         csv_network["nodes"].to_csv(os.path.join(network_csv_folder, "nodes.csv"))
         csv_network["links"].to_csv(os.path.join(network_csv_folder, "links.csv"))
@@ -120,6 +120,14 @@ class PartialMaxStableSetProblem(Exception):
     pass
 
 
+class RoutingCheckpointError(Exception):
+    """
+    Raised when a routing checkpoint cannot be resumed, e.g. it was written with different routing parameters
+    """
+
+    pass
+
+
 class MalformedAdditionalAttributeError(Exception):
     """
     Raised when additional attributes can not be saved to MATSim network
@@ -1,23 +1,110 @@
 import csv
+import hashlib
+import io
 import logging
 import os
-import shutil
-from datetime import datetime, timedelta
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import IO, Iterator, Literal, Optional, Union
 
 import networkx as nx
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
 
 import genet.modify.change_log as change_log
 from genet import variables
-from genet.utils import persistence, spatial
+from genet.utils import parallel, persistence, spatial
 
+STOP_TIMES_DTYPES = {
+    "trip_id": "category",
+    "arrival_time": "category",
+    "departure_time": "category",
+    "stop_id": "category",
+    "stop_sequence": "int32",
+}
+TRIPS_DTYPES = {"route_id": "category", "service_id": "category", "trip_id": "category"}
+PYARROW_TYPES = {"category": pa.dictionary(pa.int32(), pa.string()), "int32": pa.int32()}
+GTFS_TABLES = ["stop_times", "stops", "trips", "routes"]
+# bump whenever the parsed tables change, so that tables cached by earlier versions are not reused
+GTFS_CACHE_VERSION = 1
 
-def read_services_from_calendar(path: str, day: str) -> list:
+
+def find_gtfs_tables(path: Union[Path, str]) -> dict[str, str]:
+    """Finds GTFS tables in a directory or a zip file, which may nest them in a folder.
+
+    Args:
+        path (Union[Path, str]): Path to GTFS folder or a zip file.
+
+    Returns:
+        dict[str, str]: Table name, e.g. `stop_times`, to its path within the directory or zip file.
+    """
+    if persistence.is_zip(path):
+        with zipfile.ZipFile(path) as zip_file:
+            names = zip_file.namelist()
+    else:
+        names = os.listdir(path)
+    return {
+        Path(name).stem: name
+        for name in names
+        if Path(name).suffix == ".txt" and not Path(name).name.startswith(".")
+    }
+
+
+@contextmanager
+def open_gtfs_table(path: Union[Path, str], name: str) -> Iterator[IO[bytes]]:
+    """Opens a GTFS table for reading, straight from the zip file stream if the GTFS is zipped.
+
+    Args:
+        path (Union[Path, str]): Path to GTFS folder or a zip file.
+        name (str): Path of the table within the directory or zip file, see `find_gtfs_tables`.
+
+    Yields:
+        IO[bytes]: Binary file object.
+    """
+    if persistence.is_zip(path):
+        with zipfile.ZipFile(path) as zip_file, zip_file.open(name) as table:
+            yield table
+    else:
+        with open(os.path.join(path, name), "rb") as table:
+            yield table
+
+
+def read_gtfs_table_columns(
+    table: IO[bytes], dtypes: dict[str, str], csv_engine: Literal["c", "pyarrow"] = "c"
+) -> pd.DataFrame:
+    """Reads only the given columns of a GTFS table, with the given dtypes.
+
+    Args:
+        table (IO[bytes]): GTFS table file object.
+        dtypes (dict[str, str]): Column name to its dtype, either `category` or `int32`.
+        csv_engine (Literal["c", "pyarrow"], optional): CSV parser. Defaults to "c".
+
+    Returns:
+        pd.DataFrame: Table with the given columns, in the given order.
+    """
+    if csv_engine == "pyarrow":
+        # pyarrow is given the column types upfront, so that IDs such as `0123` are not parsed as numbers
+        return pa_csv.read_csv(
+            table,
+            convert_options=pa_csv.ConvertOptions(
+                column_types={column: PYARROW_TYPES[dtype] for column, dtype in dtypes.items()},
+                include_columns=list(dtypes),
+            ),
+        ).to_pandas()
+    # parsing in one go spares merging the categories of each chunk parsed in low memory mode
+    return pd.read_csv(table, usecols=list(dtypes), dtype=dtypes, low_memory=False)[list(dtypes)]
+
+
+def read_services_from_calendar(path: Union[Path, str], day: str) -> list:
     """Return list of services to be included.
 
     Args:
-        path (str): Path to GTFS directory.
+        path (Union[Path, str]): Path to GTFS folder or a zip file.
         day (str): 'YYYYMMDD' for specific day in which to find services.
 
     Raises:
@@ -42,24 +129,19 @@ def read_services_from_calendar(path: str, day: str) -> list:
 
     services = []
 
-    calendar_present = False
-    for file_name in os.listdir(path):
-        file = os.path.join(path, file_name)
-        if ("calendar" in file) and ("dates" not in file):
-            calendar_present = True
-            with open(file, mode="r", encoding="utf-8-sig") as infile:
-                reader = csv.DictReader(infile)
-                for row in reader:
-                    row["service_id"] = sanitise_id(row["service_id"])
-                    if (int(day) in range(int(row["start_date"]), int(row["end_date"]))) and (
-                        int(row[day_of_the_week]) == 1
-                    ):
-                        services.append(row["service_id"])
+    tables = find_gtfs_tables(path)
+    if "calendar" not in tables:
+        raise RuntimeError("Calendar was not found with the GTFS")
+    with open_gtfs_table(path, tables["calendar"]) as table:
+        reader = csv.DictReader(io.TextIOWrapper(table, encoding="utf-8-sig"))
+        for row in reader:
+            row["service_id"] = sanitise_id(row["service_id"])
+            if (int(day) in range(int(row["start_date"]), int(row["end_date"]))) and (
+                int(row[day_of_the_week]) == 1
+            ):
+                services.append(row["service_id"])
     if not services:
-        if calendar_present:
-            raise RuntimeError("The date you have selected yielded no services")
-        else:
-            raise RuntimeError("Calendar was not found with the GTFS")
+        raise RuntimeError("The date you have selected yielded no services")
     return services
 
 
@@ -67,7 +149,124 @@ def sanitise_id(_id: str):
     return _id.replace(" ", "_")
 
 
-def read_gtfs_to_db_like_tables(path):
+def sanitise_ids(ids: pd.Series) -> pd.Series:
+    """Vectorised `sanitise_id`, which for categorical IDs only touches the categories."""
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        categories = ids.cat.categories.str.replace(" ", "_", regex=False)
+        if categories.is_unique:
+            return ids.cat.rename_categories(categories)
+        return sanitise_ids(ids.astype(str)).astype("category")
+    return ids.str.replace(" ", "_", regex=False)
+
+
+def gtfs_fingerprint(path: Union[Path, str]) -> str:
+    """Content hash of the GTFS tables the schedule is built from.
+
+    The calendar is not covered, it is read anew for each day. A zipped feed has the same fingerprint as its contents.
+
+    Args:
+        path (Union[Path, str]): Path to GTFS folder or a zip file.
+
+    Returns:
+        str: Hex digest of the feed's stop times, stops, trips and routes.
+    """
+    tables = find_gtfs_tables(path)
+    digest = hashlib.sha256(f"v{GTFS_CACHE_VERSION}".encode())
+    for table_name in GTFS_TABLES:
+        if table_name in tables:
+            digest.update(table_name.encode())
+            with open_gtfs_table(path, tables[table_name]) as table:
+                for block in iter(partial(table.read, 2**20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def read_cached_gtfs_tables(
+    cache: str,
+) -> Optional[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+    """Reads GTFS tables saved by `write_cached_gtfs_tables`.
+
+    Args:
+        cache (str): Cache directory of the feed.
+
+    Returns:
+        Optional[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+            stop times, stops, trips and routes tables, None if any of them is not cached.
+    """
+    paths = [os.path.join(cache, f"{table_name}.parquet") for table_name in GTFS_TABLES]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    tables = []
+    for path in paths:
+        table = pd.read_parquet(path)
+        # parquet reads missing strings as None, rather than the NaN read from CSV
+        columns = table.select_dtypes(object).columns
+        table[columns] = table[columns].where(table[columns].notna(), np.nan)
+        tables.append(table)
+    return tuple(tables)
+
+
+def write_cached_gtfs_tables(
+    cache: str, tables: tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]
+):
+    """Saves parsed GTFS tables as parquet files.
+
+    Each file is written in full before it is moved into place, so processes sharing the cache never read a partial
+    table.
+
+    Args:
+        cache (str): Cache directory of the feed.
+        tables (tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]): stop times, stops, trips and routes.
+    """
+    persistence.ensure_dir(cache)
+    for table_name, table in zip(GTFS_TABLES, tables):
+        path = os.path.join(cache, f"{table_name}.parquet")
+        try:
+            table.to_parquet(f"{path}.{os.getpid()}.tmp")
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            logging.warning(f"GTFS {table_name} could not be cached: {e}")
+            return
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def read_gtfs_to_db_like_tables(
+    path: Union[Path, str],
+    csv_engine: Literal["c", "pyarrow"] = "c",
+    cache_dir: Optional[str] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Reads the GTFS tables the schedule is built from.
+
+    Only the columns of stop times and trips needed to build the schedule are read, with IDs as categoricals and
+    stop sequences and times (in seconds since the start of the day) as 32 bit integers.
+    Stops and routes are read in full, their columns are carried over to the schedule.
+
+    Args:
+        path (Union[Path, str]): Path to GTFS folder or a zip file, which is read without extracting it.
+        csv_engine (Literal["c", "pyarrow"], optional):
+            CSV parser of stop times and trips, `pyarrow` parses them using multiple threads. Defaults to "c".
+        cache_dir (Optional[str], optional):
+            If given, parsed tables are saved there under the feed's fingerprint (see `gtfs_fingerprint`) and reused
+            by later reads of the same feed, in this or any other process. Defaults to None.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]: stop times, stops, trips and routes tables.
+    """
+    if cache_dir is None:
+        return _parse_gtfs_tables(path, csv_engine)
+    cache = os.path.join(cache_dir, gtfs_fingerprint(path))
+    tables = read_cached_gtfs_tables(cache)
+    if tables is None:
+        tables = _parse_gtfs_tables(path, csv_engine)
+        logging.info(f"Caching parsed GTFS tables in: {cache}")
+        write_cached_gtfs_tables(cache, tables)
+    else:
+        logging.info(f"Read parsed GTFS tables from cache: {cache}")
+    return tables
+
+
+def _parse_gtfs_tables(
+    path: Union[Path, str], csv_engine: Literal["c", "pyarrow"]
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     logging.info("Reading GTFS data into usable format")
 
     trips_db = None
@@ -75,37 +274,38 @@ def read_gtfs_to_db_like_tables(path):
     routes_db = None
     stop_times_db = None
 
-    for file_name in os.listdir(path):
-        file = os.path.join(path, file_name)
-
-        if "stop_times" in file:
-            logging.info("Reading stop times")
-            stop_times_db = pd.read_csv(
-                file, dtype={"trip_id": str, "stop_id": str}, low_memory=False
-            )
-            stop_times_db["trip_id"] = stop_times_db["trip_id"].apply(lambda x: sanitise_id(x))
-            stop_times_db["stop_id"] = stop_times_db["stop_id"].apply(lambda x: sanitise_id(x))
-
-        elif "stops" in file:
-            logging.info("Reading stops")
-            stops_db = pd.read_csv(file, dtype={"stop_id": str})
-            stops_db["stop_id"] = stops_db["stop_id"].apply(lambda x: sanitise_id(x))
-
-        elif "trips" in file:
-            logging.info("Reading trips")
-            trips_db = pd.read_csv(file, dtype={"route_id": str, "service_id": str, "trip_id": str})
-            trips_db["trip_id"] = trips_db["trip_id"].apply(lambda x: sanitise_id(x))
-            trips_db["route_id"] = trips_db["route_id"].apply(lambda x: sanitise_id(x))
-            trips_db["service_id"] = trips_db["service_id"].apply(lambda x: sanitise_id(x))
-
-        elif "routes" in file:
-            logging.info("Reading routes")
-            routes_db = pd.read_csv(
-                file, dtype={"route_id": str, "route_short_name": str, "route_long_name": str}
-            )
-            routes_db["route_id"] = routes_db["route_id"].apply(lambda x: sanitise_id(x))
-            routes_db["route_short_name"] = routes_db["route_short_name"].fillna("")
-            routes_db["route_long_name"] = routes_db["route_long_name"].fillna("")
+    for table_name, name in find_gtfs_tables(path).items():
+        with open_gtfs_table(path, name) as table:
+            if table_name == "stop_times":
+                logging.info("Reading stop times")
+                stop_times_db = read_gtfs_table_columns(table, STOP_TIMES_DTYPES, csv_engine)
+                stop_times_db["trip_id"] = sanitise_ids(stop_times_db["trip_id"])
+                stop_times_db["stop_id"] = sanitise_ids(stop_times_db["stop_id"])
+                for time_column in ["arrival_time", "departure_time"]:
+                    stop_times_db[time_column] = hms_to_seconds(stop_times_db[time_column]).astype(
+                        "int32"
+                    )
+
+            elif table_name == "stops":
+                logging.info("Reading stops")
+                stops_db = pd.read_csv(table, dtype={"stop_id": str})
+                stops_db["stop_id"] = sanitise_ids(stops_db["stop_id"])
+
+            elif table_name == "trips":
+                logging.info("Reading trips")
+                trips_db = read_gtfs_table_columns(table, TRIPS_DTYPES, csv_engine)
+                trips_db["trip_id"] = sanitise_ids(trips_db["trip_id"])
+                trips_db["route_id"] = sanitise_ids(trips_db["route_id"])
+                trips_db["service_id"] = sanitise_ids(trips_db["service_id"])
+
+            elif table_name == "routes":
+                logging.info("Reading routes")
+                routes_db = pd.read_csv(
+                    table, dtype={"route_id": str, "route_short_name": str, "route_long_name": str}
+                )
+                routes_db["route_id"] = sanitise_ids(routes_db["route_id"])
+                routes_db["route_short_name"] = routes_db["route_short_name"].fillna("")
+                routes_db["route_long_name"] = routes_db["route_long_name"].fillna("")
 
     return stop_times_db, stops_db, trips_db, routes_db
 
@@ -120,194 +320,495 @@ def get_mode(route_type):
         return "other"
 
 
+def hms_to_seconds(times: pd.Series) -> np.ndarray:
+    """Converts GTFS `HH:MM:SS` times, which can go past `24:00:00`, to integer seconds.
+
+    Times repeat a lot across a feed, so only the unique values are parsed.
+
+    Args:
+        times (pd.Series): `HH:MM:SS` strings.
+
+    Raises:
+        RuntimeError: All times must be given, times of stops which are not timepoints are not interpolated.
+
+    Returns:
+        np.ndarray: Seconds since the start of the day of each time.
+    """
+    codes, unique_times = pd.factorize(times)
+    if (codes == -1).any():
+        raise RuntimeError(
+            f"{(codes == -1).sum()} stop times are missing arrival or departure times, "
+            "which are not interpolated"
+        )
+    hms = pd.Series(unique_times, dtype=str).str.strip().str.split(":", expand=True)
+    seconds = hms.astype(int).to_numpy() @ np.array([3600, 60, 1])
+    return seconds[codes]
+
+
+def seconds_to_hms(seconds: np.ndarray) -> np.ndarray:
+    """Formats seconds as `HH:MM:SS` times of the day, wrapping around midnight.
+
+    Negative values are prefixed with `+`, as in the time of the day component of a negative `pandas.Timedelta`.
+
+    Args:
+        seconds (np.ndarray): Integer seconds.
+
+    Returns:
+        np.ndarray: `HH:MM:SS` strings.
+    """
+    hms = _times_of_day()[seconds % 86400]
+    if (seconds < 0).any():
+        hms = np.where(seconds < 0, np.char.add("+", hms.astype(str)).astype(object), hms)
+    return hms
+
+
+@lru_cache(maxsize=None)
+def _times_of_day() -> np.ndarray:
+    seconds = np.arange(86400)
+    return np.array(
+        [
+            f"{h:02d}:{m:02d}:{s:02d}"
+            for h, m, s in zip(seconds // 3600, seconds // 60 % 60, seconds % 60)
+        ],
+        dtype=object,
+    )
+
+
+def _times_in_seconds(times: pd.Series) -> np.ndarray:
+    if pd.api.types.is_integer_dtype(times.dtype):
+        return times.to_numpy()
+    return hms_to_seconds(times)
+
+
+def _group_starts(*keys: np.ndarray) -> np.ndarray:
+    """Finds the first position of each run of equal keys in sorted arrays."""
+    changes = np.zeros(len(keys[0]), dtype=bool)
+    changes[:1] = True
+    for key in keys:
+        changes[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(changes)
+
+
+def _split(values: list, starts: np.ndarray, ends: np.ndarray) -> list[list]:
+    return [values[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+
+
 def gtfs_db_to_schedule_graph(stop_times_db, stops_db, trips_db, routes_db, services):
-    def get_time(time):
-        # return time as datetime.datetime, account for 24 in %H
-        time_list = time.split(":")
-        if int(time_list[0]) >= 24:
-            days = int(time_list[0]) // 24
-            time_list[0] = int(time_list[0]) % 24
-            if time_list[0] < 10:
-                time_list[0] = "0{}".format(time_list[0])
-            else:
-                time_list[0] = str(time_list[0])
-            return datetime.strptime(":".join(time_list), "%H:%M:%S") + timedelta(days=days)
-        else:
-            return datetime.strptime(time, "%H:%M:%S")
-
-    def timedelta_to_hms(td):
-        return str(td).split("days")[-1].strip(" ")
-
-    def generate_stop_sequence(group):
-        group = group.sort_values(by="stop_sequence")
-        # remove stops that are loopy (consecutively duplicated)
-        unique_stops_mask = group["stop_id"].shift() != group["stop_id"]
-        if not unique_stops_mask.all():
+    trips_db = trips_db[trips_db["service_id"].isin(services)]
+    routes_db = routes_db[
+        routes_db.columns.union(
+            ["route_id", "route_type", "route_short_name", "route_long_name", "route_color"]
+        )
+    ].assign(mode=lambda df: df["route_type"].map(get_mode))
+    stop_times = stop_times_db[
+        ["trip_id", "stop_id", "arrival_time", "departure_time", "stop_sequence"]
+    ].merge(trips_db[["route_id", "trip_id"]], on="trip_id")
+
+    # order stops of each trip, with trips ordered by ID
+    trips_of_stops = stop_times["trip_id"].astype("category").cat.remove_unused_categories()
+    trips_of_stops = trips_of_stops.cat.reorder_categories(
+        trips_of_stops.cat.categories.sort_values()
+    )
+    trip_ids = trips_of_stops.cat.categories.to_numpy()
+    trip_codes = trips_of_stops.cat.codes.to_numpy()
+    order = np.lexsort((stop_times["stop_sequence"].to_numpy(), trip_codes))
+    trip_codes = trip_codes[order]
+    stop_ids = np.asarray(stop_times["stop_id"], dtype=object)[order]
+    arrival_times = _times_in_seconds(stop_times["arrival_time"])[order]
+    departure_times = _times_in_seconds(stop_times["departure_time"])[order]
+    route_ids = np.asarray(stop_times["route_id"], dtype=object)[order]
+
+    # remove stops that are loopy (consecutively duplicated)
+    loopy_stops = np.zeros(len(stop_ids), dtype=bool)
+    loopy_stops[1:] = (trip_codes[1:] == trip_codes[:-1]) & (stop_ids[1:] == stop_ids[:-1])
+    if loopy_stops.any():
+        for trip_code, affected_stops in (
+            pd.Series(stop_ids[loopy_stops]).groupby(trip_codes[loopy_stops]).agg(list).items()
+        ):
             logging.warning(
                 "Your GTFS has (a) looooop edge(s)! A zero link between a node and itself, edge affected "
                 "\nThis edge will not be considered for computation, the stop will be deleted and the "
-                f'schedule will be changed. Affected stops: {group[~unique_stops_mask]["stop_id"].to_list()}'
+                f"schedule will be changed. Trip: {trip_ids[trip_code]}. Affected stops: {affected_stops}"
             )
-        group = group.loc[unique_stops_mask]
-        flattened = group.iloc[0, :][
-            list(
-                set(group.columns)
-                - {"trip_id", "stop_sequence", "stop_id", "arrival_time", "departure_time"}
-            )
-        ]
-        departure_time = group.iloc[0, :]["arrival_time"]
-        flattened["trip_departure_time"] = departure_time.strftime("%H:%M:%S")
-        flattened["ordered_stops"] = group["stop_id"].to_list()
-        flattened["stops_str"] = ",".join(group["stop_id"].to_list())
-        flattened["arrival_offsets"] = [
-            timedelta_to_hms(t - departure_time) for t in group["arrival_time"]
-        ]
-        flattened["departure_offsets"] = [
-            timedelta_to_hms(t - departure_time) for t in group["departure_time"]
-        ]
-        return flattened
-
-    def generate_trips(group):
-        flattened = group.iloc[0, :][
-            list(
-                set(group.columns)
-                - {"route_id", "stops_str", "trip_id", "vehicle_id", "trip_departure_time"}
-            )
-        ]
-        trip_id = group["trip_id"].to_list()
-        trip_departure_time = group["trip_departure_time"].to_list()
-        vehicle_id = group["vehicle_id"].to_list()
-        flattened["trips"] = {
-            "trip_id": trip_id,
-            "trip_departure_time": trip_departure_time,
-            "vehicle_id": vehicle_id,
+        trip_codes, stop_ids, route_ids = (
+            trip_codes[~loopy_stops],
+            stop_ids[~loopy_stops],
+            route_ids[~loopy_stops],
+        )
+        arrival_times = arrival_times[~loopy_stops]
+        departure_times = departure_times[~loopy_stops]
+
+    starts = _group_starts(trip_codes)
+    lengths = np.diff(np.append(starts, len(trip_codes)))
+    # drop stop sequences that are single stops
+    multi_stop_trips = lengths > 1
+    in_multi_stop_trips = np.repeat(multi_stop_trips, lengths)
+    starts, lengths = starts[multi_stop_trips], lengths[multi_stop_trips]
+    trip_departure_times = arrival_times[starts]
+    # offsets are relative to the arrival at the first stop of each trip
+    offset_origins = np.repeat(trip_departure_times, lengths)
+    arrival_offsets = seconds_to_hms(arrival_times[in_multi_stop_trips] - offset_origins).tolist()
+    departure_offsets = seconds_to_hms(
+        departure_times[in_multi_stop_trips] - offset_origins
+    ).tolist()
+    ordered_stops = stop_ids[in_multi_stop_trips].tolist()
+    kept_ends = np.cumsum(lengths)
+    kept_starts = kept_ends - lengths
+
+    trips = pd.DataFrame(
+        {
+            "route_id": route_ids[starts],
+            "trip_id": trip_ids[trip_codes[starts]],
+            "trip_departure_time": seconds_to_hms(trip_departure_times),
+            "vehicle_id": [f"veh_{i}" for i in range(len(starts))],
+            "ordered_stops": _split(ordered_stops, kept_starts, kept_ends),
+            "arrival_offsets": _split(arrival_offsets, kept_starts, kept_ends),
+            "departure_offsets": _split(departure_offsets, kept_starts, kept_ends),
         }
-        return flattened
-
-    def generate_routes(group):
-        service_id = group.iloc[0, :]["service_id"]
-        group["route_id"] = [f"{service_id}_{i}" for i in range(len(group))]
-        return group
-
-    trips_db = trips_db[trips_db["service_id"].isin(services)]
-    df = trips_db[["route_id", "trip_id"]].merge(
-        routes_db[
-            routes_db.columns.union(
-                ["route_id", "route_type", "route_short_name", "route_long_name", "route_color"]
-            )
-        ],
-        on="route_id",
-        how="left",
     )
-    df["mode"] = df["route_type"].apply(lambda x: get_mode(x))
-    df = df.merge(
-        stop_times_db[["trip_id", "stop_id", "arrival_time", "departure_time", "stop_sequence"]],
-        on="trip_id",
-        how="left",
+    trips["stops_str"] = trips["ordered_stops"].map(",".join)
+
+    # trips of a GTFS route which visit the same stops make up a genet Route
+    trips = trips.sort_values(["route_id", "stops_str"], kind="stable")
+    pattern_starts = _group_starts(trips["route_id"].to_numpy(), trips["stops_str"].to_numpy())
+    pattern_ends = np.append(pattern_starts[1:], len(trips))
+    patterns = trips.iloc[pattern_starts][
+        ["route_id", "ordered_stops", "arrival_offsets", "departure_offsets"]
+    ].reset_index(drop=True)
+    patterns["trips"] = [
+        {"trip_id": trip_id, "trip_departure_time": trip_departure_time, "vehicle_id": vehicle_id}
+        for trip_id, trip_departure_time, vehicle_id in zip(
+            *(
+                _split(trips[key].tolist(), pattern_starts, pattern_ends)
+                for key in ["trip_id", "trip_departure_time", "vehicle_id"]
+            )
+        )
+    ]
+    patterns["service_id"] = patterns["route_id"].astype(str)
+    patterns["id"] = (
+        patterns["service_id"] + "_" + patterns.groupby("service_id").cumcount().astype(str)
     )
-    df["arrival_time"] = df["arrival_time"].apply(lambda x: get_time(x))
-    df["departure_time"] = df["departure_time"].apply(lambda x: get_time(x))
-
-    df = df.groupby("trip_id", as_index=False).apply(generate_stop_sequence)
-    # drop stop sequences that are single stops
-    df = df[df["ordered_stops"].str.len() > 1]
-    df["vehicle_id"] = [f"veh_{i}" for i in range(len(df))]
-    df = df.groupby(["route_id", "stops_str"], as_index=False).apply(generate_trips)
-    df = df.drop("stops_str", axis=1)
-    df["service_id"] = df["route_id"].astype(str)
-    df = df.groupby(["service_id"], group_keys=False).apply(generate_routes)
+    patterns = patterns.merge(routes_db, on="route_id", how="left").drop(columns="route_id")
 
     g = nx.DiGraph(name="Schedule graph")
     g.graph["crs"] = "epsg:4326"
-    g.graph["route_to_service_map"] = df.set_index("route_id")["service_id"].T.to_dict()
-    g.graph["service_to_route_map"] = df.groupby("service_id")["route_id"].apply(list).to_dict()
+    g.graph["route_to_service_map"] = dict(zip(patterns["id"], patterns["service_id"]))
+    g.graph["service_to_route_map"] = (
+        patterns.groupby("service_id", sort=False)["id"].agg(list).to_dict()
+    )
     g.graph["change_log"] = change_log.ChangeLog()
+    g.graph["routes"] = patterns.set_index(patterns["id"]).to_dict("index")
+    g.graph["services"] = {
+        service_id: {"id": service_id, "name": name}
+        for service_id, name in patterns.groupby("service_id", sort=False)["route_short_name"]
+        .first()
+        .items()
+    }
 
-    df["id"] = df["route_id"]
-    g.graph["routes"] = df.set_index("route_id").T.to_dict()
-    df["id"] = df["service_id"]
-    df = df.rename(columns={"route_short_name": "name"})
-    g.graph["services"] = df[["service_id", "id", "name"]].groupby("service_id").first().T.to_dict()
-
-    # finally nodes
-    stops = pd.DataFrame(
-        {
-            col: np.repeat(df[col].values, df["ordered_stops"].str.len())
-            for col in {"route_id", "service_id"}
-        }
-    ).assign(stop_id=np.concatenate(df["ordered_stops"].values))
-    stop_groups = stops.groupby("stop_id")
-    stops = set(stop_groups.groups)
-    g.add_nodes_from(stops)
-    stops_db = stops_db.rename(columns={"stop_lat": "lat", "stop_lon": "lon", "stop_name": "name"})
+    # finally nodes and edges
+    stop_routes: dict = {}
+    stop_services: dict = {}
+    edges: dict = {}
+    for route_id, service_id, route_stops in zip(
+        patterns["id"], patterns["service_id"], patterns["ordered_stops"]
+    ):
+        for stop in route_stops:
+            stop_routes.setdefault(stop, set()).add(route_id)
+            stop_services.setdefault(stop, set()).add(service_id)
+        for edge in zip(route_stops[:-1], route_stops[1:]):
+            edge_data = edges.setdefault(edge, {"routes": set(), "services": set()})
+            edge_data["routes"].add(route_id)
+            edge_data["services"].add(service_id)
+
+    stops_db = stops_db[stops_db["stop_id"].isin(stop_routes)].rename(
+        columns={"stop_lat": "lat", "stop_lon": "lon", "stop_name": "name"}
+    )
     stops_db["id"] = stops_db["stop_id"]
     stops_db["x"] = stops_db["lon"]
     stops_db["y"] = stops_db["lat"]
     stops_db["epsg"] = "epsg:4326"
-    stops_db["s2_id"] = stops_db.apply(
-        lambda x: spatial.generate_index_s2(lat=float(x["lat"]), lng=float(x["lon"])), axis=1
+    stops_db["s2_id"] = [
+        spatial.generate_index_s2(lat=float(lat), lng=float(lon))
+        for lat, lon in zip(stops_db["lat"], stops_db["lon"])
+    ]
+    stops_data = stops_db.set_index("stop_id").to_dict("index")
+    g.add_nodes_from(
+        (stop, {**stops_data.get(stop, {}), "routes": routes, "services": stop_services[stop]})
+        for stop, routes in stop_routes.items()
     )
-    nx.set_node_attributes(
-        g, stops_db[stops_db["stop_id"].isin(stops)].set_index("stop_id").T.to_dict()
+    g.add_edges_from((u, v, data) for (u, v), data in edges.items())
+    return g
+
+
+def read_gtfs_to_schedule_graph(
+    path: Union[Path, str],
+    day: str,
+    csv_engine: Literal["c", "pyarrow"] = "c",
+    cache_dir: Optional[str] = None,
+) -> nx.DiGraph:
+    """Reads GTFS into a schedule graph.
+
+    Args:
+        path (Union[Path, str]): Path to GTFS folder or a zip file, which is read without extracting it.
+        day (str): 'YYYYMMDD' to use from the GTFS.
+        csv_engine (Literal["c", "pyarrow"], optional): CSV parser of stop times and trips. Defaults to "c".
+        cache_dir (Optional[str], optional):
+            Directory to cache parsed GTFS tables in, see `read_gtfs_to_db_like_tables`. Defaults to None.
+
+    Returns:
+        nx.DiGraph: Schedule graph.
+    """
+    services = read_services_from_calendar(path, day=day)
+    stop_times_db, stops_db, trips_db, routes_db = read_gtfs_to_db_like_tables(
+        path, csv_engine=csv_engine, cache_dir=cache_dir
     )
-    nx.set_node_attributes(
-        g,
-        pd.DataFrame(stop_groups["route_id"].apply(set))
-        .rename(columns={"route_id": "routes"})
-        .T.to_dict(),
+    return gtfs_db_to_schedule_graph(stop_times_db, stops_db, trips_db, routes_db, services)
+
+
+def read_gtfs_feeds_to_db_like_tables(
+    paths: list[Union[Path, str]],
+    day: str,
+    csv_engine: Literal["c", "pyarrow"] = "c",
+    cache_dir: Optional[str] = None,
+) -> list[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+    """Reads GTFS feeds into tables, keeping only the trips (and their stop times) running on the given day.
+
+    Feeds without any services on the day, or without a calendar, are skipped.
+
+    Args:
+        paths (list[Union[Path, str]]): Paths to GTFS folders or zip files.
+        day (str): 'YYYYMMDD' to use from the GTFS.
+        csv_engine (Literal["c", "pyarrow"], optional): CSV parser of stop times and trips. Defaults to "c".
+        cache_dir (Optional[str], optional):
+            Directory to cache parsed GTFS tables in, see `read_gtfs_to_db_like_tables`. Defaults to None.
+
+    Returns:
+        list[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+            stop times, stops, trips and routes tables of each feed which runs on the day.
+    """
+    feeds = []
+    for path in paths:
+        try:
+            services = read_services_from_calendar(path, day=day)
+        except RuntimeError as e:
+            logging.warning(f"Skipping GTFS feed {path}: {e}")
+            continue
+        stop_times_db, stops_db, trips_db, routes_db = read_gtfs_to_db_like_tables(
+            path, csv_engine=csv_engine, cache_dir=cache_dir
+        )
+        trips_db = _remove_unused_categories(trips_db[trips_db["service_id"].isin(services)])
+        stop_times_db = _remove_unused_categories(
+            stop_times_db[stop_times_db["trip_id"].isin(trips_db["trip_id"])]
+        )
+        feeds.append((stop_times_db, stops_db, trips_db, routes_db))
+    return feeds
+
+
+def _remove_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(
+        **{
+            column: df[column].cat.remove_unused_categories()
+            for column in df.columns
+            if isinstance(df[column].dtype, pd.CategoricalDtype)
+        }
+    )
+
+
+def merge_gtfs_tables(
+    feeds: list[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Combines tables of several GTFS feeds, resolving clashes of IDs between feeds.
+
+    GTFS routes (which become Services), trips and stops whose IDs are already used by an earlier feed are given new
+    IDs, suffixed with `_{n}`. Stops with the same ID and coordinates as a stop of an earlier feed are taken to be the
+    same stop and are shared by the feeds, under the ID that stop was given.
+
+    Args:
+        feeds (list[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]]):
+            stop times, stops, trips and routes tables of each feed, see `read_gtfs_feeds_to_db_like_tables`.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]: stop times, stops, trips and routes tables.
+    """
+    feeds = [list(tables) for tables in feeds]
+    unshared_stops, stop_ids, shared_stop_ids = _merge_stops(
+        [stops_db for _, stops_db, _, _ in feeds]
     )
-    nx.set_node_attributes(
-        g,
-        pd.DataFrame(stop_groups["service_id"].apply(set))
-        .rename(columns={"service_id": "services"})
-        .T.to_dict(),
+    for tables, stops_db in zip(feeds, unshared_stops):
+        tables[1] = stops_db
+
+    route_ids = _reindex_clashing_ids([routes_db["route_id"] for _, _, _, routes_db in feeds])
+    trip_ids = _reindex_clashing_ids([trips_db["trip_id"] for _, _, trips_db, _ in feeds])
+    for tables, new_route_ids, new_trip_ids, new_stop_ids, shared_ids in zip(
+        feeds, route_ids, trip_ids, stop_ids, shared_stop_ids
+    ):
+        stop_times_db, stops_db, trips_db, routes_db = tables
+        tables[0] = stop_times_db.assign(
+            trip_id=_rename_ids(stop_times_db["trip_id"], new_trip_ids),
+            stop_id=_rename_ids(stop_times_db["stop_id"], {**shared_ids, **new_stop_ids}),
+        )
+        tables[1] = stops_db.assign(stop_id=_rename_ids(stops_db["stop_id"], new_stop_ids))
+        tables[2] = trips_db.assign(
+            trip_id=_rename_ids(trips_db["trip_id"], new_trip_ids),
+            route_id=_rename_ids(trips_db["route_id"], new_route_ids),
+        )
+        tables[3] = routes_db.assign(route_id=_rename_ids(routes_db["route_id"], new_route_ids))
+    for name, new_ids in [("routes", route_ids), ("trips", trip_ids), ("stops", stop_ids)]:
+        if any(new_ids):
+            logging.warning(
+                f"{sum(map(len, new_ids))} GTFS {name} had IDs clashing with other feeds and were given new IDs"
+            )
+
+    stop_times_db, stops_db, trips_db, routes_db = zip(*feeds)
+    return (
+        _concat_categorical_tables(stop_times_db),
+        pd.concat(stops_db, ignore_index=True),
+        _concat_categorical_tables(trips_db),
+        pd.concat(routes_db, ignore_index=True),
     )
 
-    # and edges
-    df["ordered_stops"] = df["ordered_stops"].apply(lambda x: list(zip(x[:-1], x[1:])))
-    stop_cols = np.concatenate(df["ordered_stops"].values)
-    edges = pd.DataFrame(
+
+def _merge_stops(
+    stops_of_feeds: list[pd.DataFrame],
+) -> tuple[list[pd.DataFrame], list[dict], list[dict]]:
+    """Finds stops of each feed shared with earlier feeds and maps clashing IDs of the rest to new IDs.
+
+    A stop is shared if it has the same ID and coordinates as a stop of an earlier feed, as that stop was given in its
+    own feed. It takes the ID the earlier stop ends up with, which is new if the earlier stop's ID clashed too.
+
+    Returns:
+        tuple[list[pd.DataFrame], list[dict], list[dict]]:
+            For each feed: stops table without shared stops, new IDs of its clashing stops and IDs of its shared stops
+            which differ from the IDs they are shared under.
+    """
+    used_ids = set().union(*(set(stops_db["stop_id"]) for stops_db in stops_of_feeds))
+    earlier_stops = pd.DataFrame(
         {
-            col: np.repeat(df[col].values, df["ordered_stops"].str.len())
-            for col in {"route_id", "service_id"}
+            "stop_id": pd.Series(dtype=object),
+            "stop_lat": pd.Series(dtype=float),
+            "stop_lon": pd.Series(dtype=float),
+            "merged_stop_id": pd.Series(dtype=object),
         }
-    ).assign(from_stop=stop_cols[:, 0], to_stop=stop_cols[:, 1])
-    edge_groups = edges.groupby(["from_stop", "to_stop"])
-    g.add_edges_from(edge_groups.groups)
-    nx.set_edge_attributes(
-        g,
-        pd.DataFrame(edge_groups["route_id"].apply(set))
-        .rename(columns={"route_id": "routes"})
-        .T.to_dict(),
     )
-    nx.set_edge_attributes(
-        g,
-        pd.DataFrame(edge_groups["service_id"].apply(set))
-        .rename(columns={"service_id": "services"})
-        .T.to_dict(),
+    unshared_stops, new_ids_of_feeds, shared_ids_of_feeds = [], [], []
+    for stops_db in stops_of_feeds:
+        locations = stops_db[["stop_id", "stop_lat", "stop_lon"]].astype(
+            {"stop_id": object, "stop_lat": float, "stop_lon": float}
+        )
+        shared_stops = locations.merge(earlier_stops, how="inner")
+        stops_db = stops_db[~stops_db["stop_id"].isin(shared_stops["stop_id"])]
+        new_ids = _reindex_clashing_ids(
+            [earlier_stops["merged_stop_id"], stops_db["stop_id"]], used_ids=used_ids
+        )[1]
+        used_ids |= set(new_ids.values())
+
+        unshared_stops.append(stops_db)
+        new_ids_of_feeds.append(new_ids)
+        shared_ids_of_feeds.append(
+            {
+                stop_id: merged_stop_id
+                for stop_id, merged_stop_id in zip(
+                    shared_stops["stop_id"], shared_stops["merged_stop_id"]
+                )
+                if stop_id != merged_stop_id
+            }
+        )
+        unshared_locations = locations[locations["stop_id"].isin(stops_db["stop_id"])]
+        earlier_stops = pd.concat(
+            [
+                earlier_stops,
+                unshared_locations.assign(
+                    merged_stop_id=unshared_locations["stop_id"].map(
+                        lambda _id: new_ids.get(_id, _id)
+                    )
+                ),
+            ],
+            ignore_index=True,
+        )
+    return unshared_stops, new_ids_of_feeds, shared_ids_of_feeds
+
+
+def _reindex_clashing_ids(
+    ids_of_feeds: list[pd.Series], used_ids: Optional[set] = None
+) -> list[dict]:
+    """Maps IDs of each feed which are used by earlier feeds to new IDs, unused by all feeds (and `used_ids`)."""
+    used_ids = set().union(*(set(ids) for ids in ids_of_feeds), used_ids or set())
+    earlier_ids: set = set()
+    new_ids_of_feeds = []
+    for ids in ids_of_feeds:
+        new_ids = {}
+        for _id in pd.unique(ids[ids.isin(earlier_ids)]):
+            i = 1
+            while f"{_id}_{i}" in used_ids:
+                i += 1
+            new_ids[_id] = f"{_id}_{i}"
+            used_ids.add(new_ids[_id])
+        earlier_ids |= set(ids) - set(new_ids) | set(new_ids.values())
+        new_ids_of_feeds.append(new_ids)
+    return new_ids_of_feeds
+
+
+def _rename_ids(ids: pd.Series, new_ids: dict) -> pd.Series:
+    if not new_ids:
+        return ids
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        return ids.cat.rename_categories(lambda _id: new_ids.get(_id, _id))
+    return ids.map(lambda _id: new_ids.get(_id, _id))
+
+
+def _concat_categorical_tables(tables: list[pd.DataFrame]) -> pd.DataFrame:
+    # unlike `pd.concat`, keeps columns categorical when categories differ between tables
+    return pd.DataFrame(
+        {
+            column: (
+                pd.api.types.union_categoricals([table[column] for table in tables])
+                if isinstance(tables[0][column].dtype, pd.CategoricalDtype)
+                else np.concatenate([table[column].to_numpy() for table in tables])
+            )
+            for column in tables[0].columns
+        }
     )
-    return g
 
 
-def read_gtfs_to_schedule_graph(path: str, day: str):
-    if persistence.is_zip(path):
-        gtfs_path = os.path.join(os.getcwd(), "tmp")
-        if not os.path.exists(gtfs_path):
-            os.makedirs(gtfs_path)
-        import zipfile
-
-        with zipfile.ZipFile(path, "r") as zip_ref:
-            zip_ref.extractall(gtfs_path)
-        gtfs_path = os.path.join(gtfs_path, os.path.splitext(os.path.basename(path))[0])
-    else:
-        gtfs_path = path
+def read_gtfs_feeds_to_schedule_graph(
+    paths: list[Union[Path, str]],
+    day: str,
+    processes: int = 1,
+    csv_engine: Literal["c", "pyarrow"] = "c",
+    cache_dir: Optional[str] = None,
+) -> nx.DiGraph:
+    """Reads several GTFS feeds into a single schedule graph.
 
-    services = read_services_from_calendar(gtfs_path, day=day)
-    stop_times_db, stops_db, trips_db, routes_db = read_gtfs_to_db_like_tables(gtfs_path)
-    schedule_graph = gtfs_db_to_schedule_graph(
-        stop_times_db, stops_db, trips_db, routes_db, services
-    )
+    Feeds are parsed into tables in parallel, their ID clashes are resolved (see `merge_gtfs_tables`) and the schedule
+    graph is built once, from the combined tables.
 
-    if persistence.is_zip(path):
-        shutil.rmtree(os.path.dirname(gtfs_path))
-    return schedule_graph
+    Args:
+        paths (list[Union[Path, str]]): Paths to GTFS folders or zip files.
+        day (str): 'YYYYMMDD' to use from the GTFS.
+        processes (int, optional): Number of processes parsing feeds in parallel. Defaults to 1.
+        csv_engine (Literal["c", "pyarrow"], optional): CSV parser of stop times and trips. Defaults to "c".
+        cache_dir (Optional[str], optional):
+            Directory to cache parsed GTFS tables in, see `read_gtfs_to_db_like_tables`. Defaults to None.
+
+    Raises:
+        RuntimeError: At least one of the feeds must have services on the day selected.
+
+    Returns:
+        nx.DiGraph: Schedule graph.
+    """
+    feeds = parallel.multiprocess_wrap(
+        data=list(paths),
+        split=parallel.split_list,
+        apply=read_gtfs_feeds_to_db_like_tables,
+        combine=parallel.combine_list,
+        processes=min(processes, max(len(paths), 1)),
+        day=day,
+        csv_engine=csv_engine,
+        cache_dir=cache_dir,
+    )
+    if not feeds:
+        raise RuntimeError(f"None of the GTFS feeds have services on: {day}")
+    stop_times_db, stops_db, trips_db, routes_db = merge_gtfs_tables(feeds)
+    return gtfs_db_to_schedule_graph(
+        stop_times_db, stops_db, trips_db, routes_db, services=trips_db["service_id"].unique()
+    )
@@ -1,104 +1,187 @@
+import bisect
+import gc
+import io
+import itertools
 import logging
+import mmap
 import re
+import time
 import xml.etree.cElementTree as ET
-from typing import Optional
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, Union
 
 import networkx as nx
+import numpy as np
+import s2sphere as s2
+import shapely
+from lxml import etree
 from pyproj import Proj, Transformer
+from shapely.geometry.base import BaseGeometry
 
-from genet.schedule_elements import Route, Service, Stop
-from genet.utils import dict_support, java_dtypes, spatial
+import genet.modify.change_log as change_log
+from genet.utils import java_dtypes, parallel, persistence, spatial
 
+NODE_BATCH_SIZE = 100000
 
-def read_node(
-    elem: ET.Element,
-    g: nx.MultiDiGraph,
-    node_id_mapping: dict,
-    node_attribs: dict,
-    transformer: Transformer,
-) -> tuple[nx.MultiDiGraph, dict]:
-    """Adds node elem of the stream to the network.
+
+@dataclass(frozen=True)
+class NetworkFilter:
+    """Elements of a MATSim network to keep while reading it.
 
     Args:
-        elem (ET.Element): Element of the stream.
-        g (nx.MultiDiGraph): Network.
-        node_id_mapping (dict): Mapping from node IDs to S2 IDs.
+        region (Optional[Union[BaseGeometry, s2.CellUnion]], optional):
+            Nodes outside the region, in EPSG:4326, and links connected to them are dropped. Defaults to None.
+        modes (Optional[frozenset], optional):
+            Links which do not allow any of the modes, and nodes left without links, are dropped. Defaults to None.
+        attribute_keys (Optional[frozenset], optional):
+            Additional attributes of nodes and links not under one of these keys are dropped.
+            Link geometry is always kept. Defaults to None.
+    """
+
+    region: Optional[Union[BaseGeometry, s2.CellUnion]] = None
+    modes: Optional[frozenset] = None
+    attribute_keys: Optional[frozenset] = None
+
+    @classmethod
+    def from_inputs(
+        cls,
+        region: Optional[Union[str, BaseGeometry, tuple[float, float, float, float]]] = None,
+        modes: Optional[Union[str, set, list]] = None,
+        attribute_keys: Optional[Union[set, list]] = None,
+    ) -> Optional["NetworkFilter"]:
+        """Builds a filter from user inputs.
+
+        Args:
+            region (Optional[Union[str, BaseGeometry, tuple[float, float, float, float]]], optional):
+                - (min lon, min lat, max lon, max lat) bounding box.
+                - shapely.geometry object, e.g. Polygon, in EPSG:4326.
+                - path to a geojson file, can have multiple features.
+                - string with comma separated hex tokens of Google's S2 geometry.
+                Defaults to None.
+            modes (Optional[Union[str, set, list]], optional): Modes of links to keep. Defaults to None.
+            attribute_keys (Optional[Union[set, list]], optional): Additional attribute keys to keep. Defaults to None.
+
+        Returns:
+            Optional[NetworkFilter]: None if nothing is filtered.
+        """
+        if region is None and modes is None and attribute_keys is None:
+            return None
+        return cls(
+            region=None if region is None else spatial.read_region(region),
+            modes=None if modes is None else frozenset(persistence.setify(modes)),
+            attribute_keys=None if attribute_keys is None else frozenset(attribute_keys),
+        )
+
+    def keeps_link(self, elem: etree._Element) -> bool:
+        """Checks whether a link element of the stream allows any of the modes to keep."""
+        return self.modes is None or not self.modes.isdisjoint(elem.get("modes").split(","))
+
+
+def read_node(elem: etree._Element, node_attribs: dict) -> dict:
+    """Reads node elem of the stream into a dictionary of node attributes.
+
+    Spatial attributes (`lat`, `lon`, `s2_id`) are added in bulk by `add_nodes`.
+
+    Args:
+        elem (etree._Element): Element of the stream.
         node_attribs (dict): Node attributes to attach to the node in the network object.
-        transformer (Transformer): PyProj CRS Transformer to update the `elem` `x`/`y` coordinates to `lat`/`lon`.
 
     Returns:
-        tuple[nx.MultiDiGraph, dict]: Network with added node; found duplicated node IDs.
+        dict: Node attributes.
     """
-    duplicated_node_id = {}
-    attribs = elem.attrib
+    attribs = dict(elem.items())
     attribs["x"], attribs["y"] = float(attribs["x"]), float(attribs["y"])
 
     if "z" in attribs:
         attribs["z"] = float(attribs["z"])
 
-    lon, lat = spatial.change_proj(attribs["x"], attribs["y"], transformer)
+    if node_attribs:
+        attribs["attributes"] = node_attribs
+    return attribs
+
+
+def project_nodes(
+    nodes: list[dict],
+    transformer: Transformer,
+    region: Optional[Union[BaseGeometry, s2.CellUnion]] = None,
+) -> list[dict]:
+    """Adds spatial attributes (`lat`, `lon`, `s2_id`) to a batch of nodes read from the stream, in-place.
+
+    Args:
+        nodes (list[dict]): Node attributes, as read by `read_node`.
+        transformer (Transformer): PyProj CRS Transformer to update the `x`/`y` coordinates to `lat`/`lon`.
+        region (Optional[Union[BaseGeometry, s2.CellUnion]], optional):
+            If given, only nodes within this EPSG:4326 region are kept. Defaults to None.
+
+    Returns:
+        list[dict]: `nodes` with spatial attributes.
+    """
+    if not nodes:
+        return nodes
+    lons, lats = spatial.change_proj(
+        np.fromiter((attribs["x"] for attribs in nodes), dtype=float, count=len(nodes)),
+        np.fromiter((attribs["y"] for attribs in nodes), dtype=float, count=len(nodes)),
+        transformer,
+    )
+    if isinstance(region, BaseGeometry):
+        in_region = shapely.intersects_xy(region, lons, lats)
+        nodes = list(itertools.compress(nodes, in_region))
+        lons, lats = lons[in_region], lats[in_region]
     # ideally we would check if the transformer was created with always_xy=True and swap
     # lat and long values if so, but there is no obvious way to interrogate the transformer
-    attribs["lon"], attribs["lat"] = lon, lat
-    attribs["s2_id"] = spatial.generate_index_s2(lat, lon)
+    for attribs, lon, lat in zip(nodes, lons.tolist(), lats.tolist()):
+        attribs["lon"], attribs["lat"] = lon, lat
+        attribs["s2_id"] = spatial.generate_index_s2(lat, lon)
+    if isinstance(region, s2.CellUnion):
+        nodes = [attribs for attribs in nodes if region.intersects(s2.CellId(attribs["s2_id"]))]
+    return nodes
 
-    if node_attribs:
-        attribs["attributes"] = node_attribs
 
-    node_id = attribs["id"]
-    if node_id in node_id_mapping:
-        logging.warning(
-            "This MATSim network has a node that is not unique: {}. Generating a new id would"
-            "be pointless as we don't know which links should be connected to this particular"
-            "node. The node will cease to exist and the first encountered node with this id"
-            "will be kept. Investigate the links connected to that node.".format(node_id)
-        )
-        duplicated_node_id[node_id] = attribs
-    else:
-        node_id_mapping[node_id] = attribs["s2_id"]
-        g.add_node(node_id, **attribs)
-    return g, duplicated_node_id
-
-
-def read_link(
-    elem: ET.Element,
-    g: nx.MultiDiGraph,
-    u: str,
-    v: str,
-    node_id_mapping: dict,
-    link_id_mapping: dict,
-    link_attribs: dict,
-) -> tuple[nx.MultiDiGraph, str, str, dict, dict]:
-    """Adds link elem of the stream to the network
+def add_nodes(g: nx.MultiDiGraph, nodes: list[dict], node_id_mapping: dict) -> dict:
+    """Adds a batch of nodes read from the stream, with spatial attributes, to the network.
 
     Args:
-        elem (ET.Element): Element of the stream.
         g (nx.MultiDiGraph): Network.
-        u (str): `from` node of the previous link.
-        v (str): `to` node of the previous link.
-        node_id_mapping (dict): Mapping from node IDs to S2 IDs.
-        link_id_mapping (dict): Mapping from link ID to node to and from IDs.
-        link_attribs (dict): link attributes of the previous link.
+        nodes (list[dict]): Node attributes, as read by `read_node` and `project_nodes`.
+        node_id_mapping (dict): Mapping from node IDs to S2 IDs, updated in-place.
 
     Returns:
-        tuple[nx.MultiDiGraph, str, str, dict, dict]:
-            Network with added link;
-            `from` node ID of link;
-            `to` node ID of link;
-            `link_id_mapping` with mapping for the newly added link;
-            found duplicated link IDs.
+        dict: Found duplicated node IDs: `{node ID: [attributes of each duplicated node]}`.
     """
+    duplicated_node_ids: dict = {}
+    nodes_to_add = []
+    for attribs in nodes:
+        node_id = attribs["id"]
+        if node_id in node_id_mapping:
+            logging.warning(
+                "This MATSim network has a node that is not unique: {}. Generating a new id would"
+                "be pointless as we don't know which links should be connected to this particular"
+                "node. The node will cease to exist and the first encountered node with this id"
+                "will be kept. Investigate the links connected to that node.".format(node_id)
+            )
+            duplicated_node_ids.setdefault(node_id, []).append(attribs)
+        else:
+            node_id_mapping[node_id] = attribs["s2_id"]
+            nodes_to_add.append((node_id, attribs))
+    g.add_nodes_from(nodes_to_add)
+    return duplicated_node_ids
 
-    duplicated_link_id = {}
 
-    attribs = elem.attrib
-    attribs["s2_from"] = node_id_mapping[attribs["from"]]
-    attribs["s2_to"] = node_id_mapping[attribs["to"]]
-    attribs["modes"] = set(attribs["modes"].split(","))
+def read_link(elem: etree._Element, link_attribs: dict) -> dict:
+    """Reads link elem of the stream into a dictionary of link attributes.
 
-    link_id, duplicated_link_id = unique_link_id(attribs["id"], link_id_mapping)
-    attribs["id"] = link_id
-    link_id_mapping[link_id] = {"from": attribs["from"], "to": attribs["to"]}
+    Attributes depending on the rest of the network (`s2_from`, `s2_to`, unique `id`) are added by `add_link`.
+
+    Args:
+        elem (etree._Element): Element of the stream.
+        link_attribs (dict): Additional attributes of the link.
+
+    Returns:
+        dict: Link attributes.
+    """
+    attribs = dict(elem.items())
+    attribs["modes"] = set(attribs["modes"].split(","))
 
     for key in ["freespeed", "capacity", "permlanes"]:
         try:
@@ -106,14 +189,9 @@ def read_link(
         except KeyError:
             logging.warning(
                 "Key: {} is not present in link: {}. This may lead to problems if using this"
-                "network with MATSim."
+                "network with MATSim.".format(key, attribs["id"])
             )
-
-    length = float(attribs["length"])
-    del attribs["length"]
-
-    u = attribs["from"]
-    v = attribs["to"]
+    attribs["length"] = float(attribs["length"])
 
     if link_attribs:
         if "geometry" in link_attribs:
@@ -124,13 +202,59 @@ def read_link(
                 del link_attribs["geometry"]
         if link_attribs:
             attribs["attributes"] = link_attribs
+    return attribs
 
-    if g.has_edge(u, v):
-        link_id_mapping[link_id]["multi_edge_idx"] = len(g[u][v])
-    else:
-        link_id_mapping[link_id]["multi_edge_idx"] = 0
-    g.add_weighted_edges_from([(u, v, length)], weight="length", **attribs)
-    return g, u, v, link_id_mapping, duplicated_link_id
+
+def add_link(
+    attribs: dict, node_id_mapping: dict, link_id_mapping: dict, multi_edge_counts: dict
+) -> tuple[tuple[str, str, int, dict], dict]:
+    """Prepares a link read from the stream to be added to the network.
+
+    Args:
+        attribs (dict): Link attributes, as read by `read_link`.
+        node_id_mapping (dict): Mapping from node IDs to S2 IDs.
+        link_id_mapping (dict): Mapping from link ID to node to and from IDs, updated in-place.
+        multi_edge_counts (dict): Number of links read so far between each pair of nodes, updated in-place.
+
+    Returns:
+        tuple[tuple[str, str, int, dict], dict]:
+            Edge as (`from` node ID, `to` node ID, multi edge index, link attributes);
+            found duplicated link IDs.
+    """
+    u = attribs["from"]
+    v = attribs["to"]
+    attribs["s2_from"] = node_id_mapping[u]
+    attribs["s2_to"] = node_id_mapping[v]
+
+    link_id, duplicated_link_id = unique_link_id(attribs["id"], link_id_mapping)
+    attribs["id"] = link_id
+
+    multi_edge_idx = multi_edge_counts.get((u, v), 0)
+    multi_edge_counts[(u, v)] = multi_edge_idx + 1
+    link_id_mapping[link_id] = {"from": u, "to": v, "multi_edge_idx": multi_edge_idx}
+    return (u, v, multi_edge_idx, attribs), duplicated_link_id
+
+
+@contextmanager
+def _gc_paused():
+    """Pauses cyclic garbage collection.
+
+    Reading creates millions of long-lived, acyclic objects which otherwise trigger repeated full collections.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _clear_element(elem: etree._Element):
+    """Frees a processed element of the stream, and any of its processed siblings, from the parsed tree."""
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
 
 
 def update_additional_attrib(
@@ -153,6 +277,31 @@ def update_additional_attrib(
     return attribs
 
 
+def read_elem_additional_attribs(
+    elem: etree._Element,
+    force_long_form_attributes: bool = False,
+    attribute_keys: Optional[frozenset] = None,
+) -> dict:
+    """Reads all additional attributes of a node or link element of the stream.
+
+    Args:
+        elem (etree._Element): Stream element with an `attributes` child element.
+        force_long_form_attributes (bool, optional):
+            If True the additional attributes will be read into long form. Defaults to False.
+        attribute_keys (Optional[frozenset], optional):
+            If given, only these additional attributes, and link geometry, are read. Defaults to None.
+
+    Returns:
+        dict: `elem` additional attributes.
+    """
+    attribs: dict = {}
+    for attrib_elem in elem.iterfind("attributes/attribute"):
+        name = attrib_elem.get("name")
+        if attribute_keys is None or name in attribute_keys or name == "geometry":
+            attribs = update_additional_attrib(attrib_elem, attribs, force_long_form_attributes)
+    return attribs
+
+
 def read_additional_attrib(elem: ET.Element, force_long_form_attributes: bool = False) -> dict:
     """Reads additional attributes dictionary from stream.
 
@@ -228,7 +377,11 @@ def unique_link_id(link_id, link_id_mapping):
 
 
 def read_network(
-    network_path: str, transformer: Transformer, force_long_form_attributes: bool = False
+    network_path: str,
+    transformer: Transformer,
+    force_long_form_attributes: bool = False,
+    processes: int = 1,
+    network_filter: Optional[NetworkFilter] = None,
 ) -> tuple[nx.MultiDiGraph, dict, dict, dict, dict]:
     """Read MATSim network.
 
@@ -252,6 +405,12 @@ def read_network(
                 Network level attributes cannot be forced to be read into long form.
 
             Defaults to False.
+        processes (int, optional):
+            Number of parallel processes to parse the `nodes` and `links` of the file across, in chunks.
+            Defaults to 1.
+        network_filter (Optional[NetworkFilter], optional):
+            If given, nodes, links and additional attributes which do not pass the filter are dropped while parsing.
+            Defaults to None.
 
     Returns:
         tuple[nx.MultiDiGraph, dict, dict, dict, dict]:
@@ -260,74 +419,399 @@ def read_network(
             MATSIM link ID to node ID mapping: `{network link ID : {'from': from node ID, 'to': to node ID, 's2_from' : from node S2 spatial ID, 's2_to': to node S2 spatial ID}}`
             Network additional attribute dictionary.
     """
+    start_time = time.time()
+    with _gc_paused():
+        sections = None
+        if processes > 1:
+            if persistence.compression_of(network_path) is None:
+                sections = _find_network_sections(network_path)
+            else:
+                logging.info(
+                    f"{network_path} is compressed and will be read in a single process. "
+                    "Decompress it first to read it in parallel chunks."
+                )
+        if sections is None:
+            with persistence.open_file(network_path) as f:
+                network_data = _read_network_stream(
+                    f, transformer, force_long_form_attributes, network_filter
+                )
+        else:
+            network_data = _read_network_in_chunks(
+                network_path,
+                sections,
+                transformer,
+                force_long_form_attributes,
+                processes,
+                network_filter,
+            )
+    g = network_data[0]
+
+    duration = time.time() - start_time
+    logging.info(
+        f"Read {g.number_of_nodes()} nodes and {g.number_of_edges()} links in {duration:.1f}s "
+        f"({g.number_of_edges() / max(duration, 1e-9):.0f} links/s)"
+    )
+    return network_data
+
+
+def _read_network_stream(
+    f,
+    transformer: Transformer,
+    force_long_form_attributes: bool = False,
+    network_filter: Optional[NetworkFilter] = None,
+) -> tuple[nx.MultiDiGraph, dict, dict, dict, dict]:
+    network_filter = network_filter or NetworkFilter()
     g = nx.MultiDiGraph()
 
     network_attributes: dict = {}
     node_id_mapping: dict = {}
-    node_attribs: dict = {}
     link_id_mapping: dict = {}
-    link_attribs: dict = {}
     duplicated_link_ids: dict = {}
     duplicated_node_ids: dict = {}
-    u: Optional[str] = None
-    v: Optional[str] = None
-
-    elem_themes_for_additional_attributes = {"network", "nodes", "links"}
-    elem_type_for_additional_attributes = None
-
-    for event, elem in ET.iterparse(network_path, events=("start", "end")):
-        if event == "start":
-            if elem.tag in elem_themes_for_additional_attributes:
-                elem_type_for_additional_attributes = elem.tag
-        elif event == "end":
-            if elem.tag == "node":
-                g, duplicated_node_id = read_node(
-                    elem, g, node_id_mapping, node_attribs, transformer
+    # nodes and links are buffered and added to the graph in bulk
+    nodes: list = []
+    links: list = []
+    multi_edge_counts: dict = {}
+
+    def flush_nodes():
+        for key, val in add_nodes(
+            g, project_nodes(nodes, transformer, network_filter.region), node_id_mapping
+        ).items():
+            duplicated_node_ids.setdefault(key, []).extend(val)
+        nodes.clear()
+
+    for _, elem in etree.iterparse(f, events=("end",), tag=("node", "nodes", "link", "attributes")):
+        if elem.tag == "node":
+            nodes.append(
+                read_node(
+                    elem,
+                    read_elem_additional_attribs(
+                        elem, force_long_form_attributes, network_filter.attribute_keys
+                    ),
                 )
-                if duplicated_node_id:
-                    for key, val in duplicated_node_id.items():
-                        if key in duplicated_node_ids:
-                            duplicated_node_ids[key].append(val)
-                        else:
-                            duplicated_node_ids[key] = [val]
-                # reset node_attribs
-                node_attribs = {}
-            elif elem.tag == "link":
-                g, u, v, link_id_mapping, duplicated_link_id = read_link(
-                    elem, g, u, v, node_id_mapping, link_id_mapping, link_attribs
+            )
+            _clear_element(elem)
+            if len(nodes) >= NODE_BATCH_SIZE:
+                flush_nodes()
+        elif elem.tag == "link":
+            if network_filter.keeps_link(elem) and _has_nodes(
+                elem, node_id_mapping, network_filter
+            ):
+                link, duplicated_link_id = add_link(
+                    read_link(
+                        elem,
+                        read_elem_additional_attribs(
+                            elem, force_long_form_attributes, network_filter.attribute_keys
+                        ),
+                    ),
+                    node_id_mapping,
+                    link_id_mapping,
+                    multi_edge_counts,
                 )
-                if duplicated_link_id:
-                    for key, val in duplicated_link_id.items():
-                        if key in duplicated_link_ids:
-                            duplicated_link_ids[key].append(val)
-                        else:
-                            duplicated_link_ids[key] = [val]
-                # reset link_attribs
-                link_attribs = {}
-            elif elem.tag == "attribute":
-                if elem_type_for_additional_attributes == "links":
-                    link_attribs = update_additional_attrib(
-                        elem, link_attribs, force_long_form_attributes
-                    )
-                elif elem_type_for_additional_attributes == "network":
-                    if force_long_form_attributes:
-                        logging.warning(
-                            "Network-level additional attributes are always read into short form."
-                        )
-                    network_attributes = update_additional_attrib(
-                        elem, network_attributes, force_long_form_attributes=False
-                    )
-                elif elem_type_for_additional_attributes == "nodes":
-                    node_attribs = update_additional_attrib(
-                        elem, node_attribs, force_long_form_attributes
+                links.append(link)
+                for key, val in duplicated_link_id.items():
+                    duplicated_link_ids.setdefault(key, []).append(val)
+            _clear_element(elem)
+        elif elem.tag == "nodes":
+            # links reference the spatial index of nodes
+            flush_nodes()
+        elif elem.getparent() is not None and elem.getparent().tag == "network":
+            if force_long_form_attributes:
+                logging.warning(
+                    "Network-level additional attributes are always read into short form."
+                )
+            for attrib_elem in elem.iterfind("attribute"):
+                network_attributes = update_additional_attrib(
+                    attrib_elem, network_attributes, force_long_form_attributes=False
+                )
+    g.add_edges_from(links)
+    _remove_unused_nodes(g, network_filter)
+    return g, link_id_mapping, duplicated_node_ids, duplicated_link_ids, network_attributes
+
+
+def _has_nodes(elem: etree._Element, node_id_mapping: dict, network_filter: NetworkFilter) -> bool:
+    """Checks whether both nodes of a link element of the stream were kept by the spatial filter."""
+    return network_filter.region is None or (
+        elem.get("from") in node_id_mapping and elem.get("to") in node_id_mapping
+    )
+
+
+def _remove_unused_nodes(g: nx.MultiDiGraph, network_filter: NetworkFilter):
+    """Removes nodes left without links by the modal filter."""
+    if network_filter.modes is not None:
+        g.remove_nodes_from([node for node, degree in g.degree() if degree == 0])
+
+
+def _find_unparsed_spans(mm: mmap.mmap) -> list[tuple[int, int]]:
+    """Finds byte ranges of XML comments and CDATA sections, in which element-like text is not markup.
+
+    Args:
+        mm (mmap.mmap): Memory map of an XML file.
+
+    Returns:
+        list[tuple[int, int]]: (start, end) byte ranges, in file order.
+    """
+    spans = []
+    position = mm.find(b"<!")
+    while position != -1:
+        for opening, closing in ((b"<!--", b"-->"), (b"<![CDATA[", b"]]>")):
+            if mm[position : position + len(opening)] == opening:
+                end = mm.find(closing, position + len(opening))
+                end = len(mm) if end == -1 else end + len(closing)
+                spans.append((position, end))
+                position = end
+                break
+        else:
+            # other declarations, e.g. <!DOCTYPE
+            position += 2
+        position = mm.find(b"<!", position)
+    return spans
+
+
+def _search_markup(
+    pattern: re.Pattern,
+    mm: mmap.mmap,
+    position: int,
+    end: int,
+    unparsed_spans: list[tuple[int, int]],
+) -> Optional[re.Match]:
+    """Searches for `pattern` between `position` and `end`, skipping matches inside comments and CDATA sections.
+
+    Args:
+        pattern (re.Pattern): Compiled bytes pattern.
+        mm (mmap.mmap): Memory map of an XML file.
+        position (int): Byte to start searching from.
+        end (int): Byte to stop searching at.
+        unparsed_spans (list[tuple[int, int]]): Comments and CDATA sections, as found by `_find_unparsed_spans`.
+
+    Returns:
+        Optional[re.Match]: First match outside of comments and CDATA sections, None if there is none.
+    """
+    span_starts = [start for start, _ in unparsed_spans]
+    while True:
+        match = pattern.search(mm, position, end)
+        if match is None:
+            return None
+        i = bisect.bisect_right(span_starts, match.start()) - 1
+        if i < 0 or unparsed_spans[i][1] <= match.start():
+            return match
+        position = unparsed_spans[i][1]
+
+
+def _xml_declaration(mm: mmap.mmap) -> bytes:
+    """The XML declaration, e.g. `<?xml version="1.0" encoding="ISO-8859-1"?>`, at the start of a file, if any."""
+    match = re.match(rb"(?:\xef\xbb\xbf)?\s*(<\?xml[^>]*\?>)", mm)
+    return b"" if match is None else match.group(1)
+
+
+def _find_network_sections(network_path: str) -> Optional[dict[str, tuple[int, int]]]:
+    """Finds byte ranges of the contents of `nodes` and `links` elements of a MATSim network file.
+
+    Element tags inside XML comments and CDATA sections are ignored.
+
+    Args:
+        network_path (str): path to the network.xml file.
+
+    Returns:
+        Optional[dict[str, tuple[int, int]]]:
+            {'nodes': (start, end), 'links': (start, end)} byte ranges, None if the file cannot be split.
+    """
+    sections = {}
+    with open(network_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        unparsed_spans = _find_unparsed_spans(mm)
+        position = 0
+        for section in ["nodes", "links"]:
+            match = _search_markup(
+                re.compile(rb"<%s[\s>/]" % section.encode()), mm, position, len(mm), unparsed_spans
+            )
+            if match is None:
+                return None
+            start = mm.find(b">", match.start()) + 1
+            if mm[start - 2 : start - 1] == b"/":
+                # self-closing, empty section
+                end = start
+            else:
+                match = _search_markup(
+                    re.compile(rb"</%s\s*>" % section.encode()), mm, start, len(mm), unparsed_spans
+                )
+                if match is None:
+                    return None
+                end = match.start()
+            sections[section] = (start, end)
+            position = end
+    return sections
+
+
+def _split_network_sections(
+    network_path: str, sections: dict[str, tuple[int, int]], no_chunks: int
+) -> list[tuple[str, str, int, int]]:
+    """Splits `nodes` and `links` sections of a MATSim network file into chunks aligned on element boundaries.
+
+    Chunks are only split on elements outside of XML comments and CDATA sections.
+
+    Args:
+        network_path (str): path to the network.xml file.
+        sections (dict[str, tuple[int, int]]): byte ranges of the sections, as found by `_find_network_sections`.
+        no_chunks (int): Approximate total number of chunks, of similar size, to split the sections into.
+
+    Returns:
+        list[tuple[str, str, int, int]]: (path, section, start, end) of each chunk, in file order.
+    """
+    chunk_size = max(sum(end - start for start, end in sections.values()) / no_chunks, 1)
+    chunks = []
+    with open(network_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        unparsed_spans = _find_unparsed_spans(mm)
+        for section, (start, end) in sections.items():
+            element_start = re.compile(rb"<%s[\s>/]" % section[:-1].encode())
+            boundaries = [start]
+            for i in range(1, round((end - start) / chunk_size)):
+                match = _search_markup(
+                    element_start,
+                    mm,
+                    max(start + int(i * chunk_size), boundaries[-1] + 1),
+                    end,
+                    unparsed_spans,
+                )
+                if match is None:
+                    break
+                boundaries.append(match.start())
+            boundaries.append(end)
+            chunks.extend(
+                (network_path, section, chunk_start, chunk_end)
+                for chunk_start, chunk_end in zip(boundaries[:-1], boundaries[1:])
+                if chunk_end > chunk_start
+            )
+    return chunks
+
+
+def _read_network_chunks(
+    chunks: list[tuple[str, str, int, int]],
+    transformer: Transformer,
+    force_long_form_attributes: bool = False,
+    network_filter: Optional[NetworkFilter] = None,
+    declaration: bytes = b"",
+) -> list[tuple[str, dict[str, list]]]:
+    """Parses chunks of `nodes` and `links` sections of a MATSim network file into columns of attributes.
+
+    Args:
+        chunks (list[tuple[str, str, int, int]]): (path, section, start, end) of chunks to parse.
+        transformer (Transformer): PyProj CRS Transformer to update the node `x`/`y` coordinates to `lat`/`lon`.
+        force_long_form_attributes (bool, optional):
+            If True the additional attributes will be read into long form. Defaults to False.
+        network_filter (Optional[NetworkFilter], optional):
+            If given, nodes outside of its region and links without its modes are dropped. Defaults to None.
+        declaration (bytes, optional):
+            XML declaration of the network file, parsed with each chunk so that its encoding is kept.
+            Defaults to b"" (UTF-8).
+
+    Returns:
+        list[tuple[str, dict[str, list]]]:
+            (section, {attribute key: values of each element, `None` where it's missing}) of each chunk.
+    """
+    network_filter = network_filter or NetworkFilter()
+    parsed_chunks = []
+    with _gc_paused():
+        for network_path, section, start, end in chunks:
+            with open(network_path, "rb") as f:
+                f.seek(start)
+                data = f.read(end - start)
+            records = []
+            for _, elem in etree.iterparse(
+                io.BytesIO(
+                    b"%s<%s>%s</%s>" % (declaration, section.encode(), data, section.encode())
+                ),
+                events=("end",),
+                tag=section[:-1],
+            ):
+                if section == "nodes" or network_filter.keeps_link(elem):
+                    additional_attribs = read_elem_additional_attribs(
+                        elem, force_long_form_attributes, network_filter.attribute_keys
                     )
+                    if section == "nodes":
+                        records.append(read_node(elem, additional_attribs))
+                    else:
+                        records.append(read_link(elem, additional_attribs))
+                _clear_element(elem)
+            if section == "nodes":
+                records = project_nodes(records, transformer, network_filter.region)
+            # columns are much cheaper to pass between processes than records
+            keys = dict.fromkeys(itertools.chain.from_iterable(records))
+            parsed_chunks.append(
+                (section, {key: [record.get(key) for record in records] for key in keys})
+            )
+    return parsed_chunks
+
+
+def _read_network_in_chunks(
+    network_path: str,
+    sections: dict[str, tuple[int, int]],
+    transformer: Transformer,
+    force_long_form_attributes: bool = False,
+    processes: int = 1,
+    network_filter: Optional[NetworkFilter] = None,
+) -> tuple[nx.MultiDiGraph, dict, dict, dict, dict]:
+    network_filter = network_filter or NetworkFilter()
+    # everything outside of the nodes and links, i.e. network level attributes
+    with open(network_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        skeleton = (
+            mm[: sections["nodes"][0]]
+            + mm[sections["nodes"][1] : sections["links"][0]]
+            + mm[sections["links"][1] :]
+        )
+        declaration = _xml_declaration(mm)
+    g, link_id_mapping, duplicated_node_ids, duplicated_link_ids, network_attributes = (
+        _read_network_stream(io.BytesIO(skeleton), transformer, force_long_form_attributes)
+    )
+
+    parsed_chunks = parallel.multiprocess_wrap(
+        data=_split_network_sections(network_path, sections, no_chunks=processes * 4),
+        split=parallel.split_list,
+        apply=_read_network_chunks,
+        combine=parallel.combine_list,
+        processes=processes,
+        transformer=transformer,
+        force_long_form_attributes=force_long_form_attributes,
+        network_filter=network_filter,
+        declaration=declaration,
+    )
+
+    # merge chunks in file order, resolving clashing IDs as in a sequential read
+    node_id_mapping: dict = {}
+    multi_edge_counts: dict = {}
+    links = []
+    for section, columns in parsed_chunks:
+        records = [
+            {key: val for key, val in zip(columns, values) if val is not None}
+            for values in zip(*columns.values())
+        ]
+        if section == "nodes":
+            for key, val in add_nodes(g, records, node_id_mapping).items():
+                duplicated_node_ids.setdefault(key, []).extend(val)
+        else:
+            for attribs in records:
+                if network_filter.region is not None and not (
+                    attribs["from"] in node_id_mapping and attribs["to"] in node_id_mapping
+                ):
+                    continue
+                link, duplicated_link_id = add_link(
+                    attribs, node_id_mapping, link_id_mapping, multi_edge_counts
+                )
+                links.append(link)
+                for key, val in duplicated_link_id.items():
+                    duplicated_link_ids.setdefault(key, []).append(val)
+    g.add_edges_from(links)
+    _remove_unused_nodes(g, network_filter)
     return g, link_id_mapping, duplicated_node_ids, duplicated_link_ids, network_attributes
 
 
 def read_schedule(
     schedule_path: str, epsg: str, force_long_form_attributes: bool = False
-) -> tuple[list, dict, dict, dict]:
-    """Read MATSim schedule.
+) -> tuple[nx.DiGraph, dict, dict]:
+    """Read MATSim schedule straight into a schedule graph.
+
+    The file is streamed in a single pass, each `transitLine` is read into the node, edge, route and service data of
+    the graph once it has been parsed in full, and the graph is built in bulk at the end.
+    Clashing service and route IDs are re-indexed as in `genet.Schedule`.
 
     Args:
         schedule_path (str): Path to the `schedule.xml` file.
@@ -351,202 +835,219 @@ def read_schedule(
             Defaults to False.
 
     Returns:
-        tuple[list, dict, dict, dict]:
-            list of Service objects;
+        tuple[nx.DiGraph, dict, dict]:
+            Schedule graph, with all transit stops as nodes;
             Minimal transfer times between stops;
-            Transit stop ID mapping;
             Schedule additional attributes.
-
     """
-    services = []
-    transformer = Transformer.from_proj(Proj(epsg), Proj("epsg:4326"), always_xy=True)
-
-    def write_transitLinesTransitRoute(transitLine, transitRoutes, transportMode):
-        mode = transportMode["transportMode"]
-        service_id = transitLine["transitLine_data"]["id"]
-        service_routes = []
-        for transitRoute, transitRoute_val in transitRoutes.items():
-            stops = [
-                Stop(
-                    s["stop"]["refId"],
-                    x=transit_stop_id_mapping[s["stop"]["refId"]]["x"],
-                    y=transit_stop_id_mapping[s["stop"]["refId"]]["y"],
-                    epsg=epsg,
-                    transformer=transformer,
-                )
-                for s in transitRoute_val["stops"]
-            ]
-            for s in stops:
-                s.add_additional_attributes(transit_stop_id_mapping[s.id])
-
-            arrival_offsets = []
-            departure_offsets = []
-            await_departure = []
-            for stop in transitRoute_val["stops"]:
-                if "departureOffset" not in stop["stop"] and "arrivalOffset" not in stop["stop"]:
-                    pass
-                elif "departureOffset" not in stop["stop"]:
-                    arrival_offsets.append(stop["stop"]["arrivalOffset"])
-                    departure_offsets.append(stop["stop"]["arrivalOffset"])
-                elif "arrivalOffset" not in stop["stop"]:
-                    arrival_offsets.append(stop["stop"]["departureOffset"])
-                    departure_offsets.append(stop["stop"]["departureOffset"])
-                else:
-                    arrival_offsets.append(stop["stop"]["arrivalOffset"])
-                    departure_offsets.append(stop["stop"]["departureOffset"])
-
-                if "awaitDeparture" in stop["stop"]:
-                    await_departure.append(
-                        str(stop["stop"]["awaitDeparture"]).lower() in ["true", "1"]
-                    )
-
-            route = [r_val["link"]["refId"] for r_val in transitRoute_val["links"]]
-
-            trips = {"trip_id": [], "trip_departure_time": [], "vehicle_id": []}
-            for dep in transitRoute_val["departure_list"]:
-                trips["trip_id"].append(dep["departure"]["id"])
-                trips["trip_departure_time"].append(dep["departure"]["departureTime"])
-                trips["vehicle_id"].append(dep["departure"]["vehicleRefId"])
-
-            r = Route(
-                route_short_name=transitLine["transitLine_data"]["name"],
-                mode=mode,
-                stops=stops,
-                network_links=route,
-                trips=trips,
-                arrival_offsets=arrival_offsets,
-                departure_offsets=departure_offsets,
-                id=transitRoute,
-                await_departure=await_departure,
-            )
-            if transitRoute_val["attributes"]:
-                r.add_additional_attributes({"attributes": transitRoute_val["attributes"]})
-            service_routes.append(r)
-        _service = Service(id=service_id, routes=service_routes)
-        if transitLine["attributes"]:
-            _service.add_additional_attributes({"attributes": transitLine["attributes"]})
-        services.append(_service)
-
-    transitLine: dict = {}
-    transitRoutes: dict = {}
-    transportMode: dict = {}
-    transit_stop_id_mapping: dict = {}
-    is_minimalTransferTimes = False
-
+    g = nx.DiGraph(name="Schedule graph")
+    g.graph["crs"] = epsg
+    g.graph["routes"] = {}
+    g.graph["services"] = {}
+    g.graph["route_to_service_map"] = {}
+    g.graph["service_to_route_map"] = {}
+    g.graph["change_log"] = change_log.ChangeLog()
+
+    stops: dict = {}
+    edges: dict = {}
     # {'stop_id_1': {'stop_id_2': 0.0}} seconds_to_transfer between stop_id_1 and stop_id_2
-    minimalTransferTimes: dict = {}
-
-    elem_themes_for_additional_attributes = {
-        "transitSchedule",
-        "stopFacility",
-        "transitLine",
-        "transitRoute",
-    }
-    elem_type_for_additional_attributes = None
+    minimal_transfer_times: dict = {}
     schedule_attribs: dict = {}
-    # Track IDs through the stream
-    current_stop_id = None
-    current_route_id = None
-
-    # transitLines
-    for event, elem in ET.iterparse(schedule_path, events=("start", "end")):
-        if event == "start":
-            if elem.tag in elem_themes_for_additional_attributes:
-                elem_type_for_additional_attributes = elem.tag
 
+    with _gc_paused(), persistence.open_file(schedule_path) as f:
+        for _, elem in etree.iterparse(
+            f, events=("end",), tag=("stopFacility", "relation", "transitLine", "attributes")
+        ):
             if elem.tag == "stopFacility":
-                attribs = elem.attrib
-                attribs["epsg"] = epsg
-                attribs["x"] = float(attribs["x"])
-                attribs["y"] = float(attribs["y"])
-                if attribs["id"] not in transit_stop_id_mapping:
-                    transit_stop_id_mapping[attribs["id"]] = attribs
-                current_stop_id = attribs["id"]
-
-            elif elem.tag == "minimalTransferTimes":
-                is_minimalTransferTimes = not is_minimalTransferTimes
+                stop_id = elem.get("id")
+                if stop_id not in stops:
+                    stops[stop_id] = read_stop_facility(elem, epsg, force_long_form_attributes)
+                _clear_element(elem)
             elif elem.tag == "relation":
-                if is_minimalTransferTimes:
-                    attribs = elem.attrib
-                    minimalTransferTimes = dict_support.merge_complex_dictionaries(
-                        minimalTransferTimes,
-                        {attribs["fromStop"]: {attribs["toStop"]: float(attribs["transferTime"])}},
-                    )
+                minimal_transfer_times.setdefault(elem.get("fromStop"), {})[elem.get("toStop")] = (
+                    float(elem.get("transferTime"))
+                )
+                _clear_element(elem)
             elif elem.tag == "transitLine":
-                if transitLine:
-                    write_transitLinesTransitRoute(transitLine, transitRoutes, transportMode)
-                transitLine = {"transitLine_data": elem.attrib, "attributes": {}}
-                transitRoutes = {}
-
-            elif elem.tag == "transitRoute":
-                transitRoutes[elem.attrib["id"]] = {
-                    "stops": [],
-                    "links": [],
-                    "departure_list": [],
-                    "attributes": {},
-                }
-                current_route_id = elem.attrib["id"]
-
-            # doesn't have any attribs
-            # if elem.tag == 'routeProfile':
-            #     routeProfile = {'routeProfile': elem.attrib}
-
-            elif elem.tag == "stop":
-                transitRoutes[current_route_id]["stops"].append({"stop": elem.attrib})
-
-            # doesn't have any attribs
-            # if elem.tag == 'route':
-            #     route = {'route': elem.attrib}
-
-            elif elem.tag == "link":
-                transitRoutes[current_route_id]["links"].append({"link": elem.attrib})
-
-            # doesn't have any attribs
-            # if elem.tag == 'departures':
-            #     departures = {'departures': elem.attrib}
-
-            elif elem.tag == "departure":
-                transitRoutes[current_route_id]["departure_list"].append({"departure": elem.attrib})
-
-        elif event == "end":
-            if elem.tag == "attribute":
-                if elem_type_for_additional_attributes == "transitSchedule":
-                    if force_long_form_attributes:
-                        logging.warning(
-                            "Schedule-level additional attributes are always read into short form."
-                        )
-                    schedule_attribs = update_additional_attrib(elem, schedule_attribs)
-                elif elem_type_for_additional_attributes == "stopFacility":
-                    current_stop_data = transit_stop_id_mapping[current_stop_id]
-                    if "attributes" in current_stop_data:
-                        current_stop_data["attributes"] = update_additional_attrib(
-                            elem,
-                            transit_stop_id_mapping[current_stop_id]["attributes"],
-                            force_long_form_attributes=force_long_form_attributes,
-                        )
-                    else:
-                        current_stop_data["attributes"] = update_additional_attrib(
-                            elem, {}, force_long_form_attributes=force_long_form_attributes
-                        )
-                elif elem_type_for_additional_attributes == "transitLine":
-                    transitLine["attributes"] = update_additional_attrib(
-                        elem,
-                        transitLine["attributes"],
-                        force_long_form_attributes=force_long_form_attributes,
+                add_transit_line(g, read_transit_line(elem, force_long_form_attributes), edges)
+                _clear_element(elem)
+            elif elem.getparent() is not None and elem.getparent().tag == "transitSchedule":
+                if force_long_form_attributes:
+                    logging.warning(
+                        "Schedule-level additional attributes are always read into short form."
                     )
-                elif elem_type_for_additional_attributes == "transitRoute":
-                    transitRoutes[current_route_id]["attributes"] = update_additional_attrib(
-                        elem,
-                        transitRoutes[current_route_id]["attributes"],
-                        force_long_form_attributes=force_long_form_attributes,
-                    )
-            elif elem.tag == "transportMode":
-                transportMode = {"transportMode": elem.text}
+                for attrib_elem in elem.iterfind("attribute"):
+                    schedule_attribs = update_additional_attrib(attrib_elem, schedule_attribs)
+
+        project_stops(stops, epsg)
+        for attribs in stops.values():
+            attribs["routes"] = set()
+            attribs["services"] = set()
+        for route_id, route in g.graph["routes"].items():
+            service_id = g.graph["route_to_service_map"][route_id]
+            for stop_id in route["ordered_stops"]:
+                stops[stop_id]["routes"].add(route_id)
+                stops[stop_id]["services"].add(service_id)
+        g.add_nodes_from(stops.items())
+        g.add_edges_from((u, v, attribs) for (u, v), attribs in edges.items())
+    return g, minimal_transfer_times, schedule_attribs
+
+
+def read_stop_facility(
+    elem: etree._Element, epsg: str, force_long_form_attributes: bool = False
+) -> dict:
+    """Reads stopFacility elem of the stream into a dictionary of stop attributes.
 
-    # add the last one
-    write_transitLinesTransitRoute(transitLine, transitRoutes, transportMode)
+    Spatial attributes (`lat`, `lon`, `s2_id`) are added in bulk by `project_stops`.
 
-    return services, minimalTransferTimes, transit_stop_id_mapping, schedule_attribs
+    Args:
+        elem (etree._Element): Element of the stream.
+        epsg (str): Schedule projection CRS, e.g. `epsg:4326`.
+        force_long_form_attributes (bool, optional):
+            If True the additional attributes will be read into long form. Defaults to False.
+
+    Returns:
+        dict: Stop attributes.
+    """
+    attribs = {"name": "", **elem.attrib, "epsg": epsg}
+    attribs["x"], attribs["y"] = float(attribs["x"]), float(attribs["y"])
+    stop_attribs = read_elem_additional_attribs(elem, force_long_form_attributes)
+    if stop_attribs:
+        attribs["attributes"] = stop_attribs
+    return attribs
+
+
+def project_stops(stops: dict[str, dict], epsg: str):
+    """Adds spatial attributes (`lat`, `lon`, `s2_id`) to stops read from the stream, in-place.
+
+    Args:
+        stops (dict[str, dict]): Stop attributes, as read by `read_stop_facility`, keyed by stop ID.
+        epsg (str): Schedule projection CRS, e.g. `epsg:4326`.
+    """
+    if not stops:
+        return
+    xs = np.fromiter((attribs["x"] for attribs in stops.values()), dtype=float, count=len(stops))
+    ys = np.fromiter((attribs["y"] for attribs in stops.values()), dtype=float, count=len(stops))
+    if epsg == "epsg:4326":
+        lons, lats = xs, ys
+    else:
+        transformer = Transformer.from_proj(Proj(epsg), Proj("epsg:4326"), always_xy=True)
+        lons, lats = spatial.change_proj(xs, ys, transformer)
+    for attribs, lon, lat in zip(stops.values(), lons.tolist(), lats.tolist()):
+        attribs["lon"], attribs["lat"] = lon, lat
+        attribs["s2_id"] = spatial.generate_index_s2(lat=lat, lng=lon)
+
+
+def read_transit_line(elem: etree._Element, force_long_form_attributes: bool = False) -> dict:
+    """Reads transitLine elem of the stream into service data with a dictionary of its route data.
+
+    Args:
+        elem (etree._Element): Element of the stream.
+        force_long_form_attributes (bool, optional):
+            If True the additional attributes will be read into long form. Defaults to False.
+
+    Returns:
+        dict: Service data, with its routes' data under `routes`, keyed by route ID.
+    """
+    service = {"id": elem.get("id"), "name": elem.get("name", ""), "routes": {}}
+    service_attribs = read_elem_additional_attribs(elem, force_long_form_attributes)
+    if service_attribs:
+        service["attributes"] = service_attribs
+
+    for route_elem in elem.iterfind("transitRoute"):
+        arrival_offsets = []
+        departure_offsets = []
+        await_departure = []
+        ordered_stops = []
+        for stop_elem in route_elem.iterfind("routeProfile/stop"):
+            ordered_stops.append(stop_elem.get("refId"))
+            arrival_offset = stop_elem.get("arrivalOffset")
+            departure_offset = stop_elem.get("departureOffset")
+            if arrival_offset is not None or departure_offset is not None:
+                arrival_offsets.append(arrival_offset or departure_offset)
+                departure_offsets.append(departure_offset or arrival_offset)
+            if stop_elem.get("awaitDeparture") is not None:
+                await_departure.append(stop_elem.get("awaitDeparture").lower() in ["true", "1"])
+
+        trips: dict = {"trip_id": [], "trip_departure_time": [], "vehicle_id": []}
+        for departure_elem in route_elem.iterfind("departures/departure"):
+            trips["trip_id"].append(departure_elem.get("id"))
+            trips["trip_departure_time"].append(departure_elem.get("departureTime"))
+            trips["vehicle_id"].append(departure_elem.get("vehicleRefId"))
+
+        route = {
+            "route_short_name": service["name"],
+            "mode": route_elem.findtext("transportMode"),
+            "arrival_offsets": arrival_offsets,
+            "departure_offsets": departure_offsets,
+            "route_long_name": "",
+            "id": route_elem.get("id"),
+            "trips": trips,
+            "network_links": [
+                link_elem.get("refId") for link_elem in route_elem.iterfind("route/link")
+            ],
+            "await_departure": await_departure,
+            "ordered_stops": ordered_stops,
+        }
+        route_attribs = read_elem_additional_attribs(route_elem, force_long_form_attributes)
+        if route_attribs:
+            route["attributes"] = route_attribs
+        service["routes"][route["id"]] = route
+
+    if not service["routes"]:
+        # services inherit their name from their routes
+        service["name"] = ""
+    return service
+
+
+def add_transit_line(g: nx.DiGraph, service: dict, edges: dict):
+    """Adds service and route data read from the stream to the schedule graph.
+
+    Args:
+        g (nx.DiGraph): Schedule graph, its `routes`, `services` and ID maps are updated in-place.
+        service (dict): Service data, as read by `read_transit_line`.
+        edges (dict): Edge data `{(from stop, to stop): {'routes': set, 'services': set}}`, updated in-place.
+    """
+    routes = service.pop("routes")
+    service_id = service["id"]
+    if service_id in g.graph["services"]:
+        i = 0
+        while service_id in g.graph["services"]:
+            service_id = f"{service['id']}_{i}"
+            i += 1
+        g.graph["change_log"].modify(
+            object_type="service",
+            old_id=service["id"],
+            new_id=service_id,
+            old_attributes={"id": service["id"]},
+            new_attributes={"id": service_id},
+        )
+        logging.warning(
+            f"Service has been re-indexed from {service['id']} to {service_id} due to an ID clash"
+        )
+        service["id"] = service_id
+    g.graph["services"][service_id] = service
+    g.graph["service_to_route_map"][service_id] = []
+
+    for route_id, route in routes.items():
+        if route_id in g.graph["routes"]:
+            # Services index their routes uniquely within themselves
+            route["id"] = f"{service_id}_{route_id}"
+            g.graph["change_log"].modify(
+                object_type="route",
+                old_id=route_id,
+                new_id=route["id"],
+                old_attributes={"id": route_id},
+                new_attributes={"id": route["id"]},
+            )
+        g.graph["routes"][route["id"]] = route
+        g.graph["route_to_service_map"][route["id"]] = service_id
+        g.graph["service_to_route_map"][service_id].append(route["id"])
+        ordered_stops = route["ordered_stops"]
+        for edge in zip(ordered_stops[:-1], ordered_stops[1:]):
+            edge_attribs = edges.setdefault(edge, {"routes": set(), "services": set()})
+            edge_attribs["routes"].add(route["id"])
+            edge_attribs["services"].add(service_id)
 
 
 def read_vehicles(vehicles_path):
@@ -554,20 +1055,21 @@ def read_vehicles(vehicles_path):
     vehicle_types = {}
     v = {"capacity": {}}
     read_capacity = False
-    for event, elem in ET.iterparse(vehicles_path):
-        tag = re.sub(r"{http://www\.matsim\.org/files/dtd}", "", elem.tag)
-        if tag == "vehicle":
-            _id = elem.attrib.pop("id")
-            vehicles[_id] = elem.attrib
-            read_capacity = False
-        elif tag == "vehicleType":
-            vehicle_types[elem.attrib["id"]] = v
-            v = {"capacity": {}}
-            read_capacity = False
-        elif tag == "capacity":
-            read_capacity = True
-        elif read_capacity:
-            v[tag] = elem.attrib
-        else:
-            v["capacity"][tag] = elem.attrib
+    with persistence.open_file(vehicles_path) as f:
+        for event, elem in ET.iterparse(f):
+            tag = re.sub(r"{http://www\.matsim\.org/files/dtd}", "", elem.tag)
+            if tag == "vehicle":
+                _id = elem.attrib.pop("id")
+                vehicles[_id] = elem.attrib
+                read_capacity = False
+            elif tag == "vehicleType":
+                vehicle_types[elem.attrib["id"]] = v
+                v = {"capacity": {}}
+                read_capacity = False
+            elif tag == "capacity":
+                read_capacity = True
+            elif read_capacity:
+                v[tag] = elem.attrib
+            else:
+                v["capacity"][tag] = elem.attrib
     return vehicles, vehicle_types
@@ -1,16 +1,25 @@
+import itertools
 import logging
+import mmap
+import os
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass
 from math import ceil
+from typing import Iterator, Optional, Union
 
+import numpy as np
 import osmium
 import yaml
 from pyproj import Transformer
+from shapely.geometry.base import BaseGeometry
 
 import genet.input.osmnx_customised as osmnx_customised
 import genet.utils.parallel as parallel
 import genet.utils.spatial as spatial
 from genet.output.matsim_xml_values import MATSIM_JOSM_DEFAULTS
 
-MANDATORY_PATH_TAGS = {"oneway", "highway", "junction", "route"}
+OSMIUM_POOL_THREADS_ENV = "OSMIUM_USE_POOL_THREADS_FOR_PBF_PARSING"
 
 
 class Config(object):
@@ -47,6 +56,37 @@ def assume_travel_modes(edge, config):
     return list(set(modes))
 
 
+def mode_tag_values(config) -> dict[str, Optional[set]]:
+    """Compiles the config's mode indicators into the tag values a way needs to be assigned any modes.
+
+    Mirrors `assume_travel_modes` on the tags kept for paths, so it can reject ways before their tags are read.
+
+    Args:
+        config (Config): OSM reader configuration.
+
+    Returns:
+        dict[str, Optional[set]]:
+            Tag keys which can assign modes, mapped to the values that do, or to None if any value does.
+    """
+    road_modes = config.MODE_INDICATORS.get("highway", {}).get("unclassified")
+    tag_values = {}
+    for key in dict.fromkeys(config.USEFUL_TAGS_PATH):
+        indicator = config.MODE_INDICATORS.get(key)
+        if isinstance(indicator, dict):
+            values = {
+                val
+                for val, modes in indicator.items()
+                if modes and val not in ["construction", "proposed"]
+            }
+            if road_modes:
+                values.add("road")
+            if values:
+                tag_values[key] = values
+        elif indicator:
+            tag_values[key] = None
+    return tag_values
+
+
 def find_matsim_link_values(edge_data, config):
     matsim_vals = {}
     if (set(edge_data.keys()) | set(MATSIM_JOSM_DEFAULTS.keys())) or ("highway" in edge_data):
@@ -84,32 +124,23 @@ def find_matsim_link_values(edge_data, config):
     return matsim_vals
 
 
-def generate_osm_graph_edges_from_file(osm_file, config, num_processes):
+def generate_osm_graph_edges_from_file(
+    osm_file, config, num_processes, two_pass=False, region=None, keep_crossing_ways=False
+):
     logging.info("Building OSM graph from file {}".format(osm_file))
-    response_jsons = file_converter(osm_file, config)
-    nodes, edges = create_s2_indexed_osm_graph(
-        response_jsons, config, num_processes, bidirectional=False
-    )
+    osm_data = read_osm_data(osm_file, config, two_pass=two_pass, processes=num_processes)
+    if region is not None:
+        osm_data = clip_osm_data(osm_data, region, keep_crossing_ways=keep_crossing_ways)
+    nodes, edges = create_s2_indexed_osm_graph(osm_data, config, num_processes, bidirectional=False)
     logging.info("Created OSM edges")
     return nodes, edges
 
 
-def create_s2_indexed_osm_graph(response_jsons, config, num_processes, bidirectional):
+def create_s2_indexed_osm_graph(osm_data, config, num_processes, bidirectional):
     logging.info("Creating networkx graph from OSM data")
 
-    elements = []
-    for response_json in response_jsons:
-        elements.extend(response_json["elements"])
-
     logging.info("OSM: Extract Nodes and Paths from OSM data")
-    nodes = {}
-    paths = {}
-    for osm_data in response_jsons:
-        nodes_temp, paths_temp = osmnx_customised.parse_osm_nodes_paths(osm_data, config)
-        for key, value in nodes_temp.items():
-            nodes[key] = value
-        for key, value in paths_temp.items():
-            paths[key] = value
+    nodes, paths = osmnx_customised.parse_osm_nodes_paths(osm_data, config)
 
     logging.info("OSM: Add each OSM way (aka, path) to the OSM graph")
     edges = parallel.multiprocess_wrap(
@@ -127,9 +158,11 @@ def create_s2_indexed_osm_graph(response_jsons, config, num_processes, bidirecti
 
 def generate_graph_nodes(nodes, epsg):
     input_to_output_transformer = Transformer.from_crs("epsg:4326", epsg, always_xy=True)
+    xs, ys = input_to_output_transformer.transform(
+        [attribs["x"] for attribs in nodes.values()], [attribs["y"] for attribs in nodes.values()]
+    )
     nodes_and_attributes = {}
-    for node_id, attribs in nodes.items():
-        x, y = spatial.change_proj(attribs["x"], attribs["y"], input_to_output_transformer)
+    for (node_id, attribs), x, y in zip(nodes.items(), xs, ys):
         nodes_and_attributes[str(node_id)] = {
             "id": str(node_id),
             "x": x,
@@ -142,6 +175,7 @@ def generate_graph_nodes(nodes, epsg):
 
 
 def generate_graph_edges(edges, reindexing_dict, nodes_and_attributes, config_path):
+    config = Config(config_path)
     edges_attributes = []
     for edge, attribs in edges:
         u, v = str(edge[0]), str(edge[1])
@@ -150,7 +184,7 @@ def generate_graph_edges(edges, reindexing_dict, nodes_and_attributes, config_pa
         if v in reindexing_dict:
             v = reindexing_dict[v]
 
-        link_attributes = find_matsim_link_values(attribs, Config(config_path)).copy()
+        link_attributes = find_matsim_link_values(attribs, config).copy()
         if "lanes" in attribs:
             try:
                 # overwrite the default matsim josm values
@@ -181,95 +215,464 @@ def generate_graph_edges(edges, reindexing_dict, nodes_and_attributes, config_pa
     return edges_attributes
 
 
-def read_node(entity):
-    json_data = {
-        "type": "node",
-        "id": entity.id,
-        "version": entity.version,
-        "timestamp": entity.timestamp,
-        "uid": entity.uid,
-        "tags": entity.tags,
-        "lon": entity.lon,
-        "lat": entity.lat,
-    }
-    return json_data
-
-
-def read_way(entity):
-    json_data = {
-        "type": "way",
-        "id": entity.id,
-        "version": entity.version,
-        "timestamp": entity.timestamp,
-        "uid": entity.uid,
-        "tags": entity.tags,
-        "nodes": entity.nodes,
-    }
-    return json_data
-
-
-def read_relation(entity):
-    json_data = {
-        "type": "relation",
-        "id": entity.id,
-        "version": entity.version,
-        "timestamp": entity.timestamp,
-        "uid": entity.uid,
-        "tags": entity.tags,
-        "members": entity.members,
-    }
-    return json_data
-
-
-class OSMHandler(osmium.SimpleHandler):
+@dataclass
+class OSMData:
+    """OSM nodes and ways in compact arrays, as read by `OSMHandler`.
+
+    Attributes:
+        node_ids (np.ndarray): OSM IDs of nodes.
+        node_lon (np.ndarray): Longitudes of nodes.
+        node_lat (np.ndarray): Latitudes of nodes.
+        way_ids (np.ndarray): OSM IDs of ways.
+        way_node_offsets (np.ndarray): Start of the node references of each way in `way_nodes`, followed by their end.
+        way_nodes (np.ndarray): Node references of all ways, one way after another.
+        way_tags (list[dict]): Tags of each way, limited to the config's `USEFUL_TAGS_PATH`.
+    """
+
+    node_ids: np.ndarray
+    node_lon: np.ndarray
+    node_lat: np.ndarray
+    way_ids: np.ndarray
+    way_node_offsets: np.ndarray
+    way_nodes: np.ndarray
+    way_tags: list[dict]
+
+    def ways(self) -> Iterator[tuple[int, np.ndarray, dict]]:
+        """Iterates over ways.
+
+        Yields:
+            tuple[int, np.ndarray, dict]: OSM ID, node references and tags of each way.
+        """
+        offsets = self.way_node_offsets.tolist()
+        for way_id, start, end, tags in zip(
+            self.way_ids.tolist(), offsets[:-1], offsets[1:], self.way_tags
+        ):
+            yield way_id, self.way_nodes[start:end], tags
+
+    @classmethod
+    def concat(cls, osm_data: list["OSMData"]) -> "OSMData":
+        """Concatenates nodes and ways read from parts of an OSM file, in order.
+
+        Args:
+            osm_data (list[OSMData]): Nodes and ways of each part.
+
+        Returns:
+            OSMData: Nodes and ways of all parts.
+        """
+        way_node_counts = np.cumsum([0] + [len(data.way_nodes) for data in osm_data])
+        return cls(
+            node_ids=np.concatenate([data.node_ids for data in osm_data]),
+            node_lon=np.concatenate([data.node_lon for data in osm_data]),
+            node_lat=np.concatenate([data.node_lat for data in osm_data]),
+            way_ids=np.concatenate([data.way_ids for data in osm_data]),
+            way_node_offsets=np.concatenate(
+                [[0]]
+                + [
+                    data.way_node_offsets[1:] + count
+                    for data, count in zip(osm_data, way_node_counts)
+                ]
+            ).astype(np.int64),
+            way_nodes=np.concatenate([data.way_nodes for data in osm_data]),
+            way_tags=[tags for data in osm_data for tags in data.way_tags],
+        )
+
+
+class OSMWayHandler(osmium.SimpleHandler):
+    """Reads ways into compact buffers, see `OSMData`. Nodes are not read at all.
+
+    Ways are first checked against the few tags that can assign them modes (see `mode_tag_values`) and skipped if
+    none do, before any other tag is read. Only the tags of ways listed in the config's `USEFUL_TAGS_PATH` are kept.
+    Metadata of ways, e.g. versions, is not read.
+    """
+
     def __init__(self, config):
-        super(OSMHandler, self).__init__()
-        self.elements = []
+        super(OSMWayHandler, self).__init__()
         self.config = config
+        self.path_tags = list(dict.fromkeys(config.USEFUL_TAGS_PATH))
+        self.mode_tag_values = list(mode_tag_values(config).items())
+        self.node_ids = array("q")
+        self.node_lon = array("d")
+        self.node_lat = array("d")
+        self.way_ids = array("q")
+        self.way_node_offsets = array("q", [0])
+        self.way_nodes = array("q")
+        self.way_tags = []
+
+    def way(self, entity):
+        entity_tags = entity.tags
+        for key, values in self.mode_tag_values:
+            value = entity_tags.get(key)
+            if value and (values is None or value in values):
+                break
+        else:
+            return
+        tags = {}
+        for useful_tag in self.path_tags:
+            value = entity_tags.get(useful_tag)
+            if value:
+                tags[useful_tag] = value
+        self.way_ids.append(entity.id)
+        self.way_nodes.extend(node.ref for node in entity.nodes)
+        self.way_node_offsets.append(len(self.way_nodes))
+        self.way_tags.append(tags)
+
+    def osm_data(self) -> OSMData:
+        return OSMData(
+            node_ids=np.frombuffer(self.node_ids, dtype=np.int64),
+            node_lon=np.frombuffer(self.node_lon, dtype=np.float64),
+            node_lat=np.frombuffer(self.node_lat, dtype=np.float64),
+            way_ids=np.frombuffer(self.way_ids, dtype=np.int64),
+            way_node_offsets=np.frombuffer(self.way_node_offsets, dtype=np.int64),
+            way_nodes=np.frombuffer(self.way_nodes, dtype=np.int64),
+            way_tags=self.way_tags,
+        )
+
+
+class OSMHandler(OSMWayHandler):
+    """Reads node locations and ways into compact buffers, see `OSMData`.
+
+    Ways are read as in `OSMWayHandler`. Node tags and metadata are not read.
+    """
 
     def node(self, entity):
-        """Parses OSM data for an OSM 'node' into dict format.
+        location = entity.location
+        self.node_ids.append(entity.id)
+        self.node_lon.append(location.lon)
+        self.node_lat.append(location.lat)
+
+
+def read_osm_data(osm_file, config, two_pass: bool = False, processes: int = 1) -> OSMData:
+    """Reads nodes and ways of an OSM file into compact arrays.
+
+    Args:
+        osm_file (str): Path to .osm or .osm.pbf file.
+        config (Config): OSM reader configuration.
+        two_pass (bool, optional):
+            If True, reads ways first and then only the locations of nodes used by the ways kept,
+            rather than every node in the file. Defaults to False.
+        processes (int, optional):
+            Number of parallel processes to read a .osm.pbf file across. The file is split into chunks of its
+            independently compressed blocks, each read by its own handler, and the results are merged in file order.
+            Other files are read in a single process. Defaults to 1.
+
+    Returns:
+        OSMData: Nodes and ways read.
+    """
+    handler_class = OSMWayHandler if two_pass else OSMHandler
+    blocks = _find_pbf_blocks(osm_file) if processes > 1 else None
+    if blocks is not None:
+        osm_data = OSMData.concat(
+            parallel.multiprocess_wrap(
+                data=_split_pbf_blocks(osm_file, blocks, no_chunks=processes * 4),
+                split=_deal_pbf_chunks,
+                apply=_read_pbf_chunks,
+                combine=_combine_dealt_pbf_chunks,
+                processes=processes,
+                config=config,
+                handler_class=handler_class,
+            )
+        )
+    else:
+        osmium_read_handler = handler_class(config)
+        osmium_read_handler.apply_file(str(osm_file))
+        osm_data = osmium_read_handler.osm_data()
+    if two_pass:
+        osm_data.node_ids, osm_data.node_lon, osm_data.node_lat = read_node_locations(
+            osm_file, np.unique(osm_data.way_nodes)
+        )
+    logging.info(f"Read {len(osm_data.node_ids)} nodes and {len(osm_data.way_ids)} ways from OSM")
+    return osm_data
+
+
+def _read_varint(data: bytes, position: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+
+def _read_blob_header(data: bytes) -> tuple[str, int]:
+    """Reads the type and size of a PBF blob from its protobuf encoded `BlobHeader`.
+
+    Args:
+        data (bytes): `BlobHeader` message.
+
+    Returns:
+        tuple[str, int]: Type (`OSMHeader` or `OSMData`) and size in bytes of the blob following the header.
+    """
+    blob_type, data_size = None, None
+    position = 0
+    while position < len(data):
+        key, position = _read_varint(data, position)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, position = _read_varint(data, position)
+        elif wire_type == 2:
+            length, position = _read_varint(data, position)
+            value = data[position : position + length]
+            position += length
+        else:
+            raise ValueError(f"Unexpected protobuf wire type {wire_type} in PBF BlobHeader")
+        if field == 1:
+            blob_type = value.decode()
+        elif field == 3:
+            data_size = value
+    if blob_type is None or data_size is None:
+        raise ValueError("PBF BlobHeader is missing its type or size")
+    return blob_type, data_size
+
+
+def _find_pbf_blocks(osm_file) -> Optional[list[tuple[str, int, int]]]:
+    """Finds the blocks of a .osm.pbf file.
+
+    Each block is a `BlobHeader`, preceded by its length, and the blob it describes.
+
+    Args:
+        osm_file (str): Path to OSM file.
+
+    Returns:
+        Optional[list[tuple[str, int, int]]]: (type, start, end) of each block, None if the file is not a PBF file.
+    """
+    blocks = []
+    with open(osm_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        file_size = len(mm)
+        position = 0
+        while position < file_size:
+            header_size = int.from_bytes(mm[position : position + 4], "big")
+            # blob headers are at most 64KB by the PBF format specification
+            if header_size > 64 * 1024 or position + 4 + header_size > file_size:
+                return None
+            try:
+                blob_type, data_size = _read_blob_header(
+                    mm[position + 4 : position + 4 + header_size]
+                )
+            except (ValueError, IndexError, UnicodeDecodeError):
+                return None
+            end = position + 4 + header_size + data_size
+            blocks.append((blob_type, position, end))
+            position = end
+    if not blocks or blocks[0][0] != "OSMHeader" or position != file_size:
+        return None
+    return blocks
+
+
+def _split_pbf_blocks(
+    osm_file, blocks: list[tuple[str, int, int]], no_chunks: int
+) -> list[tuple[str, tuple[int, int], int, int]]:
+    """Splits the data blocks of a .osm.pbf file into contiguous chunks of similar size.
+
+    Args:
+        osm_file (str): Path to .osm.pbf file.
+        blocks (list[tuple[str, int, int]]): (type, start, end) of each block, as found by `_find_pbf_blocks`.
+        no_chunks (int): Approximate number of chunks to split the data blocks into.
+
+    Returns:
+        list[tuple[str, tuple[int, int], int, int]]:
+            (path, (start, end) of the header block, start, end) of each chunk, in file order.
+    """
+    _, header_start, header_end = blocks[0]
+    data_blocks = [(start, end) for blob_type, start, end in blocks[1:] if blob_type == "OSMData"]
+    if not data_blocks:
+        return []
+    chunk_size = max((data_blocks[-1][1] - data_blocks[0][0]) / no_chunks, 1)
+    chunks = []
+    chunk_start = data_blocks[0][0]
+    for start, end in data_blocks:
+        if end - chunk_start >= chunk_size:
+            chunks.append((str(osm_file), (header_start, header_end), chunk_start, end))
+            chunk_start = end
+    if chunk_start < data_blocks[-1][1]:
+        chunks.append((str(osm_file), (header_start, header_end), chunk_start, data_blocks[-1][1]))
+    return chunks
+
+
+def _deal_pbf_chunks(chunks: list, processes: int = 1) -> list[list]:
+    """Deals chunks of a .osm.pbf file out to processes in turn.
+
+    Blocks of nodes take longer to read than blocks of ways of the same size, which lie together in the file, so
+    dealing the chunks balances the work better than splitting them into contiguous batches.
+
+    Args:
+        chunks (list): Chunks of a .osm.pbf file, in file order.
+        processes (int, optional): Number of processes to deal the chunks out to. Defaults to 1.
+
+    Returns:
+        list[list]: Chunks of each process.
+    """
+    return [chunks[i::processes] for i in range(processes)]
+
+
+def _combine_dealt_pbf_chunks(results: list[list]) -> list:
+    """Restores the file order of results of chunks dealt out by `_deal_pbf_chunks`.
+
+    Args:
+        results (list[list]): Results of the chunks of each process.
+
+    Returns:
+        list: Results of all chunks, in file order.
+    """
+    return [
+        result
+        for dealt_results in itertools.zip_longest(*results, fillvalue=None)
+        for result in dealt_results
+        if result is not None
+    ]
+
+
+def _read_pbf_chunks(
+    chunks: list[tuple[str, tuple[int, int], int, int]], config, handler_class=OSMHandler
+) -> list[OSMData]:
+    """Reads chunks of blocks of a .osm.pbf file into compact arrays.
+
+    Each chunk is read from memory as a PBF file made of the file's header block and the chunk's data blocks.
+    Blocks are decoded without osmium's thread pool, which does not survive being forked from a process which used it.
+
+    Args:
+        chunks (list[tuple[str, tuple[int, int], int, int]]):
+            (path, (start, end) of the header block, start, end) of chunks to read.
+        config (Config): OSM reader configuration.
+        handler_class (type, optional): `OSMHandler`, or `OSMWayHandler` to read ways only. Defaults to OSMHandler.
+
+    Returns:
+        list[OSMData]: Nodes and ways of each chunk.
+    """
+    osm_data = []
+    with _osmium_pool_threads_off():
+        for osm_file, (header_start, header_end), start, end in chunks:
+            with open(osm_file, "rb") as f:
+                f.seek(header_start)
+                header = f.read(header_end - header_start)
+                f.seek(start)
+                data = f.read(end - start)
+            osmium_read_handler = handler_class(config)
+            osmium_read_handler.apply_buffer(header + data, "pbf")
+            osm_data.append(osmium_read_handler.osm_data())
+    return osm_data
+
+
+@contextmanager
+def _osmium_pool_threads_off():
+    previous = os.environ.get(OSMIUM_POOL_THREADS_ENV)
+    os.environ[OSMIUM_POOL_THREADS_ENV] = "off"
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ[OSMIUM_POOL_THREADS_ENV]
+        else:
+            os.environ[OSMIUM_POOL_THREADS_ENV] = previous
 
-        Uses USEFUL_TAGS_PATH specified via genet config to ignore irrelevant tags
-        """
-        json_data = {
-            "type": "node",
-            "id": str(entity.id),
-            "version": entity.version,
-            "timestamp": entity.timestamp,
-            "uid": entity.uid,
-            "tags": {},
-            "lon": entity.location.lon,
-            "lat": entity.location.lat,
-        }
-        for useful_tag in self.config.USEFUL_TAGS_NODE:
-            value = entity.tags.get(useful_tag)
-            if value:
-                json_data["tags"][useful_tag] = value
-        self.elements.append(json_data)
 
-    def way(self, entity):
-        """Parses OSM data for an OSM 'way' into dict format.
+def read_node_locations(
+    osm_file, node_ids: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Reads locations of the given nodes from an OSM file.
 
-        Uses USEFUL_TAGS_PATH specified via genet config to ignore irrelevant tags
-        """
-        json_data = {
-            "type": "way",
-            "id": str(entity.id),
-            "version": entity.version,
-            "timestamp": entity.timestamp,
-            "uid": entity.uid,
-            "tags": {},
-            "nodes": tuple(str(n) for n in entity.nodes),
-        }
-        for useful_tag in set(self.config.USEFUL_TAGS_PATH) | MANDATORY_PATH_TAGS:
-            value = entity.tags.get(useful_tag)
-            if value:
-                json_data["tags"][useful_tag] = value
-        self.elements.append(json_data)
+    Node locations are collected by osmium into a sparse location index without passing through Python, which holds
+    16 bytes per node in the file. Only the nodes requested are then looked up.
+
+    Args:
+        osm_file (str): Path to .osm or .osm.pbf file.
+        node_ids (np.ndarray): OSM IDs of nodes to read.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]:
+            OSM IDs, longitudes and latitudes of the requested nodes found in the file.
+    """
+    location_index = osmium.index.create_map("sparse_mem_array")
+    osmium.apply(
+        osmium.io.Reader(str(osm_file), osmium.osm.osm_entity_bits.NODE),
+        osmium.NodeLocationsForWays(location_index),
+    )
+    found_ids = array("q")
+    lon = array("d")
+    lat = array("d")
+    for node_id in node_ids.tolist():
+        try:
+            location = location_index.get(node_id)
+        except KeyError:
+            continue
+        found_ids.append(node_id)
+        lon.append(location.lon)
+        lat.append(location.lat)
+    if len(found_ids) < len(node_ids):
+        logging.warning(f"{len(node_ids) - len(found_ids)} nodes used by ways are missing from OSM")
+    return (
+        np.frombuffer(found_ids, dtype=np.int64),
+        np.frombuffer(lon, dtype=np.float64),
+        np.frombuffer(lat, dtype=np.float64),
+    )
 
 
-def file_converter(osm_file, config):
-    osmium_read_handler = OSMHandler(config)
-    osmium_read_handler.apply_file(osm_file)
-    return [{"elements": osmium_read_handler.elements}]
+def clip_osm_data(
+    osm_data: OSMData,
+    region: Union[str, BaseGeometry, tuple[float, float, float, float]],
+    keep_crossing_ways: bool = False,
+) -> OSMData:
+    """Clips ways to a region.
+
+    Ways are cut at the region boundary into the runs of consecutive nodes within the region, so a way leaving and
+    re-entering the region becomes several ways with the same OSM ID. Runs of a single node are dropped.
+    Nodes are not removed, only nodes used by paths become graph nodes (see `parse_osm_nodes_paths`).
+
+    Args:
+        osm_data (OSMData): Nodes and ways read from OSM.
+        region (Union[str, BaseGeometry, tuple[float, float, float, float]]):
+            Region to clip to, in any form accepted by `genet.utils.spatial.read_region`.
+        keep_crossing_ways (bool, optional):
+            If True, ways with any node within the region are kept whole, rather than cut at the boundary.
+            Defaults to False.
+
+    Returns:
+        OSMData: Clipped nodes and ways.
+    """
+    region = spatial.read_region(region)
+    node_in_region = spatial.points_in_region(osm_data.node_lon, osm_data.node_lat, region)
+
+    # look up each way node reference, references to nodes missing from the data lie outside the region
+    sorter = np.argsort(osm_data.node_ids)
+    sorted_node_ids = osm_data.node_ids[sorter]
+    positions = np.minimum(
+        np.searchsorted(sorted_node_ids, osm_data.way_nodes), max(len(sorted_node_ids) - 1, 0)
+    )
+    ref_in_region = np.zeros(len(osm_data.way_nodes), dtype=bool)
+    if len(sorted_node_ids):
+        ref_in_region = (sorted_node_ids[positions] == osm_data.way_nodes) & node_in_region[
+            sorter[positions]
+        ]
+
+    way_lengths = np.diff(osm_data.way_node_offsets)
+    ref_way = np.repeat(np.arange(len(osm_data.way_ids)), way_lengths)
+    if keep_crossing_ways:
+        keep_way = np.bincount(ref_way, weights=ref_in_region, minlength=len(way_lengths)) > 0
+        keep_ref = keep_way[ref_way]
+        piece_way = np.flatnonzero(keep_way)
+        piece_lengths = way_lengths[keep_way]
+    else:
+        first_ref = np.zeros(len(ref_way), dtype=bool)
+        first_ref[osm_data.way_node_offsets[:-1][way_lengths > 0]] = True
+        previous_in_region = np.concatenate([[False], ref_in_region[:-1]])
+        piece_start = ref_in_region & (first_ref | ~previous_in_region)
+        ref_piece = np.cumsum(piece_start) - 1
+        piece_lengths = np.bincount(ref_piece[ref_in_region], minlength=piece_start.sum())
+        keep_piece = piece_lengths > 1
+        keep_ref = ref_in_region & keep_piece[ref_piece]
+        piece_way = ref_way[piece_start][keep_piece]
+        piece_lengths = piece_lengths[keep_piece]
+
+    logging.info(
+        f"Clipped {len(osm_data.way_ids)} OSM ways to {len(piece_way)} ways within the region"
+    )
+    return OSMData(
+        node_ids=osm_data.node_ids,
+        node_lon=osm_data.node_lon,
+        node_lat=osm_data.node_lat,
+        way_ids=osm_data.way_ids[piece_way],
+        way_node_offsets=np.concatenate([[0], np.cumsum(piece_lengths)]).astype(np.int64),
+        way_nodes=osm_data.way_nodes[keep_ref],
+        way_tags=[osm_data.way_tags[way] for way in piece_way.tolist()],
+    )
@@ -1,4 +1,7 @@
 from itertools import groupby
+from typing import Iterable
+
+import numpy as np
 
 import genet.input.osm_reader as osm_reader
 import genet.utils.spatial as spatial
@@ -6,82 +9,101 @@ import genet.utils.spatial as spatial
 # rip and monkey patch of a few functions from osmnx.core to customise the tags being saved to the graph
 
 
-def parse_osm_nodes_paths(osm_data: dict, config: "osm_reader.Config") -> tuple[dict, dict]:
+def parse_osm_nodes_paths(
+    osm_data: "osm_reader.OSMData", config: "osm_reader.Config"
+) -> tuple[dict, dict]:
     """Construct dicts of nodes and paths with key=osmid and value=dict of attributes.
 
-    Function from osmnx. Adding our own spin on this - need extra tags
+    Function from osmnx. Adding our own spin on this - need extra tags.
+    Only ways with modes become paths and only nodes on the edges of those paths are returned, so no node is left
+    isolated in the graph.
 
     Args:
-        osm_data (dict): JSON response from from the Overpass API
+        osm_data (genet.input.osm_reader.OSMData): Nodes and ways read from OSM.
         config (genet.input.osm_reader.Config): OSM reader configuration.
 
     Returns:
         tuple[dict, dict]: Nodes; Paths.
     """
 
-    nodes = {}
     paths = {}
-    for element in osm_data["elements"]:
-        if element["type"] == "node":
-            key = element["id"]
-            nodes[key] = get_node(element, config)
-        elif element["type"] == "way":  # osm calls network paths 'ways'
-            key = element["id"]
-            path = get_path(element, config)
-            if path["modes"]:
-                # only proceed with edges that have found a mode (that's why it's important to define them in
-                # MODE_INDICATORS in the config
-                paths[key] = path
-
+    for i, (way_id, node_refs, tags) in enumerate(osm_data.ways()):
+        path = get_path(way_id, node_refs, tags, config)
+        if path["modes"]:
+            # only proceed with edges that have found a mode (that's why it's important to define them in
+            # MODE_INDICATORS in the config
+            # ways clipped to a region can be split into several paths with the same osmid
+            path_id = f"{way_id}_{i}" if str(way_id) in paths else str(way_id)
+            paths[path_id] = path
+
+    used_node_ids = np.unique(
+        np.fromiter(
+            (
+                int(node)
+                for path in paths.values()
+                if len(path["nodes"]) > 1
+                for node in path["nodes"]
+            ),
+            dtype=np.int64,
+        )
+    )
+    used_nodes = np.isin(osm_data.node_ids, used_node_ids)
+    nodes = {}
+    for node_id, lon, lat in zip(
+        osm_data.node_ids[used_nodes].tolist(),
+        osm_data.node_lon[used_nodes].tolist(),
+        osm_data.node_lat[used_nodes].tolist(),
+    ):
+        nodes[str(node_id)] = get_node(node_id, lon, lat)
     return nodes, paths
 
 
-def get_node(element: dict, config: "osm_reader.Config") -> dict:
-    """Convert an OSM node element into the format for a networkx node.
+def get_node(node_id: int, lon: float, lat: float) -> dict:
+    """Convert an OSM node into the format for a networkx node.
 
     Args:
-        element (dict): An OSM node element.
-        config (genet.input.osm_reader.Config): OSM reader configuration.
+        node_id (int): OSM ID of the node.
+        lon (float): Longitude of the node.
+        lat (float): Latitude of the node.
 
     Returns:
-        dict: OSM node element converted to the networkx node format.
+        dict: OSM node converted to the networkx node format.
     """
 
     node = {}
-    node["osmid"] = element["id"]
-    node["s2id"] = spatial.generate_index_s2(lat=element["lat"], lng=element["lon"])
-    node["x"], node["y"] = element["lon"], element["lat"]
-    if "tags" in element:
-        for useful_tag in config.USEFUL_TAGS_NODE:
-            if useful_tag in element["tags"]:
-                node[useful_tag] = element["tags"][useful_tag]
+    node["osmid"] = str(node_id)
+    node["s2id"] = spatial.generate_index_s2(lat=lat, lng=lon)
+    node["x"], node["y"] = lon, lat
     return node
 
 
-def get_path(element: dict, config: "osm_reader.Config") -> dict:
-    """Convert an OSM way element into the format for a networkx graph path.
+def get_path(
+    way_id: int, node_refs: Iterable[int], tags: dict, config: "osm_reader.Config"
+) -> dict:
+    """Convert an OSM way into the format for a networkx graph path.
 
     Function from osmnx, adding our own spin on this - need extra tags
 
     Args:
-        element (dict): An OSM way element.
+        way_id (int): OSM ID of the way.
+        node_refs (Iterable[int]): OSM IDs of the way's nodes.
+        tags (dict): The way's tags.
         config (genet.input.osm_reader.Config): OSM reader configuration.
 
     Returns:
-        dict: OSM way element converted to the networkx graph path format.
+        dict: OSM way converted to the networkx graph path format.
     """
 
     path = {}
-    path["osmid"] = element["id"]
+    path["osmid"] = str(way_id)
 
     # remove any consecutive duplicate elements in the list of nodes
-    grouped_list = groupby(element["nodes"])
-    path["nodes"] = [group[0] for group in grouped_list]
+    grouped_list = groupby(node_refs)
+    path["nodes"] = [str(group[0]) for group in grouped_list]
 
-    if "tags" in element:
-        for useful_tag in config.USEFUL_TAGS_PATH:
-            if useful_tag in element["tags"]:
-                path[useful_tag] = element["tags"][useful_tag]
+    for useful_tag in config.USEFUL_TAGS_PATH:
+        if useful_tag in tags:
+            path[useful_tag] = tags[useful_tag]
 
     path["modes"] = osm_reader.assume_travel_modes(path, config)
     return path
@@ -1,11 +1,12 @@
 import ast
 import json
 import logging
-from typing import Optional
+from typing import Literal, Optional, Union
 
 import geopandas as gpd
-import networkx as nx
 import pandas as pd
+from pyproj import Transformer
+from shapely.geometry.base import BaseGeometry
 
 import genet
 import genet.core as core
@@ -26,6 +27,7 @@ def read_matsim(
     path_to_schedule: Optional[str] = None,
     path_to_vehicles: Optional[str] = None,
     force_long_form_attributes: bool = False,
+    processes: int = 1,
 ) -> core.Network:
     """Creates a GeNet Network from MATSim's network.xml and (optionally) schedule.xml and vehicles.xml files.
 
@@ -54,6 +56,8 @@ def read_matsim(
                 Network level attributes cannot be forced to be read into long form.
 
             Defaults to False.
+        processes (int, optional):
+            Number of parallel processes to parse the network file across. Defaults to 1.
 
     Returns:
         core.Network: GeNet Network object.
@@ -62,6 +66,7 @@ def read_matsim(
         path_to_network=path_to_network,
         epsg=epsg,
         force_long_form_attributes=force_long_form_attributes,
+        processes=processes,
     )
     if path_to_schedule:
         n.schedule = read_matsim_schedule(
@@ -70,11 +75,18 @@ def read_matsim(
             epsg=epsg,
             force_long_form_attributes=force_long_form_attributes,
         )
+        n._record_routing_version_of_routed_services()
     return n
 
 
 def read_matsim_network(
-    path_to_network: str, epsg: str, force_long_form_attributes: bool = False
+    path_to_network: str,
+    epsg: str,
+    force_long_form_attributes: bool = False,
+    processes: int = 1,
+    region: Optional[Union[str, BaseGeometry, tuple[float, float, float, float]]] = None,
+    modes: Optional[Union[str, set, list]] = None,
+    attribute_keys: Optional[Union[set, list]] = None,
 ) -> core.Network:
     """Reads MATSim's network.xml to genet.Network object.
 
@@ -98,6 +110,22 @@ def read_matsim_network(
                 Network level attributes cannot be forced to be read into long form.
 
             Defaults to False.
+        processes (int, optional):
+            Number of parallel processes to parse the `nodes` and `links` of the network file across.
+            The file is split into chunks aligned on element boundaries and clashing IDs are resolved in file order,
+            as in a sequential read. Defaults to 1.
+        region (Optional[Union[str, BaseGeometry, tuple[float, float, float, float]]], optional):
+            If given, only nodes within this region, and links between them, are read. Region can be given as:
+            - (min lon, min lat, max lon, max lat) bounding box.
+            - shapely.geometry object, e.g. Polygon, in EPSG:4326.
+            - path to a geojson file, can have multiple features.
+            - string with comma separated hex tokens of Google's S2 geometry.
+            Defaults to None.
+        modes (Optional[Union[str, set, list]], optional):
+            If given, only links allowing any of these modes, and nodes they connect, are read. Defaults to None.
+        attribute_keys (Optional[Union[set, list]], optional):
+            If given, only additional attributes of nodes and links under these keys are read.
+            Link geometry is always read. Defaults to None.
 
     Returns:
         core.Network: GeNet Network object.
@@ -105,7 +133,13 @@ def read_matsim_network(
     n = core.Network(epsg=epsg)
     (n.graph, n.link_id_mapping, duplicated_nodes, duplicated_links, network_attributes) = (
         matsim_reader.read_network(
-            path_to_network, n.transformer, force_long_form_attributes=force_long_form_attributes
+            path_to_network,
+            n.transformer,
+            force_long_form_attributes=force_long_form_attributes,
+            processes=processes,
+            network_filter=matsim_reader.NetworkFilter.from_inputs(
+                region=region, modes=modes, attribute_keys=attribute_keys
+            ),
         )
     )
     n.attributes = dict_support.merge_complex_dictionaries(n.attributes, network_attributes)
@@ -161,30 +195,22 @@ def read_matsim_schedule(
     Returns:
         schedule_elements.Schedule: GeNet Schedule object.
     """
-    (services, minimal_transfer_times, transit_stop_id_mapping, schedule_attributes) = (
-        matsim_reader.read_schedule(
-            path_to_schedule, epsg, force_long_form_attributes=force_long_form_attributes
-        )
+    schedule_graph, minimal_transfer_times, schedule_attributes = matsim_reader.read_schedule(
+        path_to_schedule, epsg, force_long_form_attributes=force_long_form_attributes
     )
     if path_to_vehicles:
         vehicles, vehicle_types = matsim_reader.read_vehicles(path_to_vehicles)
         matsim_schedule = schedule_elements.Schedule(
-            services=services, epsg=epsg, vehicles=vehicles, vehicle_types=vehicle_types
+            epsg=epsg,
+            _graph=schedule_graph,
+            minimal_transfer_times=minimal_transfer_times,
+            vehicles=vehicles,
+            vehicle_types=vehicle_types,
         )
     else:
-        matsim_schedule = schedule_elements.Schedule(services=services, epsg=epsg)
-    matsim_schedule.minimal_transfer_times = minimal_transfer_times
-
-    extra_stops = {
-        stop: transit_stop_id_mapping[stop]
-        for stop in set(transit_stop_id_mapping) - set(matsim_schedule.graph().nodes())
-    }
-    for k in extra_stops.keys():
-        extra_stops[k] = schedule_elements.Stop(**extra_stops[k]).__dict__
-        extra_stops[k]["routes"] = set()
-        extra_stops[k]["services"] = set()
-    matsim_schedule._graph.add_nodes_from(extra_stops)
-    nx.set_node_attributes(matsim_schedule._graph, extra_stops)
+        matsim_schedule = schedule_elements.Schedule(
+            epsg=epsg, _graph=schedule_graph, minimal_transfer_times=minimal_transfer_times
+        )
     matsim_schedule.attributes = dict_support.merge_complex_dictionaries(
         matsim_schedule.attributes, schedule_attributes
     )
@@ -205,6 +231,7 @@ def read_json(network_path: str, epsg: str, schedule_path: Optional[str] = None)
     n = read_json_network(network_path, epsg)
     if schedule_path is not None:
         n.schedule = read_json_schedule(schedule_path, epsg)
+        n._record_routing_version_of_routed_services()
     return n
 
 
@@ -319,12 +346,38 @@ def read_json_schedule(schedule_path: str, epsg: str) -> schedule_elements.Sched
     return s
 
 
-def _literal_eval_col(df_col):
+def _decode_csv_value(value: str):
     try:
-        df_col = df_col.apply(lambda x: ast.literal_eval(x))
-    except KeyError:
-        pass
-    return df_col
+        return json.loads(value)
+    except ValueError:
+        # CSVs written by older GeNet versions hold python literals
+        return ast.literal_eval(value)
+
+
+def _decode_csv_col(df_col: pd.Series) -> pd.Series:
+    return df_col.map(_decode_csv_value, na_action="ignore")
+
+
+def _decode_csv_modes_col(df_col: pd.Series) -> pd.Series:
+    # few distinct mode combinations, each link still gets its own set
+    decoded_modes = {modes: _decode_csv_value(modes) for modes in df_col.dropna().unique()}
+    return df_col.map(lambda modes: set(decoded_modes[modes]), na_action="ignore")
+
+
+def _records_without_missing_values(df: pd.DataFrame) -> dict[str, dict]:
+    # column-wise `tolist` gives native python values much faster than `DataFrame.to_dict`
+    cols = list(df.columns)
+    records = {
+        _id: dict(zip(cols, row))
+        for _id, row in zip(df.index, zip(*(df[col].tolist() for col in cols)))
+    }
+    cols_with_missing_values = df.columns[df.isnull().any()]
+    if not cols_with_missing_values.empty:
+        for attribs in records.values():
+            for col in cols_with_missing_values:
+                if not dict_support.notna(attribs[col]):
+                    del attribs[col]
+    return records
 
 
 def read_csv(path_to_network_nodes: str, path_to_network_links: str, epsg: str) -> core.Network:
@@ -338,6 +391,8 @@ def read_csv(path_to_network_nodes: str, path_to_network_links: str, epsg: str)
             - x: spatial coordinate in given epsg
             - y: spatial coordinate in given epsg
 
+            `lat`, `lon` can be given instead of, or alongside, `x`, `y`.
+
         path_to_network_links (str):
             CSV file describing links.
             Should at least include columns:
@@ -350,12 +405,15 @@ def read_csv(path_to_network_nodes: str, path_to_network_links: str, epsg: str)
             - freespeed - meter/seconds speed
             - capacity - vehicles/hour
             - permlanes - number of lanes
-            - modes - set of modes
+            - modes - JSON list of modes
+            - attributes - JSON dictionary of additional attributes
+
+            Python literals of `modes` and `attributes`, as written by older GeNet versions, are also read.
 
         epsg (str): Projection for the network, e.g. 'epsg:27700'.
 
     Raises:
-        NetworkSchemaError: Network nodes must have at least the columns specified above.
+        NetworkSchemaError: Network nodes must have at least the columns specified above and link IDs must be unique.
 
     Returns:
         core.Network: GeNet network object.
@@ -376,7 +434,7 @@ def read_csv(path_to_network_nodes: str, path_to_network_links: str, epsg: str)
     except KeyError:
         pass
 
-    logging.info(f"Reading links from {path_to_network_nodes}")
+    logging.info(f"Reading links from {path_to_network_links}")
     df_links = pd.read_csv(path_to_network_links)
     if {"index", "id"}.issubset(set(df_links.columns)):
         df_links = df_links.drop("index", axis=1)
@@ -394,23 +452,113 @@ def read_csv(path_to_network_nodes: str, path_to_network_links: str, epsg: str)
     df_links["to"] = df_links["to"].astype(int).astype(str)
     df_links = df_links.set_index("id", drop=False)
     # recover encoded geometry
-    try:
-        df_links["geometry"] = df_links["geometry"].apply(
-            lambda x: spatial.decode_polyline_to_shapely_linestring(x)
+    if "geometry" in df_links.columns:
+        has_geometry = df_links["geometry"].notnull()
+        df_links["geometry"] = df_links["geometry"].astype(object)
+        df_links.loc[has_geometry, "geometry"] = spatial.decode_polylines_to_shapely_linestrings(
+            df_links.loc[has_geometry, "geometry"]
         )
-    except KeyError:
-        pass
-    df_links["attributes"] = _literal_eval_col(df_links["attributes"])
-    df_links["modes"] = _literal_eval_col(df_links["modes"])
+    if df_links.index.duplicated().any():
+        raise NetworkSchemaError(
+            f"Link IDs in links.csv must be unique, found duplicates: "
+            f"{set(df_links.index[df_links.index.duplicated()])}"
+        )
+    if "attributes" in df_links.columns:
+        df_links["attributes"] = _decode_csv_col(df_links["attributes"])
+    if "modes" in df_links.columns:
+        df_links["modes"] = _decode_csv_modes_col(df_links["modes"])
 
     n = core.Network(epsg=epsg)
-    n.add_nodes(df_nodes.T.to_dict())
-    n.add_links(df_links.T.to_dict())
-    n.change_log = change_log.ChangeLog()
+    _complete_csv_node_coordinates(df_nodes, n)
+    if "s2_id" not in df_nodes.columns:
+        df_nodes["s2_id"] = [
+            spatial.generate_index_s2(lat, lon)
+            for lat, lon in zip(df_nodes["lat"], df_nodes["lon"])
+        ]
+    _complete_csv_link_lengths(df_links, df_nodes)
+    df_links["multi_edge_idx"] = df_links.groupby(["from", "to"]).cumcount()
+
+    n.graph.add_nodes_from(_records_without_missing_values(df_nodes).items())
+    n.link_id_mapping = _records_without_missing_values(df_links[["from", "to", "multi_edge_idx"]])
+    n.graph.add_edges_from(
+        (attribs["from"], attribs["to"], multi_edge_idx, attribs)
+        for multi_edge_idx, attribs in zip(
+            df_links["multi_edge_idx"],
+            _records_without_missing_values(df_links.drop("multi_edge_idx", axis=1)).values(),
+        )
+    )
+    logging.info(f"Added {len(df_nodes)} nodes and {len(df_links)} links")
     return n
 
 
-def read_gtfs(path: str, day: str, epsg: Optional[str] = None) -> schedule_elements.Schedule:
+def _complete_csv_node_coordinates(df_nodes: pd.DataFrame, n: core.Network):
+    """Fills in missing `lat`, `lon` of nodes from their `x`, `y` and vice versa, in place.
+
+    Args:
+        df_nodes (pd.DataFrame): Nodes read from CSV.
+        n (core.Network): Network the nodes are read into, gives the projection of `x`, `y`.
+
+    Raises:
+        NetworkSchemaError: Nodes must have either `x`, `y` or `lat`, `lon` columns.
+    """
+    if not ({"lat", "lon"}.issubset(df_nodes.columns) or {"x", "y"}.issubset(df_nodes.columns)):
+        raise NetworkSchemaError(
+            "Expected either `x`, `y` or `lat`, `lon` columns in the nodes.csv. "
+            f"Found columns: {list(df_nodes.columns)}"
+        )
+    for col in ["x", "y", "lon", "lat"]:
+        if col not in df_nodes.columns:
+            df_nodes[col] = float("nan")
+    missing_lat_lon = df_nodes[["lon", "lat"]].isnull().any(axis=1)
+    if missing_lat_lon.any():
+        lon, lat = n.transformer.transform(
+            df_nodes.loc[missing_lat_lon, "x"].values, df_nodes.loc[missing_lat_lon, "y"].values
+        )
+        df_nodes.loc[missing_lat_lon, "lon"] = lon
+        df_nodes.loc[missing_lat_lon, "lat"] = lat
+    missing_x_y = df_nodes[["x", "y"]].isnull().any(axis=1)
+    if missing_x_y.any():
+        x, y = Transformer.from_crs("epsg:4326", n.epsg, always_xy=True).transform(
+            df_nodes.loc[missing_x_y, "lon"].values, df_nodes.loc[missing_x_y, "lat"].values
+        )
+        df_nodes.loc[missing_x_y, "x"] = x
+        df_nodes.loc[missing_x_y, "y"] = y
+
+
+def _complete_csv_link_lengths(df_links: pd.DataFrame, df_nodes: pd.DataFrame):
+    """Fills in missing `length` of links with the straight line distance between their nodes, in place.
+
+    Args:
+        df_links (pd.DataFrame): Links read from CSV.
+        df_nodes (pd.DataFrame): Nodes read from CSV, with `s2_id` column.
+    """
+    if "length" not in df_links.columns:
+        df_links["length"] = float("nan")
+    missing_length = df_links["length"].isnull()
+    if not missing_length.any():
+        return
+    logging.warning(
+        f"The following links: {list(df_links.index[missing_length])} are missing `length` attribute. "
+        "A straight line distance between from and to nodes will be computed."
+    )
+    s2_from = df_links.loc[missing_length, "from"].map(df_nodes["s2_id"])
+    s2_to = df_links.loc[missing_length, "to"].map(df_nodes["s2_id"])
+    with_spatial_info = s2_from.notnull() & s2_to.notnull()
+    df_links.loc[with_spatial_info.index[with_spatial_info], "length"] = [
+        round(spatial.distance_between_s2cellids(int(u), int(v)))
+        for u, v in zip(s2_from[with_spatial_info], s2_to[with_spatial_info])
+    ]
+    if df_links["length"].isnull().all():
+        df_links.drop("length", axis=1, inplace=True)
+
+
+def read_gtfs(
+    path: str,
+    day: str,
+    epsg: Optional[str] = None,
+    csv_engine: Literal["c", "pyarrow"] = "c",
+    cache_dir: Optional[str] = None,
+) -> schedule_elements.Schedule:
     """Reads schedule from GTFS.
 
     The resulting services will not have network routes.
@@ -423,12 +571,64 @@ def read_gtfs(path: str, day: str, epsg: Optional[str] = None) -> schedule_eleme
             Projection for the output Schedule, e.g. 'epsg:27700'.
             If not provided, defaults to 'epsg:4326'.
             Defaults to None.
+        csv_engine (Literal["c", "pyarrow"], optional):
+            CSV parser of GTFS stop times and trips, `pyarrow` parses them using multiple threads.
+            Defaults to "c".
+        cache_dir (Optional[str], optional):
+            If given, parsed GTFS tables are cached there as parquet files, under a hash of the feed's contents.
+            Reading the same feed again, e.g. for another `day`, then only filters the calendar and builds the
+            schedule. The cache can be shared between processes. Defaults to None.
 
     Returns:
         schedule_elements.Schedule: GeNet schedule.
     """
     logging.info(f"Reading GTFS from {path}")
-    schedule_graph = gtfs_reader.read_gtfs_to_schedule_graph(path, day)
+    schedule_graph = gtfs_reader.read_gtfs_to_schedule_graph(
+        path, day, csv_engine=csv_engine, cache_dir=cache_dir
+    )
+    s = schedule_elements.Schedule(epsg="epsg:4326", _graph=schedule_graph)
+    if epsg is not None:
+        s.reproject(new_epsg=epsg)
+    return s
+
+
+def read_gtfs_feeds(
+    paths: list[str],
+    day: str,
+    processes: int = 1,
+    epsg: Optional[str] = None,
+    csv_engine: Literal["c", "pyarrow"] = "c",
+    cache_dir: Optional[str] = None,
+) -> schedule_elements.Schedule:
+    """Reads several GTFS feeds into a single schedule.
+
+    Feeds are parsed in parallel and combined before the schedule is built.
+    GTFS routes, trips and stops with IDs already used by another feed are given new IDs, suffixed with `_{n}`, except
+    for stops at the same coordinates, which are shared between feeds.
+    Feeds without services on the given day are skipped.
+
+    The resulting services will not have network routes.
+    Input GTFS is assumed to be using the 'epsg:4326' projection.
+
+    Args:
+        paths (list[str]): Paths to GTFS folders or zip files.
+        day (str): 'YYYYMMDD' to use from the GTFS.
+        processes (int, optional): Number of processes parsing feeds in parallel. Defaults to 1.
+        epsg (Optional[str], optional):
+            Projection for the output Schedule, e.g. 'epsg:27700'.
+            If not provided, defaults to 'epsg:4326'.
+            Defaults to None.
+        csv_engine (Literal["c", "pyarrow"], optional):
+            CSV parser of GTFS stop times and trips, see `read_gtfs`. Defaults to "c".
+        cache_dir (Optional[str], optional): Directory to cache parsed GTFS tables in, see `read_gtfs`. Defaults to None.
+
+    Returns:
+        schedule_elements.Schedule: GeNet schedule.
+    """
+    logging.info(f"Reading {len(paths)} GTFS feeds")
+    schedule_graph = gtfs_reader.read_gtfs_feeds_to_schedule_graph(
+        paths, day, processes=processes, csv_engine=csv_engine, cache_dir=cache_dir
+    )
     s = schedule_elements.Schedule(epsg="epsg:4326", _graph=schedule_graph)
     if epsg is not None:
         s.reproject(new_epsg=epsg)
@@ -436,7 +636,13 @@ def read_gtfs(path: str, day: str, epsg: Optional[str] = None) -> schedule_eleme
 
 
 def read_osm(
-    osm_file_path: str, osm_read_config: str, num_processes: int = 1, epsg: str = "epsg:4326"
+    osm_file_path: str,
+    osm_read_config: str,
+    num_processes: int = 1,
+    epsg: str = "epsg:4326",
+    two_pass: bool = False,
+    region: Optional[Union[str, BaseGeometry, tuple[float, float, float, float]]] = None,
+    keep_crossing_ways: bool = False,
 ) -> core.Network:
     """Reads OSM data into a graph of the Network object.
 
@@ -449,6 +655,19 @@ def read_osm(
         epsg (Optional[str], optional):
             Projection for the output Network, e.g. 'epsg:27700'.
             Defaults to "epsg:4326".
+        two_pass (bool, optional):
+            If True, reads the file in two passes: ways first, then the locations of only the nodes those ways use.
+            This uses much less memory than keeping every node in the file, e.g. of buildings. Defaults to False.
+        region (Optional[Union[str, BaseGeometry, tuple[float, float, float, float]]], optional):
+            If given, OSM ways are clipped to this region before the network is built. Region can be given as:
+            - (min lon, min lat, max lon, max lat) bounding box.
+            - shapely.geometry object, e.g. Polygon, in EPSG:4326.
+            - path to a geojson file, can have multiple features.
+            - string with comma separated hex tokens of Google's S2 geometry.
+            Defaults to None.
+        keep_crossing_ways (bool, optional):
+            If True, ways crossing the boundary of `region` are kept whole, otherwise they are cut at the boundary.
+            Defaults to False.
 
     Returns:
         core.Network: GeNet network object.
@@ -457,7 +676,12 @@ def read_osm(
     config = osm_reader.Config(osm_read_config)
     n = core.Network(epsg)
     nodes, edges = osm_reader.generate_osm_graph_edges_from_file(
-        osm_file_path, config, num_processes
+        osm_file_path,
+        config,
+        num_processes,
+        two_pass=two_pass,
+        region=region,
+        keep_crossing_ways=keep_crossing_ways,
     )
 
     nodes_and_attributes = parallel.multiprocess_wrap(
@@ -483,9 +707,6 @@ def read_osm(
         processes=num_processes,
     )
     n.add_edges(edges_attributes, ignore_change_log=True)
-
-    logging.info("Deleting isolated nodes which have no edges.")
-    n.remove_nodes(list(nx.isolates(n.graph)))
     return n
 
 
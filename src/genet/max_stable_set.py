@@ -1,15 +1,17 @@
-import itertools
 import logging
 from copy import deepcopy
 
 import matplotlib.pyplot as plt
 import networkx as nx
+import numpy as np
 import pandas as pd
 import pyomo.environ as pe
+from scipy import optimize, sparse
+from scipy.sparse import csgraph
 
 import genet.output.spatial as spatial_output
 import genet.utils.dict_support as dict_support
-import genet.utils.graph_operations as graph_operations
+import genet.utils.parallel as parallel
 from genet.exceptions import InvalidMaxStableSetProblem
 
 
@@ -27,6 +29,297 @@ def get_indices_of_chosen_problem_graph_nodes(model: pe.Model):
     ]
 
 
+def _finite_coeffs(coeffs: np.ndarray) -> np.ndarray:
+    """Replaces infinite coefficients, which zero path lengths give, with 10 times the largest finite coefficient.
+
+    Only the scipy and greedy solvers need this, pyomo solvers are given the coefficients as they are.
+    """
+    finite = np.isfinite(coeffs)
+    if finite.all():
+        return coeffs
+    coeffs = coeffs.copy()
+    coeffs[~finite] = 10 * coeffs[finite].max(initial=1)
+    return coeffs
+
+
+def solve_with_scipy_milp(coeffs: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Solves the maximum weight stable set problem as a sparse MILP with `scipy.optimize.milp` (HiGHS).
+
+    Args:
+        coeffs (np.ndarray): Weight of each problem node.
+        edges (np.ndarray): (n, 2) array of conflicting problem node indices.
+
+    Returns:
+        np.ndarray: Indices of the chosen problem nodes.
+    """
+    coeffs = _finite_coeffs(coeffs)
+    n_edges = len(edges)
+    constraints = []
+    if n_edges:
+        adjacency = sparse.coo_matrix(
+            (np.ones(2 * n_edges), (np.repeat(np.arange(n_edges), 2), edges.ravel())),
+            shape=(n_edges, len(coeffs)),
+        ).tocsr()
+        constraints = [optimize.LinearConstraint(adjacency, -np.inf, 1)]
+    result = optimize.milp(
+        c=-coeffs,
+        constraints=constraints,
+        integrality=np.ones(len(coeffs)),
+        bounds=optimize.Bounds(0, 1),
+    )
+    if result.x is None:
+        logging.warning(f"The scipy MILP solver did not find a solution: {result.message}")
+        return np.array([], dtype=int)
+    return np.flatnonzero(result.x > 0.5)
+
+
+def solve_with_greedy_heuristic(
+    coeffs: np.ndarray, edges: np.ndarray, max_iterations: int = 100
+) -> np.ndarray:
+    """Approximates the maximum weight stable set with a greedy pass followed by a local search.
+
+    The greedy pass picks problem nodes in decreasing order of `coeff / (degree + 1)`.
+    The local search then repeatedly swaps in any node whose weight exceeds the total weight of its chosen
+    neighbours and swaps out any chosen node outweighed by the neighbours only it blocks, until no such swap is left
+    or `max_iterations` passes have been made.
+    The result is always a stable set, but not necessarily the optimal one.
+
+    Args:
+        coeffs (np.ndarray): Weight of each problem node.
+        edges (np.ndarray): (n, 2) array of conflicting problem node indices.
+        max_iterations (int, optional): Limit on local search passes. Defaults to 100.
+
+    Returns:
+        np.ndarray: Indices of the chosen problem nodes.
+    """
+    coeffs = _finite_coeffs(coeffs)
+    n_nodes = len(coeffs)
+    self_looped = np.zeros(n_nodes, dtype=bool)
+    self_looped[edges[edges[:, 0] == edges[:, 1], 0]] = True
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    adjacency = sparse.coo_matrix(
+        (np.ones(2 * len(edges)), (edges.ravel(), edges[:, ::-1].ravel())), shape=(n_nodes, n_nodes)
+    ).tocsr()
+    indptr, indices = adjacency.indptr, adjacency.indices
+    neighbours = [indices[indptr[i] : indptr[i + 1]].tolist() for i in range(n_nodes)]
+    weights = coeffs.tolist()
+
+    chosen = np.zeros(n_nodes, dtype=bool)
+    blocked = self_looped.copy()
+    for i in np.argsort(-coeffs / (np.diff(indptr) + 1), kind="stable").tolist():
+        if not blocked[i]:
+            chosen[i] = True
+            blocked[i] = True
+            blocked[neighbours[i]] = True
+
+    for _ in range(max_iterations):
+        improved = False
+        # (*, 1) swaps: bring in a node if it outweighs all of its chosen neighbours
+        for i in np.flatnonzero(~chosen & ~self_looped).tolist():
+            chosen_neighbours = [j for j in neighbours[i] if chosen[j]]
+            if weights[i] > sum(weights[j] for j in chosen_neighbours):
+                chosen[chosen_neighbours] = False
+                chosen[i] = True
+                improved = True
+        # (1, *) swaps: drop a node if the neighbours it alone blocks outweigh it
+        for i in np.flatnonzero(chosen).tolist():
+            freed = [
+                j
+                for j in neighbours[i]
+                if not self_looped[j] and all(k == i or not chosen[k] for k in neighbours[j])
+            ]
+            replacement = []
+            for j in sorted(freed, key=lambda j: -weights[j]):
+                if not any(k in replacement for k in neighbours[j]):
+                    replacement.append(j)
+            if sum(weights[j] for j in replacement) > weights[i]:
+                chosen[i] = False
+                chosen[replacement] = True
+                improved = True
+        if not improved:
+            break
+    return np.flatnonzero(chosen)
+
+
+def solve_with_pyomo(coeffs: np.ndarray, edges: np.ndarray, solver: str = "cbc") -> np.ndarray:
+    """Solves the maximum weight stable set problem with a pyomo model passed to an external MILP solver.
+
+    Args:
+        coeffs (np.ndarray): Weight of each problem node.
+        edges (np.ndarray): (n, 2) array of conflicting problem node indices.
+        solver (str, optional): Name of the solver for pyomo's `SolverFactory`. Defaults to "cbc".
+
+    Returns:
+        np.ndarray: Indices of the chosen problem nodes.
+    """
+    # --------------------------------------------------------
+    # Model
+    # --------------------------------------------------------
+
+    model = pe.ConcreteModel()
+
+    # --------------------------------------------------------
+    # Sets/Params
+    # --------------------------------------------------------
+
+    # nodes and edge sets
+    # nodes: network's graph nodes that are closest to stops
+    # edges: connections between nodes if they are in the same
+    #    selection pool or there is no path between them
+    vertices = range(len(coeffs))
+
+    model.vertices = pe.Set(initialize=vertices)
+
+    def spatial_proximity_coefficient_init(model, i):
+        # todo normalise
+        return float(coeffs[i])
+
+    model.c = pe.Param(model.vertices, initialize=spatial_proximity_coefficient_init)
+
+    # --------------------------------------------------------
+    # Variables
+    # --------------------------------------------------------
+
+    model.x = pe.Var(vertices, within=pe.Binary)
+
+    # --------------------------------------------------------
+    # Constraints
+    # --------------------------------------------------------
+
+    model.edge_adjacency = pe.ConstraintList()
+    for u, v in edges.tolist():
+        model.edge_adjacency.add(model.x[u] + model.x[v] <= 1)
+
+    # --------------------------------------------------------
+    # Objective
+    # --------------------------------------------------------
+
+    def total_nodes_rule(model):
+        return sum(model.c[i] * model.x[i] for i in model.vertices)
+
+    model.total_nodes = pe.Objective(rule=total_nodes_rule, sense=pe.maximize)
+
+    # --------------------------------------------------------
+    # Solver
+    # --------------------------------------------------------
+
+    _solver = pe.SolverFactory(solver)
+    _solver.solve(model)
+
+    return np.array(get_indices_of_chosen_problem_graph_nodes(model), dtype=int)
+
+
+SOLVERS = {"scipy": solve_with_scipy_milp, "greedy": solve_with_greedy_heuristic}
+
+
+def solve_problem_arrays(coeffs: np.ndarray, edges: np.ndarray, solver: str = "cbc") -> np.ndarray:
+    """Solves a maximum weight stable set problem given in array form with the chosen solver.
+
+    Args:
+        coeffs (np.ndarray): Weight of each problem node.
+        edges (np.ndarray): (n, 2) array of conflicting problem node indices.
+        solver (str, optional): `scipy`, `greedy` or a pyomo solver name. Defaults to "cbc".
+
+    Returns:
+        np.ndarray: Indices of the chosen problem nodes.
+    """
+    if solver in SOLVERS:
+        return SOLVERS[solver](coeffs, edges)
+    return solve_with_pyomo(coeffs, edges, solver)
+
+
+def decompose_problem(
+    coeffs: np.ndarray, edges: np.ndarray
+) -> tuple[np.ndarray, list[tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+    """Splits a maximum weight stable set problem into its connected components.
+
+    Components which are a single problem node or a clique are solved in closed form: the single node or the clique
+    node with the largest coefficient is chosen. Nodes in conflict with themselves are never chosen.
+
+    Args:
+        coeffs (np.ndarray): Weight of each problem node.
+        edges (np.ndarray): (n, 2) array of conflicting problem node indices.
+
+    Returns:
+        tuple[np.ndarray, list[tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+            Indices of problem nodes chosen in closed form and the remaining components that need a solver, each as
+            (problem node indices, their coefficients, component edges indexing into the component's problem nodes).
+    """
+    n_nodes = len(coeffs)
+    edges = np.unique(np.sort(edges.reshape(-1, 2), axis=1), axis=0)
+    self_looped = np.zeros(n_nodes, dtype=bool)
+    self_looped[edges[edges[:, 0] == edges[:, 1], 0]] = True
+    adjacency = sparse.coo_matrix(
+        (np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(n_nodes, n_nodes)
+    )
+    n_components, labels = csgraph.connected_components(adjacency, directed=False)
+
+    order = np.argsort(labels, kind="stable")
+    component_sizes = np.bincount(labels, minlength=n_components)
+    component_starts = np.concatenate([[0], np.cumsum(component_sizes)[:-1]])
+    local_index = np.empty(n_nodes, dtype=np.int64)
+    local_index[order] = np.arange(n_nodes) - component_starts[labels[order]]
+
+    proper_edges = edges[edges[:, 0] != edges[:, 1]]
+    proper_edges_per_component = np.bincount(labels[proper_edges[:, 0]], minlength=n_components)
+    has_self_loop = np.bincount(labels[self_looped], minlength=n_components) > 0
+    is_clique = (
+        proper_edges_per_component == component_sizes * (component_sizes - 1) // 2
+    ) & ~has_self_loop
+
+    members = np.split(order, component_starts[1:])
+    edge_labels = labels[edges[:, 0]]
+    edges_per_component = np.bincount(edge_labels, minlength=n_components)
+    component_edges = np.split(
+        local_index[edges[np.argsort(edge_labels, kind="stable")]],
+        np.cumsum(edges_per_component)[:-1],
+    )
+
+    chosen = []
+    components = []
+    for label in range(n_components):
+        if is_clique[label]:
+            chosen.append(members[label][np.argmax(coeffs[members[label]])])
+        else:
+            components.append((members[label], coeffs[members[label]], component_edges[label]))
+    return np.array(chosen, dtype=int), components
+
+
+def solve_components(
+    components: list[tuple[np.ndarray, np.ndarray, np.ndarray]], solver: str = "cbc"
+) -> list[int]:
+    """Solves each component of a decomposed maximum weight stable set problem.
+
+    Args:
+        components (list[tuple[np.ndarray, np.ndarray, np.ndarray]]): Components, as returned by `decompose_problem`.
+        solver (str, optional): `scipy`, `greedy` or a pyomo solver name. Defaults to "cbc".
+
+    Returns:
+        list[int]: Indices of the chosen problem nodes, across all components.
+    """
+    chosen = []
+    for members, coeffs, edges in components:
+        chosen.extend(members[solve_problem_arrays(coeffs, edges, solver)].tolist())
+    return chosen
+
+
+def grouped_mean(codes: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Mean of `values` grouped by integer `codes` in the range [0, n).
+
+    Args:
+        codes (np.ndarray): Group of each value.
+        values (np.ndarray): Values to average.
+        n (int): Number of groups.
+
+    Returns:
+        np.ndarray: Mean value of each group, NaN for groups without values.
+    """
+    counts = np.bincount(codes, minlength=n)
+    sums = np.bincount(codes, weights=values, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
 class MaxStableSet:
     def __init__(self, pt_graph, network_spatial_tree, modes, distance_threshold=30, step_size=10):
         self.service_modes = modes
@@ -66,30 +359,14 @@ class MaxStableSet:
         self.unsolved_stops = set()
 
     def find_closest_links(self):
-        # increase distance by step size until all stops have closest links or reached threshold
-        distance = self.step_size
-        nodes = self.cast_catchment(
-            df_stops=self.stops.loc[:, ["id", "geometry"]].copy(), distance=distance
-        )
-        nodes["catchment"] = distance
-        stops = set(self.stops["id"])
-        while (set(nodes.index) != stops) and (distance < self.distance_threshold):
-            distance += self.step_size
-            _df = self.cast_catchment(
-                df_stops=self.stops.loc[
-                    self.stops["id"].isin(stops - set(nodes.index)), ["id", "geometry"]
-                ].copy(),
-                distance=distance,
-            )
-            _df["catchment"] = distance
-            nodes = pd.concat([nodes, _df])
+        # catchments grow by step size until a stop finds closest links or reaches the threshold
+        nodes = self.network_spatial_tree.closest_links(
+            gdf_points=self.stops.loc[:, ["id", "geometry"]].copy(),
+            distance_radius=self.distance_threshold,
+            step_size=self.step_size,
+        ).dropna(subset=["link_id"])
         return nodes[~nodes["link_id"].str.match("artificial")]
 
-    def cast_catchment(self, df_stops, distance):
-        return self.network_spatial_tree.closest_links(
-            gdf_points=df_stops, distance_radius=distance
-        ).dropna()
-
     def all_stops_have_nearest_links(self):
         return not bool(self.stops_missing_nearest_links())
 
@@ -122,41 +399,49 @@ class MaxStableSet:
             df_pt_edges=self.edges, from_col="link_id_u", to_col="link_id_v", weight="length"
         )
 
-        # build the problem graph
-        problem_graph = nx.DiGraph()
-        problem_nodes = self.nodes.set_index("problem_nodes").T.to_dict()
-        problem_graph.add_nodes_from(problem_nodes)
-        path_length_components = pd.concat(
+        # problem nodes are integer coded by their position in `self.nodes`
+        problem_nodes = pd.Index(self.nodes["problem_nodes"])
+        codes_u = problem_nodes.get_indexer(self.edges["problem_nodes_u"])
+        codes_v = problem_nodes.get_indexer(self.edges["problem_nodes_v"])
+        path_lengths = self.edges["path_lengths"].to_numpy(dtype=float)
+        routed = ~np.isnan(path_lengths)
+
+        # coefficient is the inverse of the mean of the average path lengths to and from each problem node
+        # problem nodes without any paths are dropped from the problem
+        mean_path_lengths = np.vstack(
             [
-                self.edges["path_lengths"]
-                .dropna()
-                .groupby(self.edges[f"problem_nodes_{component}"])
-                .mean()
-                .to_frame(f"path_lengths_{component}")
-                for component in ["u", "v"]
-            ],
-            axis=1,
+                grouped_mean(codes[routed], path_lengths[routed], len(problem_nodes))
+                for codes in [codes_u, codes_v]
+            ]
         )
-        path_length_coeff = (1 / path_length_components.mean(axis=1, skipna=True)).to_dict()
-        nx.set_node_attributes(problem_graph, problem_nodes)
-        nx.set_node_attributes(problem_graph, path_length_coeff, "coeff")
-
-        problem_edges = self.edges.loc[self.edges["path_lengths"].isna(), :]
-        problem_graph.add_edges_from(
-            zip(problem_edges["problem_nodes_u"], problem_edges["problem_nodes_v"])
+        has_paths = ~np.isnan(mean_path_lengths).all(axis=0)
+        coeffs = np.full(len(problem_nodes), np.nan)
+        with np.errstate(divide="ignore"):
+            coeffs[has_paths] = 1 / np.nanmean(mean_path_lengths[:, has_paths], axis=0)
+
+        # conflicts between problem nodes of consecutive stops with no path between them and
+        # between all problem nodes in the catchment pool of each stop
+        stop_codes = pd.DataFrame(
+            {"id": self.nodes["id"].to_numpy(), "code": np.arange(len(problem_nodes))}
         )
-        # connect all catchment pools
-        [
-            problem_graph.add_edges_from(itertools.combinations(group["problem_nodes"], 2))
-            for name, group in self.nodes.groupby("id")
-        ]
+        catchment_pools = stop_codes.merge(stop_codes, on="id")
+        catchment_pools = catchment_pools[catchment_pools["code_x"] < catchment_pools["code_y"]]
+        conflicts = np.vstack(
+            [
+                np.column_stack([codes_u[~routed], codes_v[~routed]]),
+                catchment_pools[["code_x", "code_y"]].to_numpy(),
+            ]
+        )
+        conflicts = conflicts[has_paths[conflicts].all(axis=1)]
 
-        nodes_without_paths = set(problem_graph.nodes()) - set(
-            graph_operations.extract_on_attributes(
-                problem_graph.nodes(data=True), conditions={"coeff": has_attrib}
-            )
+        problem_graph = nx.DiGraph()
+        node_data = self.nodes.drop(columns="problem_nodes").assign(coeff=coeffs)[has_paths]
+        problem_graph.add_nodes_from(
+            zip(problem_nodes[has_paths], node_data.to_dict(orient="records"))
+        )
+        problem_graph.add_edges_from(
+            zip(problem_nodes[conflicts[:, 0]], problem_nodes[conflicts[:, 1]])
         )
-        problem_graph.remove_nodes_from(nodes_without_paths)
         return problem_graph
 
     def in_out_degree(self, node):
@@ -172,24 +457,22 @@ class MaxStableSet:
             return _in + _out
 
     def has_a_completely_connected_catchment(self):
-        stop_id_groups = self.nodes.groupby("id")
-        for u, v in self.pt_graph.edges():
-            u_group = None
-            v_group = None
-            if u in stop_id_groups.groups:
-                u_group = stop_id_groups.get_group(u)
-            if v in stop_id_groups.groups:
-                v_group = stop_id_groups.get_group(v)
-            if (u_group is not None) and (v_group is not None):
-                node_degrees = [self.in_out_degree(n) for n in u_group["problem_nodes"]]
-                node_degrees += [self.in_out_degree(n) for n in v_group["problem_nodes"]]
-                total_nodes = len(u_group) + len(v_group)
-                if all([node_degree >= total_nodes - 1 for node_degree in node_degrees]):
-                    logging.warning(
-                        f"Two stops: {u} and {v} are completely connected, suggesting that one or more stops has "
-                        f"found no viable network links within the specified threshold"
-                    )
-                    return True
+        # a catchment pair is completely connected if every problem node of two consecutive stops conflicts with all
+        # other problem nodes of the two stops
+        degrees = self.nodes["problem_nodes"].map(dict(self.problem_graph.degree())).fillna(0)
+        catchments = degrees.groupby(self.nodes["id"]).agg(["size", "min"])
+        pt_edges = pd.DataFrame(list(self.pt_graph.edges()), columns=["u", "v"], dtype=object)
+        pt_edges = pt_edges.join(catchments, on="u").join(catchments, on="v", rsuffix="_v").dropna()
+        completely_connected = pt_edges[
+            pt_edges[["min", "min_v"]].min(axis=1) >= pt_edges["size"] + pt_edges["size_v"] - 1
+        ]
+        if not completely_connected.empty:
+            u, v = completely_connected.iloc[0][["u", "v"]]
+            logging.warning(
+                f"Two stops: {u} and {v} are completely connected, suggesting that one or more stops has "
+                f"found no viable network links within the specified threshold"
+            )
+            return True
         return False
 
     def is_viable(self):
@@ -239,91 +522,83 @@ class MaxStableSet:
         ax.set_title("Stops, their catchments, the underlying network and route")
         return fig, ax
 
-    def solve(self, solver="cbc"):
-        if nx.is_empty(self.problem_graph):
-            logging.info("Empty problem graph passed to the solver. No stops will find a solution.")
-            self.unsolved_stops = set(self.stops["id"])
-        else:
-            # --------------------------------------------------------
-            # Model
-            # --------------------------------------------------------
-
-            model = pe.ConcreteModel()
-
-            # --------------------------------------------------------
-            # Sets/Params
-            # --------------------------------------------------------
-
-            # nodes and edge sets
-            # nodes: network's graph nodes that are closest to stops
-            # edges: connections between nodes if they are in the same
-            #    selection pool or there is no path between them
-            vertices = set(self.problem_graph.nodes)
-            edges = set(self.problem_graph.edges)
-
-            model.vertices = pe.Set(initialize=vertices)
-
-            def spatial_proximity_coefficient_init(model, i):
-                attribs = self.problem_graph.nodes[i]
-                # todo normalise
-                return attribs["coeff"]
-
-            model.c = pe.Param(model.vertices, initialize=spatial_proximity_coefficient_init)
-
-            # --------------------------------------------------------
-            # Variables
-            # --------------------------------------------------------
-
-            model.x = pe.Var(vertices, within=pe.Binary)
+    def problem_arrays(self) -> tuple[list, np.ndarray, np.ndarray]:
+        """Integer coded form of the problem graph, used by the array based solvers.
 
-            # --------------------------------------------------------
-            # Constraints
-            # --------------------------------------------------------
-
-            model.edge_adjacency = pe.ConstraintList()
-            for u, v in edges:
-                model.edge_adjacency.add(model.x[u] + model.x[v] <= 1)
-
-            # --------------------------------------------------------
-            # Objective
-            # --------------------------------------------------------
-
-            def total_nodes_rule(model):
-                return sum(model.c[i] * model.x[i] for i in model.vertices)
-
-            model.total_nodes = pe.Objective(rule=total_nodes_rule, sense=pe.maximize)
-
-            # --------------------------------------------------------
-            # Solver
-            # --------------------------------------------------------
-
-            logging.info("Passing problem to solver")
-            _solver = pe.SolverFactory(solver)
-            _solver.solve(model)
+        Returns:
+            tuple[list, np.ndarray, np.ndarray]:
+                Problem nodes, their coefficients and a (n, 2) array of conflict edges indexing into the problem nodes.
+        """
+        vertices = list(self.problem_graph.nodes)
+        coeffs = np.array(
+            [coeff for _, coeff in self.problem_graph.nodes(data="coeff")], dtype=float
+        )
+        vertex_index = pd.Index(vertices)
+        edges = np.array(list(self.problem_graph.edges), dtype=object).reshape(-1, 2)
+        edges = np.column_stack(
+            [vertex_index.get_indexer(edges[:, 0]), vertex_index.get_indexer(edges[:, 1])]
+        )
+        return vertices, coeffs, edges
 
-            # --------------------------------------------------------
-            # Solution parse
-            # --------------------------------------------------------
+    def solve(self, solver="cbc", processes=1):
+        """Solves the maximum stable set problem, i.e. selects a link for each stop.
 
-            selected = get_indices_of_chosen_problem_graph_nodes(model)
+        The problem graph is split into its connected components first. Components with a single candidate link, or
+        whose candidates all conflict with one another, are solved directly; only the rest go to the solver.
 
-            # solution maps Stop IDs to Link IDs
-            self.solution = {
-                self.problem_graph.nodes[node]["id"]: self.problem_graph.nodes[node]["link_id"]
-                for node in selected
-            }
-            self.artificial_stops = {
-                node: {
-                    **self.pt_graph.nodes[self.problem_graph.nodes[node]["id"]],
-                    **{
-                        "linkRefId": self.problem_graph.nodes[node]["link_id"],
-                        "stop_id": self.problem_graph.nodes[node]["id"],
-                        "id": node,
-                    },
-                }
-                for node in selected
+        Args:
+            solver (str, optional):
+                `scipy` solves the problem as a sparse MILP in-process with `scipy.optimize.milp`.
+                `greedy` uses a fast greedy and local search heuristic, which is not guaranteed to be optimal.
+                Any other value is passed to pyomo's `SolverFactory`, e.g. 'cbc', 'glpk', 'gurobi'.
+                Defaults to "cbc".
+            processes (int, optional):
+                Number of parallel processes to solve independent components of the problem across. Defaults to 1.
+        """
+        if nx.is_empty(self.problem_graph):
+            logging.info("Empty problem graph passed to the solver. No stops will find a solution.")
+            self.unsolved_stops = set(self.stops["id"])
+        else:
+            vertices, coeffs, edges = self.problem_arrays()
+            chosen, components = decompose_problem(coeffs, edges)
+            logging.info(
+                f"Problem decomposed into {len(chosen) + len(components)} components, "
+                f"{len(components)} of which are passed to the `{solver}` solver"
+            )
+            if components:
+                chosen = np.concatenate(
+                    [
+                        chosen,
+                        parallel.multiprocess_wrap(
+                            data=components,
+                            split=parallel.split_list,
+                            apply=solve_components,
+                            combine=parallel.combine_list,
+                            processes=min(processes, len(components)),
+                            solver=solver,
+                        ),
+                    ]
+                ).astype(int)
+            self._parse_solution([vertices[i] for i in chosen])
+
+    def _parse_solution(self, selected):
+        # solution maps Stop IDs to Link IDs
+        self.solution = {
+            self.problem_graph.nodes[node]["id"]: self.problem_graph.nodes[node]["link_id"]
+            for node in selected
+        }
+        self.artificial_stops = {
+            node: {
+                **self.pt_graph.nodes[self.problem_graph.nodes[node]["id"]],
+                **{
+                    "linkRefId": self.problem_graph.nodes[node]["link_id"],
+                    "stop_id": self.problem_graph.nodes[node]["id"],
+                    "id": node,
+                },
             }
-            self.unsolved_stops = set(self.stops["id"]) - set(self.solution.keys())
+            for node in selected
+        }
+        self.unsolved_stops = set(self.stops["id"]) - set(self.solution.keys())
 
     def all_stops_solved(self):
         return not bool(self.unsolved_stops)
@@ -1,11 +1,19 @@
+import hashlib
+import json
 import logging
+import os
+import pickle
+from typing import Optional, Union
 
 from pandas import DataFrame
 from pyproj import Transformer
 
 import genet.utils.spatial as spatial
 from genet import exceptions
-from genet.max_stable_set import MaxStableSet
+from genet.max_stable_set import ChangeSet, MaxStableSet
+from genet.utils.persistence import ensure_dir
+
+CHECKPOINT_PARAMETERS_FILE = "parameters.json"
 
 
 def reproj_stops(schedule_element_nodes: dict, new_epsg: str) -> dict:
@@ -40,6 +48,7 @@ def route_pt_graph(
     allow_partial=False,
     distance_threshold=30,
     step_size=10,
+    processes=1,
 ):
     logging.info(
         f"Building Maximum Stable Set for PT graph with {pt_graph.number_of_nodes()} stops and "
@@ -65,7 +74,7 @@ def route_pt_graph(
                 "solutions set `allow_partial=True`"
             )
     logging.info("Passing problem to solver")
-    mss.solve(solver=solver)
+    mss.solve(solver=solver, processes=processes)
     mss.route_edges()
     if allow_partial and mss.is_partial:
         logging.info(
@@ -75,3 +84,134 @@ def route_pt_graph(
     if mss.unsolved_stops:
         mss.fill_in_solution_artificially()
     return mss
+
+
+def routing_checkpoint_dir(checkpoint_dir: str, network_fingerprint: str, parameters: dict) -> str:
+    """Directory holding checkpointed Service routing results for a network and routing parameters.
+
+    Results are only valid for the network they were routed on, so they are kept under the network's fingerprint.
+    The routing parameters are saved alongside, to guard against resuming with different ones.
+
+    Args:
+        checkpoint_dir (str): Top level checkpoint directory.
+        network_fingerprint (str): Fingerprint of the network, see `genet.Network.fingerprint`.
+        parameters (dict): JSON serialisable routing parameters.
+
+    Raises:
+        exceptions.RoutingCheckpointError: Checkpoint exists for this network, but for different routing parameters.
+
+    Returns:
+        str: Path to the checkpoint directory for this network.
+    """
+    path = os.path.join(checkpoint_dir, network_fingerprint)
+    ensure_dir(path)
+    parameters_path = os.path.join(path, CHECKPOINT_PARAMETERS_FILE)
+    if os.path.exists(parameters_path):
+        with open(parameters_path) as f:
+            checkpointed_parameters = json.load(f)
+        if checkpointed_parameters != parameters:
+            raise exceptions.RoutingCheckpointError(
+                f"Checkpoint in {path} was routed with parameters: {checkpointed_parameters}, which are different "
+                f"to: {parameters}. Use a different `checkpoint_dir` to route with these parameters."
+            )
+    else:
+        with open(parameters_path, "w") as f:
+            json.dump(parameters, f)
+    return path
+
+
+def service_fingerprint(service) -> str:
+    """Content hash of a Service's Stops and Routes, i.e. everything routing it depends on besides the network.
+
+    Covers the IDs, coordinates and projections of Stops and the IDs, modes and ordered Stops of Routes, but not the
+    results of routing (Stops' `linkRefId`s and Routes' network routes).
+
+    Args:
+        service (genet.Service): Service to fingerprint.
+
+    Returns:
+        str: Hex digest of the Service's Stops and Routes.
+    """
+    stops = sorted(
+        ([str(stop.id), stop.x, stop.y, stop.epsg] for stop in service.stops()), key=lambda x: x[0]
+    )
+    routes = sorted(
+        (
+            [str(route.id), route.mode, list(map(str, route.ordered_stops))]
+            for route in service.routes()
+        ),
+        key=lambda x: x[0],
+    )
+    return hashlib.sha256(json.dumps([stops, routes]).encode()).hexdigest()
+
+
+def _checkpoint_file(checkpoint_dir: str, service_id: Union[str, int]) -> str:
+    # Service IDs are not necessarily safe file names
+    return os.path.join(checkpoint_dir, f"{hashlib.sha1(str(service_id).encode()).hexdigest()}.pkl")
+
+
+def write_routing_checkpoint(
+    checkpoint_dir: str,
+    service_id: Union[str, int],
+    service_fingerprint: str,
+    changeset: Optional[ChangeSet],
+    unsnapped: bool,
+):
+    """Saves the routing result of a single Service.
+
+    The file is written in full before it is moved into place, so an interrupted run never leaves a partial record.
+
+    Args:
+        checkpoint_dir (str): Checkpoint directory for the network, see `routing_checkpoint_dir`.
+        service_id (Union[str, int]): ID of the routed Service.
+        service_fingerprint (str): Fingerprint of the routed Service, see `service_fingerprint`.
+        changeset (Optional[ChangeSet]): Changes to the network and schedule resulting from routing the Service.
+        unsnapped (bool): Whether routing the Service failed.
+    """
+    path = _checkpoint_file(checkpoint_dir, service_id)
+    with open(f"{path}.tmp", "wb") as f:
+        pickle.dump(
+            {
+                "service_id": service_id,
+                "service_fingerprint": service_fingerprint,
+                "changeset": changeset,
+                "unsnapped": unsnapped,
+            },
+            f,
+        )
+    os.replace(f"{path}.tmp", path)
+
+
+def read_routing_checkpoints(
+    checkpoint_dir: str, service_fingerprints: Optional[dict[Union[str, int], str]] = None
+) -> dict:
+    """Reads routing results of all checkpointed Services.
+
+    Args:
+        checkpoint_dir (str): Checkpoint directory for the network, see `routing_checkpoint_dir`.
+        service_fingerprints (Optional[dict[Union[str, int], str]], optional):
+            Service IDs: fingerprints (see `service_fingerprint`) of the Services about to be routed.
+            If given, results saved for Services not in it, or for a different version of a Service (e.g. with moved
+            Stops or changed Routes), are skipped with a warning. Defaults to None.
+
+    Returns:
+        dict: Service IDs: {'service_fingerprint': Optional[str], 'changeset': Optional[ChangeSet], 'unsnapped': bool}.
+    """
+    records = {}
+    if os.path.isdir(checkpoint_dir):
+        for file in sorted(os.listdir(checkpoint_dir)):
+            if file.endswith(".pkl"):
+                with open(os.path.join(checkpoint_dir, file), "rb") as f:
+                    record = pickle.load(f)
+                service_id = record.pop("service_id")
+                record.setdefault("service_fingerprint", None)
+                if service_fingerprints is not None and (
+                    service_fingerprints.get(service_id) != record["service_fingerprint"]
+                ):
+                    logging.warning(
+                        f"Skipping routing results of Service `{service_id}` in checkpoint: {checkpoint_dir}. "
+                        "They were saved for Stops or Routes which differ from the Service's current ones."
+                    )
+                    continue
+                records[service_id] = record
+    return records
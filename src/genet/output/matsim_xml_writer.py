@@ -1,6 +1,7 @@
 import logging
 import os
 from copy import deepcopy
+from typing import Literal, Optional
 
 from lxml import etree
 from pandas import DataFrame
@@ -10,6 +11,7 @@ import genet.variables as variables
 from genet.exceptions import MalformedAdditionalAttributeError
 from genet.output import sanitiser
 from genet.schedule_elements import Schedule
+from genet.utils import persistence
 from genet.utils.spatial import encode_shapely_linestring_to_polyline
 from genet.validate.network import validate_attribute_data
 
@@ -162,11 +164,38 @@ def prepare_link_geometry_attribute(link_attribs):
     return link_attributes
 
 
-def write_matsim_network(output_dir, network):
-    fname = os.path.join(output_dir, "network.xml")
+def _output_file_path(
+    output_dir: str, file_name: str, compression: Optional[Literal["gzip", "zstd"]] = None
+) -> str:
+    if compression is not None:
+        file_name += persistence.COMPRESSION_SUFFIXES[compression]
+    return os.path.join(output_dir, file_name)
+
+
+def write_matsim_network(
+    output_dir,
+    network,
+    compression: Optional[Literal["gzip", "zstd"]] = None,
+    compression_level: Optional[int] = None,
+    compression_threads: int = 1,
+):
+    """Save to MATSim XML format.
+
+    Args:
+        output_dir (str): path to output directory.
+        network (Network): Network object to write.
+        compression (Optional[Literal["gzip", "zstd"]], optional):
+            If given, the file is compressed as it is written, to `network.xml.gz` or `network.xml.zst`.
+            Defaults to None.
+        compression_level (Optional[int], optional):
+            Compression level. Defaults to None (6 for gzip, 3 for zstandard).
+        compression_threads (int, optional): Number of threads compressing the output. Defaults to 1.
+    """
+    fname = _output_file_path(output_dir, "network.xml", compression)
     logging.info("Writing {}".format(fname))
 
-    with open(fname, "wb") as f, etree.xmlfile(f, encoding="utf-8") as xf:
+    output_file = persistence.open_file(fname, "wb", compression_level, compression_threads)
+    with output_file as f, etree.xmlfile(f, encoding="utf-8") as xf:
         xf.write_declaration(
             doctype='<!DOCTYPE network SYSTEM "http://www.matsim.org/files/dtd/network_v2.dtd">'
         )
@@ -188,7 +217,14 @@ def write_matsim_network(output_dir, network):
                     save_attributes(link_attributes, xf, elem_type="link")
 
 
-def write_matsim_schedule(output_dir: str, schedule: Schedule, reproj_processes: int = 1):
+def write_matsim_schedule(
+    output_dir: str,
+    schedule: Schedule,
+    reproj_processes: int = 1,
+    compression: Optional[Literal["gzip", "zstd"]] = None,
+    compression_level: Optional[int] = None,
+    compression_threads: int = 1,
+):
     """Save to MATSim XML format.
 
     Args:
@@ -198,11 +234,18 @@ def write_matsim_schedule(output_dir: str, schedule: Schedule, reproj_processes:
             You can set this in case you have a lot of stops and your stops need to be reprojected.
             It splits the process across given number of processes.
             Defaults to 1.
+        compression (Optional[Literal["gzip", "zstd"]], optional):
+            If given, the file is compressed as it is written, to `schedule.xml.gz` or `schedule.xml.zst`.
+            Defaults to None.
+        compression_level (Optional[int], optional):
+            Compression level. Defaults to None (6 for gzip, 3 for zstandard).
+        compression_threads (int, optional): Number of threads compressing the output. Defaults to 1.
     """
-    fname = os.path.join(output_dir, "schedule.xml")
+    fname = _output_file_path(output_dir, "schedule.xml", compression)
     logging.info("Writing {}".format(fname))
 
-    with open(fname, "wb") as f, etree.xmlfile(f, encoding="utf-8") as xf:
+    output_file = persistence.open_file(fname, "wb", compression_level, compression_threads)
+    with output_file as f, etree.xmlfile(f, encoding="utf-8") as xf:
         xf.write_declaration(
             doctype="<!DOCTYPE transitSchedule "
             'SYSTEM "http://www.matsim.org/files/dtd/transitSchedule_v2.dtd">'
@@ -307,11 +350,20 @@ def write_matsim_schedule(output_dir: str, schedule: Schedule, reproj_processes:
                                     xf.write(etree.Element("departure", trip_attribs))
 
 
-def write_vehicles(output_dir, vehicles, vehicle_types, file_name="vehicles.xml"):
-    fname = os.path.join(output_dir, file_name)
+def write_vehicles(
+    output_dir,
+    vehicles,
+    vehicle_types,
+    file_name="vehicles.xml",
+    compression: Optional[Literal["gzip", "zstd"]] = None,
+    compression_level: Optional[int] = None,
+    compression_threads: int = 1,
+):
+    fname = _output_file_path(output_dir, file_name, compression)
     logging.info("Writing {}".format(fname))
 
-    with open(fname, "wb") as f, etree.xmlfile(f, encoding="utf-8") as xf:
+    output_file = persistence.open_file(fname, "wb", compression_level, compression_threads)
+    with output_file as f, etree.xmlfile(f, encoding="utf-8") as xf:
         xf.write_declaration()
         vehicleDefinitions_attribs = {
             "xmlns": "http://www.matsim.org/files/dtd",
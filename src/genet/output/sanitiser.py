@@ -1,3 +1,4 @@
+import json
 import sys
 
 from geopandas import GeoDataFrame, GeoSeries
@@ -29,6 +30,23 @@ def sanitise_geodataframe(gdf):
     return gdf
 
 
+def encode_for_csv(value) -> str:
+    """Encodes a nested value, e.g. link `attributes`, as JSON for a CSV cell.
+
+    Values JSON cannot hold, e.g. sets, fall back on their python literal.
+
+    Args:
+        value: Value to encode.
+
+    Returns:
+        str: JSON, or python literal, string of `value`.
+    """
+    try:
+        return json.dumps(value, ensure_ascii=False)
+    except TypeError:
+        return str(value)
+
+
 def sanitise_dictionary_for_xml(d):
     for k, v in d.items():
         if isinstance(v, (set, list)):
@@ -1860,26 +1860,47 @@ class Schedule(ScheduleElement):
         """
         if self:
             # generate vehicles using Services and Routes upon init
-            df = self.trips_to_dataframe()[["route_id", "vehicle_id"]]
-            df["type"] = df.apply(
-                lambda x: self._graph.graph["routes"][x["route_id"]]["mode"], axis=1
+            routes = self._graph.graph["routes"]
+            df = DataFrame(
+                {
+                    "route_id": np.repeat(
+                        list(routes),
+                        [len(route["trips"]["vehicle_id"]) for route in routes.values()],
+                    ),
+                    "vehicle_id": list(
+                        itertools.chain.from_iterable(
+                            route["trips"]["vehicle_id"] for route in routes.values()
+                        )
+                    ),
+                }
+            )
+            df["type"] = df["route_id"].map(
+                {route_id: route["mode"] for route_id, route in routes.items()}
             )
             df = df.drop(columns="route_id")
             # check mode consistency
-            vehicles_to_modes = df.groupby("vehicle_id").apply(lambda x: list(x["type"].unique()))
-            if (vehicles_to_modes.str.len() > 1).any():
+            no_of_modes = df.groupby("vehicle_id")["type"].nunique()
+            if (no_of_modes > 1).any():
                 # there are vehicles which are shared across routes with different modes
+                inconsistent_vehicles = df[
+                    df["vehicle_id"].isin(no_of_modes[no_of_modes > 1].index)
+                ]
+                vehicles_to_modes = inconsistent_vehicles.groupby("vehicle_id").apply(
+                    lambda x: list(x["type"].unique())
+                )
                 raise InconsistentVehicleModeError(
                     "Modal inconsistencies found while generating vehicles for Schedule."
                     " Vehicles and modes in question: "
-                    f"{vehicles_to_modes[(vehicles_to_modes.str.len() > 1)].to_dict()}"
+                    f"{vehicles_to_modes.to_dict()}"
                 )
-            df = df.set_index("vehicle_id")
+            vehicles = {
+                vehicle_id: {"type": mode} for vehicle_id, mode in zip(df["vehicle_id"], df["type"])
+            }
             if overwrite:
-                self.vehicles = df.T.to_dict()
+                self.vehicles = vehicles
                 self.validate_vehicle_definitions()
             else:
-                self.vehicles = {**df.T.to_dict(), **self.vehicles}
+                self.vehicles = {**vehicles, **self.vehicles}
 
     def scale_vehicle_capacity(self, capacity_scale: float, pce_scale: float, output_dir: str):
         """This method scales the vehicle capacities and pce to user defined scales and writes a new vehicle.xml.
@@ -3647,7 +3668,14 @@ class Schedule(ScheduleElement):
         logging.info("Finished generating standard outputs. Zipping folder.")
         persistence.zip_folder(output_dir)
 
-    def write_to_matsim(self, output_dir: str, reproj_processes: int = 1):
+    def write_to_matsim(
+        self,
+        output_dir: str,
+        reproj_processes: int = 1,
+        compression: Optional[Literal["gzip", "zstd"]] = None,
+        compression_level: Optional[int] = None,
+        compression_threads: int = 1,
+    ):
         """Save to MATSim XML format.
 
         Args:
@@ -3656,10 +3684,30 @@ class Schedule(ScheduleElement):
                 You can set this in case you have a lot of stops and your stops need to be reprojected.
                 It splits the process across given number of processes.
                 Defaults to 1.
+            compression (Optional[Literal["gzip", "zstd"]], optional):
+                If given, MATSim files are compressed as they are written, e.g. to `schedule.xml.gz` for "gzip"
+                or `schedule.xml.zst` for "zstd". Defaults to None.
+            compression_level (Optional[int], optional):
+                Compression level. Defaults to None (6 for gzip, 3 for zstandard).
+            compression_threads (int, optional): Number of threads compressing the outputs. Defaults to 1.
         """
         persistence.ensure_dir(output_dir)
-        matsim_xml_writer.write_matsim_schedule(output_dir, self, reproj_processes=reproj_processes)
-        matsim_xml_writer.write_vehicles(output_dir, self.vehicles, self.vehicle_types)
+        matsim_xml_writer.write_matsim_schedule(
+            output_dir,
+            self,
+            reproj_processes=reproj_processes,
+            compression=compression,
+            compression_level=compression_level,
+            compression_threads=compression_threads,
+        )
+        matsim_xml_writer.write_vehicles(
+            output_dir,
+            self.vehicles,
+            self.vehicle_types,
+            compression=compression,
+            compression_level=compression_level,
+            compression_threads=compression_threads,
+        )
         self.write_extras(output_dir)
 
     def write_extras(self, output_dir):
@@ -1,8 +1,17 @@
+import gzip
+import io
 import logging
 import os
 import shutil
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Union
+from typing import IO, Any, Literal, Optional, Union
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_COMPRESSION_LEVELS = {"gzip": 6, "zstd": 3}
 
 
 def ensure_dir(direc):
@@ -61,5 +70,177 @@ def is_zip(path: Union[Path, str]):
     return _check_type_and_suffix(path, ".zip")
 
 
+def is_gzip(path: Union[Path, str]):
+    return _check_type_and_suffix(path, ".gz")
+
+
+def is_zstd(path: Union[Path, str]):
+    return _check_type_and_suffix(path, [".zst", ".zstd"])
+
+
+def compression_of(path: Union[Path, str]) -> Optional[Literal["gzip", "zstd"]]:
+    """Compression of a file, detected from its extension.
+
+    Args:
+        path (Union[Path, str]): Path to the file.
+
+    Returns:
+        Optional[Literal["gzip", "zstd"]]: `gzip` for `.gz` files, `zstd` for `.zst` files, None otherwise.
+    """
+    if is_gzip(path):
+        return "gzip"
+    elif is_zstd(path):
+        return "zstd"
+    return None
+
+
+def open_file(
+    path: Union[Path, str],
+    mode: Literal["rb", "wb"] = "rb",
+    compression_level: Optional[int] = None,
+    compression_threads: int = 1,
+) -> IO[bytes]:
+    """Opens a file in binary mode, transparently (de)compressing gzip (`.gz`) and zstandard (`.zst`) files.
+
+    Args:
+        path (Union[Path, str]): Path to the file.
+        mode (Literal["rb", "wb"], optional): Read or write. Defaults to "rb".
+        compression_level (Optional[int], optional):
+            Compression level when writing compressed files.
+            Defaults to None (6 for gzip, 3 for zstandard).
+        compression_threads (int, optional):
+            Number of threads compressing data when writing compressed files. Defaults to 1.
+
+    Returns:
+        IO[bytes]: File object.
+    """
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, mode)
+    if compression_level is None:
+        compression_level = DEFAULT_COMPRESSION_LEVELS[compression]
+
+    if compression == "gzip":
+        if mode == "wb" and compression_threads > 1:
+            return ParallelGzipWriter(path, compression_level, compression_threads)
+        return gzip.open(path, mode, compresslevel=compression_level)
+
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            f"Reading and writing zstandard compressed files, such as {path}, requires the `zstandard` package."
+        ) from e
+    if mode == "wb":
+        # zstandard runs compression in the calling thread when `threads` is 0
+        compressor = zstandard.ZstdCompressor(
+            level=compression_level, threads=compression_threads if compression_threads > 1 else 0
+        )
+        return compressor.stream_writer(open(path, "wb"), closefd=True)
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+
+
+def _deflate_block(block: bytes, dictionary: bytes, compression_level: int, last: bool) -> bytes:
+    """Raw deflates a block of data, primed with the data preceding it, ending on a byte boundary."""
+    if dictionary:
+        compressor = zlib.compressobj(
+            compression_level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary
+        )
+    else:
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    """Writes a gzip file, compressing blocks of data in parallel threads, in the manner of `pigz`.
+
+    Each block is deflated independently, primed with the last 32KiB of the block before it, and ends on a byte boundary.
+    The blocks then join into a single deflate stream, readable by any gzip reader.
+    If writing fails, or the writer is left on an exception, the gzip trailer is not written and the partial file is
+    removed, so a truncated output never passes for a complete gzip file.
+
+    Args:
+        path (Union[Path, str]): Path to the output file.
+        compression_level (int, optional): gzip compression level. Defaults to 6.
+        threads (int, optional): Number of threads compressing data. Defaults to 2.
+    """
+
+    BLOCK_SIZE = 1 << 20
+    WINDOW_SIZE = 1 << 15
+
+    def __init__(self, path: Union[Path, str], compression_level: int = 6, threads: int = 2):
+        super().__init__()
+        self._path = path
+        self._file = open(path, "wb")
+        self._failed = False
+        self._compression_level = compression_level
+        self._threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._pending_blocks: deque = deque()
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._crc = 0
+        self._size = 0
+        # header: magic number, deflate, no flags, no modification time, no extra flags, unknown OS
+        self._file.write(b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff")
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        try:
+            self._buffer += data
+            while len(self._buffer) >= self.BLOCK_SIZE:
+                self._submit_block(bytes(self._buffer[: self.BLOCK_SIZE]))
+                del self._buffer[: self.BLOCK_SIZE]
+        except BaseException:
+            self._failed = True
+            raise
+        return len(data)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._failed = True
+        return super().__exit__(exc_type, exc_value, traceback)
+
+    def _submit_block(self, block: bytes, last: bool = False):
+        self._crc = zlib.crc32(block, self._crc)
+        self._size += len(block)
+        self._pending_blocks.append(
+            self._executor.submit(
+                _deflate_block, block, self._dictionary, self._compression_level, last
+            )
+        )
+        self._dictionary = block[-self.WINDOW_SIZE :]
+        # write out compressed blocks in order, holding a bounded number of blocks in memory
+        while self._pending_blocks and (
+            len(self._pending_blocks) > 2 * self._threads or self._pending_blocks[0].done()
+        ):
+            self._file.write(self._pending_blocks.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self._failed:
+                self._submit_block(bytes(self._buffer), last=True)
+                while self._pending_blocks:
+                    self._file.write(self._pending_blocks.popleft().result())
+                self._file.write(
+                    struct.pack("<II", self._crc & 0xFFFFFFFF, self._size & 0xFFFFFFFF)
+                )
+        except BaseException:
+            self._failed = True
+            raise
+        finally:
+            self._executor.shutdown(cancel_futures=self._failed)
+            self._file.close()
+            if self._failed and os.path.exists(self._path):
+                os.remove(self._path)
+            super().close()
+
+
 def zip_folder(folder_path):
     shutil.make_archive(folder_path, "zip", folder_path)
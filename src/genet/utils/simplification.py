@@ -1,8 +1,10 @@
+import itertools
 import logging
-from math import ceil
-from statistics import median
+from typing import Optional
 
-from shapely.geometry import LineString, Point
+import numpy as np
+import pandas as pd
+import shapely
 
 import genet
 import genet.utils.parallel as parallel
@@ -11,72 +13,143 @@ from genet.utils.persistence import setify
 # rip and monkey patch of a few functions from osmnx.simplification to customise graph simplification
 
 
+_MERGED_LINK_ATTRIBUTES = {
+    "s2_to",
+    "freespeed",
+    "attributes",
+    "to",
+    "permlanes",
+    "from",
+    "id",
+    "ids",
+    "capacity",
+    "length",
+    "modes",
+    "s2_from",
+    "geometry",
+}
+
+
+def _unique_values_by_group(group: list, key: list, value: list) -> dict:
+    """Unique values under each (`group`, `key`) pair of a long table of values.
+
+    Args:
+        group (list): Group code of each value.
+        key (list): Key of each value.
+        value (list): Values, must be hashable.
+
+    Returns:
+        dict: {(group, key): set of unique values}
+    """
+    df = pd.DataFrame({"group": group, "key": key, "value": value}).drop_duplicates()
+    # values are unique, collecting them in one pass is much faster than a python aggregation per group
+    unique_values = {}
+    for group_key, val in zip(zip(df["group"].tolist(), df["key"].tolist()), df["value"].tolist()):
+        unique_values.setdefault(group_key, set()).add(val)
+    return unique_values
+
+
 def _process_path(indexed_edge_groups_to_simplify):
-    links_to_add = {}
-    for new_id, edge_group_data in indexed_edge_groups_to_simplify.items():
-        path = edge_group_data["path"]
-        nodes_data = edge_group_data["node_data"]
-        edge_attributes = edge_group_data["link_data"].copy()
-
-        if "attributes" in edge_attributes:
-            new_attributes = {}
-            for attribs_dict in edge_attributes["attributes"]:
-                for key, val in attribs_dict.items():
-                    if key in new_attributes:
-                        new_attributes[key] |= setify(val)
-                    else:
-                        new_attributes[key] = setify(val)
-            for key, val in new_attributes.items():
-                if len(val) == 1:
-                    new_attributes[key] = list(val)[0]
-            edge_attributes["attributes"] = new_attributes.copy()
-
-        # construct the geometry
-        edge_attributes["geometry"] = LineString(
-            [Point((nodes_data[node]["x"], nodes_data[node]["y"])) for node in path]
+    if not indexed_edge_groups_to_simplify:
+        return {}
+    new_ids = list(indexed_edge_groups_to_simplify)
+    edge_groups = list(indexed_edge_groups_to_simplify.values())
+    no_paths = len(edge_groups)
+
+    # edge table indexed by path
+    edge_path = np.repeat(
+        np.arange(no_paths), [len(edge_group["link_data"]["id"]) for edge_group in edge_groups]
+    )
+    edges = pd.DataFrame(
+        {
+            key: list(
+                itertools.chain.from_iterable(
+                    edge_group["link_data"][key] for edge_group in edge_groups
+                )
+            )
+            for key in ["freespeed", "capacity", "permlanes", "length"]
+        }
+    )
+    edges["path"] = edge_path
+    aggregated = edges.groupby("path").agg(
+        freespeed=("freespeed", "max"),
+        capacity=("capacity", "median"),
+        permlanes=("permlanes", "median"),
+        length=("length", "sum"),
+    )
+    freespeed = aggregated["freespeed"].tolist()
+    capacity = np.ceil(aggregated["capacity"]).astype(np.int64).tolist()
+    permlanes = np.ceil(aggregated["permlanes"]).astype(np.int64).tolist()
+    length = aggregated["length"].tolist()
+
+    # long tables of (path, key, value) for set-like and remaining attributes
+    modes_per_edge = list(
+        itertools.chain.from_iterable(
+            edge_group["link_data"]["modes"] for edge_group in edge_groups
         )
+    )
+    modes = _unique_values_by_group(
+        np.repeat(edge_path, [len(edge_modes) for edge_modes in modes_per_edge]),
+        "modes",
+        list(itertools.chain.from_iterable(modes_per_edge)),
+    )
+    attribute_rows = ([], [], [])
+    other_rows = ([], [], [])
+    for i, edge_group in enumerate(edge_groups):
+        for key, values in edge_group["link_data"].items():
+            if key == "attributes":
+                for attribs_dict in values:
+                    for attrib_key, val in attribs_dict.items():
+                        # `None` records the key, it is dropped from the merged values below
+                        val = setify(val) or {None}
+                        attribute_rows[0].extend([i] * len(val))
+                        attribute_rows[1].extend([attrib_key] * len(val))
+                        attribute_rows[2].extend(val)
+            elif key not in _MERGED_LINK_ATTRIBUTES:
+                other_rows[0].extend([i] * len(values))
+                other_rows[1].extend([key] * len(values))
+                other_rows[2].extend(values)
+    attributes = {}
+    for (i, key), val in _unique_values_by_group(*attribute_rows).items():
+        val.discard(None)
+        # consolidate a single value
+        attributes.setdefault(i, {})[key] = next(iter(val)) if len(val) == 1 else val
+    other = {}
+    for (i, key), val in _unique_values_by_group(*other_rows).items():
+        # consolidate a single value, otherwise keep one of each value
+        other.setdefault(i, {})[key] = next(iter(val)) if len(val) == 1 else list(val)
+
+    # construct the geometries
+    paths = [edge_group["path"] for edge_group in edge_groups]
+    coords = [
+        (edge_group["node_data"][node]["x"], edge_group["node_data"][node]["y"])
+        for edge_group in edge_groups
+        for node in edge_group["path"]
+    ]
+    geometries = shapely.linestrings(
+        coords, indices=np.repeat(np.arange(no_paths), [len(path) for path in paths])
+    )
 
-        edge_attributes["ids"] = edge_attributes["id"]
-        edge_attributes["id"] = new_id
-
-        edge_attributes["from"] = path[0]
-        edge_attributes["to"] = path[-1]
-        edge_attributes["s2_from"] = nodes_data[path[0]]["s2_id"]
-        edge_attributes["s2_to"] = nodes_data[path[-1]]["s2_id"]
-
-        edge_attributes["freespeed"] = max(edge_attributes["freespeed"])
-        edge_attributes["capacity"] = ceil(median(edge_attributes["capacity"]))
-        edge_attributes["permlanes"] = ceil(median(edge_attributes["permlanes"]))
-        edge_attributes["length"] = sum(edge_attributes["length"])
-
-        modes = set()
-        for mode_list in edge_attributes["modes"]:
-            modes |= set(mode_list)
-        edge_attributes["modes"] = modes
-
-        for key in set(edge_attributes) - {
-            "s2_to",
-            "freespeed",
-            "attributes",
-            "to",
-            "permlanes",
-            "from",
-            "id",
-            "ids",
-            "capacity",
-            "length",
-            "modes",
-            "s2_from",
-            "geometry",
-        }:
-            if len(set(edge_attributes[key])) == 1:
-                # if there's only 1 unique value in this attribute list,
-                # consolidate it to the single value (the zero-th)
-                edge_attributes[key] = edge_attributes[key][0]
-            else:
-                # otherwise, if there are multiple values, keep one of each value
-                edge_attributes[key] = list(set(edge_attributes[key]))
-
+    links_to_add = {}
+    for i, (new_id, edge_group, path) in enumerate(zip(new_ids, edge_groups, paths)):
+        nodes_data = edge_group["node_data"]
+        edge_attributes = {
+            **other.get(i, {}),
+            "id": new_id,
+            "ids": edge_group["link_data"]["id"],
+            "from": path[0],
+            "to": path[-1],
+            "s2_from": nodes_data[path[0]]["s2_id"],
+            "s2_to": nodes_data[path[-1]]["s2_id"],
+            "freespeed": freespeed[i],
+            "capacity": capacity[i],
+            "permlanes": permlanes[i],
+            "length": length[i],
+            "modes": modes.get((i, "modes"), set()),
+            "geometry": geometries[i],
+        }
+        if "attributes" in edge_group["link_data"]:
+            edge_attributes["attributes"] = attributes.get(i, {})
         links_to_add[new_id] = edge_attributes
     return links_to_add
 
@@ -96,7 +169,6 @@ def _extract_edge_data(n, path):
                     # if this key doesn't already exist, set the value to a list
                     # containing the one value
                     edge_attributes[key] = [edge[key]]
-    n.remove_links(edge_attributes["id"], ignore_change_log=True, silent=True)
     return edge_attributes
 
 
@@ -117,97 +189,140 @@ def _assemble_path_data(n, indexed_paths_to_simplify):
     return return_d
 
 
-def _is_endpoint(node_neighbours: dict) -> list[str]:
-    """
+def _graph_adjacency(G, nodes: Optional[set] = None) -> tuple[list, np.ndarray, np.ndarray]:
+    """Integer codes of nodes and de-duplicated directed edges (ignoring multi-edges) of a graph.
 
     Args:
-        node_neighbours (dict):
-            E.g.,
-            ```python
-            {node: {
-                successors: {set of nodes that you can reach from node},
-                predecessors: {set of nodes that lead to node}
-            }}
-            ```
+        G (nx.MultiDiGraph): Graph.
+        nodes (Optional[set], optional):
+            If given, only edges in and out of these nodes are coded, along with their neighbours.
+            Defaults to None (all edges).
 
     Returns:
-        list[str]: Nodes that are endpoints.
+        tuple[list, np.ndarray, np.ndarray]:
+            Nodes, where the code of a node is its position, and `u`, `v` codes of edges, sorted by (`u`, `v`).
     """
-    return [
-        node
-        for node, data in node_neighbours.items()
-        if (
-            (len(data["successors"] | data["predecessors"]) > 2)
-            or (not data["successors"] or not data["predecessors"])
-            or (node in data["successors"])
-            or (len(data["successors"]) != len(data["predecessors"]))
-            or (
-                (len(data["successors"] | data["predecessors"]) == 1)
-                and (data["successors"] == data["predecessors"])
-            )
-        )
-    ]
+    # adjacency holds each pair of connected nodes once, regardless of the number of multi-edges between them
+    from_nodes, to_nodes = [], []
+    if nodes is None:
+        nodes = list(G.nodes)
+        for u, neighbours in G.adj.items():
+            from_nodes.extend([u] * len(neighbours))
+            to_nodes.extend(neighbours)
+    else:
+        for node in nodes:
+            from_nodes.extend([node] * len(G.succ[node]))
+            to_nodes.extend(G.succ[node])
+            predecessors = [u for u in G.pred[node] if u not in nodes]
+            from_nodes.extend(predecessors)
+            to_nodes.extend([node] * len(predecessors))
+        nodes = list(dict.fromkeys(itertools.chain(nodes, from_nodes, to_nodes)))
+    node_index = pd.Index(nodes)
+    keys = np.unique(
+        node_index.get_indexer(from_nodes).astype(np.int64) * len(nodes)
+        + node_index.get_indexer(to_nodes)
+    )
+    return nodes, keys // max(len(nodes), 1), keys % max(len(nodes), 1)
 
 
-def _build_paths(path_start_points, endpoints, neighbours):
-    paths = []
-    logging.info(f"Processing {len(path_start_points)} paths")
-    for path_start_point in path_start_points:
-        if path_start_point[1] not in endpoints:
-            path = list(path_start_point)
-            end_node = path[-1]
-            while end_node not in endpoints:
-                if neighbours[end_node] == {path[0]}:
-                    end_node = path[0]
-                elif len(neighbours[end_node]) > 1:
-                    next_nodes = neighbours[end_node] - {path[-2]}
-                    if len(next_nodes) > 1:
-                        raise RuntimeError(
-                            "Path building found additional branching. Simplification failed to find"
-                            "all of the correct end points."
-                        )
-                    end_node = list(next_nodes)[0]
-                else:
-                    end_node = list(neighbours[end_node])[0]
-                path.append(end_node)
-            paths.append(path)
-    return paths
+def _is_endpoint(u: np.ndarray, v: np.ndarray, n: int) -> np.ndarray:
+    """Finds nodes at which simplified paths start or end, from node degrees.
 
+    A node is an endpoint if it has more than two neighbours, is a source or a sink, has a self-loop, has a different
+    number of successors and predecessors or is a dead-end with a single neighbour.
 
-def _get_edge_groups_to_simplify(G, no_processes=1):
-    # first identify all the nodes that are endpoints
-    endpoints = set(
-        parallel.multiprocess_wrap(
-            data={
-                node: {
-                    "successors": set(G.successors(node)),
-                    "predecessors": set(G.predecessors(node)),
-                }
-                for node in G.nodes
-            },
-            split=parallel.split_dict,
-            apply=_is_endpoint,
-            combine=parallel.combine_list,
-            processes=no_processes,
-        )
+    Args:
+        u (np.ndarray): Codes of edge start nodes of de-duplicated edges sorted by (`u`, `v`).
+        v (np.ndarray): Codes of edge end nodes.
+        n (int): Number of nodes.
+
+    Returns:
+        np.ndarray: Whether each node is an endpoint.
+    """
+    keys = u * n + v
+    reverse_keys = v * n + u
+    reverse_exists = (
+        keys[np.minimum(np.searchsorted(keys, reverse_keys), len(keys) - 1)] == reverse_keys
+        if len(keys)
+        else np.zeros(0, dtype=bool)
+    )
+    out_degree = np.bincount(u, minlength=n)
+    in_degree = np.bincount(v, minlength=n)
+    neighbours = out_degree + in_degree - np.bincount(u[reverse_exists], minlength=n)
+    self_loop = np.bincount(u[u == v], minlength=n) > 0
+    return (
+        (neighbours > 2)
+        | (out_degree == 0)
+        | (in_degree == 0)
+        | self_loop
+        | (out_degree != in_degree)
+        | (neighbours == 1)
     )
 
-    logging.info(f"Identified {len(endpoints)} edge endpoints")
-    path_start_points = list(G.out_edges(endpoints))
 
-    logging.info(f"Identified {len(path_start_points)} possible paths")
-    return parallel.multiprocess_wrap(
-        data=path_start_points,
-        split=parallel.split_list,
-        apply=_build_paths,
-        combine=parallel.combine_list,
-        processes=no_processes,
-        endpoints=endpoints,
-        neighbours={node: set(G.neighbors(node)) for node in G.nodes},
+def _build_paths(u: np.ndarray, v: np.ndarray, is_endpoint: np.ndarray) -> list[list[int]]:
+    """Traces paths between endpoints, through nodes which are not endpoints, in a single pass.
+
+    Nodes which are not endpoints have exactly two neighbours, so a path continues to the neighbour it did not come
+    from until it reaches an endpoint.
+    Paths start at each edge from an endpoint to a node which is not an endpoint.
+
+    Args:
+        u (np.ndarray): Codes of edge start nodes of de-duplicated edges.
+        v (np.ndarray): Codes of edge end nodes.
+        is_endpoint (np.ndarray): Whether each node is an endpoint, see `_is_endpoint`.
+
+    Returns:
+        list[list[int]]: Node codes of paths to simplify.
+    """
+    n = len(is_endpoint)
+    # undirected neighbours of each node in CSR form
+    keys = np.unique(np.concatenate([u * n + v, v * n + u]))
+    neighbours = keys % max(n, 1)
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(keys // max(n, 1), minlength=n))])
+    degree = np.diff(indptr)
+    first_neighbour = np.where(degree > 0, neighbours[np.minimum(indptr[:-1], len(keys) - 1)], -1)
+    second_neighbour = np.where(
+        degree > 1, neighbours[np.minimum(indptr[:-1] + 1, len(keys) - 1)], -1
     )
 
+    starts = is_endpoint[u] & ~is_endpoint[v]
+    logging.info(f"Processing {starts.sum()} paths")
+    is_endpoint = is_endpoint.tolist()
+    first_neighbour = first_neighbour.tolist()
+    second_neighbour = second_neighbour.tolist()
+    paths = []
+    for start, node in zip(u[starts].tolist(), v[starts].tolist()):
+        path = [start, node]
+        previous = start
+        while not is_endpoint[node]:
+            if first_neighbour[node] != previous:
+                previous, node = node, first_neighbour[node]
+            else:
+                previous, node = node, second_neighbour[node]
+            path.append(node)
+        paths.append(path)
+    return paths
+
 
-def simplify_graph(n: "genet.core.Network", no_processes=1):
+def _get_edge_groups_to_simplify(G, nodes: Optional[set] = None) -> list[list]:
+    nodes_in_region = nodes
+    nodes, u, v = _graph_adjacency(G, nodes=nodes_in_region)
+    # first identify all the nodes that are endpoints
+    is_endpoint = _is_endpoint(u, v, len(nodes))
+    if nodes_in_region is not None:
+        # neighbours outside the region only have some of their edges coded, paths are not traced through them
+        in_region = np.zeros(len(nodes), dtype=bool)
+        in_region[: len(nodes_in_region)] = True
+        is_endpoint |= ~in_region
+    logging.info(f"Identified {is_endpoint.sum()} edge endpoints")
+    paths = _build_paths(u, v, is_endpoint)
+    if nodes_in_region is not None:
+        paths = [path for path in paths if in_region[path].all()]
+    return [[nodes[i] for i in path] for path in paths]
+
+
+def simplify_graph(n: "genet.core.Network", no_processes=1, nodes: Optional[set] = None) -> dict:
     """Simplify a graph's topology by removing interstitial nodes.
 
     MONKEY PATCH OF OSMNX'S GRAPH SIMPLIFICATION ALGO
@@ -223,19 +338,21 @@ def simplify_graph(n: "genet.core.Network", no_processes=1):
         n (Network): GeNet network.
         no_processes (int, optional):
             Number of processes to split some of the processes across. Defaults to 1.
+        nodes (Optional[set], optional):
+            If given, only paths with all of their nodes in this set are simplified. Defaults to None (the whole graph).
+            The map between old and new link indices of any previous (regional) simplification is updated, rather
+            than replaced.
+
+    Returns:
+        dict: Map between old and new link indices of links simplified in this run.
     """
     logging.info("Begin simplifying the graph")
-    initial_node_count = len(list(n.graph.nodes()))
-    initial_edge_count = len(list(n.graph.edges()))
+    initial_node_count = n.graph.number_of_nodes()
+    initial_edge_count = n.graph.number_of_edges()
 
     logging.info("Generating paths to be simplified")
     # generate each path that needs to be simplified
-    edges_to_simplify = [
-        list(x)
-        for x in set(
-            tuple(x) for x in _get_edge_groups_to_simplify(n.graph, no_processes=no_processes)
-        )
-    ]
+    edges_to_simplify = _get_edge_groups_to_simplify(n.graph, nodes=nodes)
     logging.info(f"Found {len(edges_to_simplify)} paths to simplify.")
 
     indexed_paths_to_simplify = dict(
@@ -243,10 +360,23 @@ def simplify_graph(n: "genet.core.Network", no_processes=1):
     )
     indexed_paths_to_simplify = _assemble_path_data(n, indexed_paths_to_simplify)
 
-    nodes_to_remove = set()
-    for k, data in indexed_paths_to_simplify.items():
-        nodes_to_remove |= set(data["nodes_to_remove"])
-    n.remove_nodes(nodes_to_remove, ignore_change_log=True, silent=True)
+    # remove all interstitial links and nodes at once
+    n.remove_links(
+        itertools.chain.from_iterable(data["ids"] for data in indexed_paths_to_simplify.values()),
+        ignore_change_log=True,
+        silent=True,
+    )
+    n.remove_nodes(
+        list(
+            set(
+                itertools.chain.from_iterable(
+                    data["nodes_to_remove"] for data in indexed_paths_to_simplify.values()
+                )
+            )
+        ),
+        ignore_change_log=True,
+        silent=True,
+    )
 
     logging.info("Processing links for all paths to be simplified")
     links_to_add = parallel.multiprocess_wrap(
@@ -273,31 +403,47 @@ def simplify_graph(n: "genet.core.Network", no_processes=1):
     del links_to_add
 
     # generate map between old and new ids
-    n.link_simplification_map = {}
+    link_simplification_map = {}
     for old_id_list, new_id in zip(old_ids, new_ids):
         for _id in old_id_list:
-            n.link_simplification_map[_id] = new_id
+            link_simplification_map[_id] = new_id
+    if not hasattr(n, "link_simplification_map"):
+        n.link_simplification_map = link_simplification_map.copy()
+    else:
+        # links simplified previously may have been simplified again
+        for _id, simplified_id in n.link_simplification_map.items():
+            if simplified_id in link_simplification_map:
+                n.link_simplification_map[_id] = link_simplification_map[simplified_id]
+        n.link_simplification_map.update(link_simplification_map)
+    # auxiliary files map from their original link ids
     n.update_link_auxiliary_files(n.link_simplification_map)
 
     logging.info(
-        f"Simplified graph: {initial_node_count} to {len(n.graph)} nodes, {initial_edge_count} to "
-        f"{len(n.graph.edges())} edges"
+        f"Simplified graph: {initial_node_count} to {n.graph.number_of_nodes()} nodes, {initial_edge_count} to "
+        f"{n.graph.number_of_edges()} edges"
     )
 
-    if n.schedule:
+    if n.schedule and link_simplification_map:
         logging.info("Updating the Schedule")
         # update stop's link reference ids
-        n.schedule.apply_function_to_stops(n.link_simplification_map, "linkRefId")
+        n.schedule.apply_function_to_stops(link_simplification_map, "linkRefId")
         logging.info("Updated Stop Link Reference Ids")
 
-        # update schedule routes
+        # update schedule routes which use simplified links
         df_routes = n.schedule.route_attribute_data(keys=["network_links"])
-        df_routes["network_links"] = df_routes["network_links"].apply(
-            lambda x: update_link_ids(x, n.link_simplification_map)
-        )
-        n.schedule.apply_attributes_to_routes(df_routes.T.to_dict())
-        logging.info("Updated Network Routes")
+        df_routes = df_routes[
+            df_routes["network_links"].apply(
+                lambda x: any(link in link_simplification_map for link in x)
+            )
+        ]
+        if not df_routes.empty:
+            df_routes["network_links"] = df_routes["network_links"].apply(
+                lambda x: update_link_ids(x, link_simplification_map)
+            )
+            n.schedule.apply_attributes_to_routes(df_routes.T.to_dict())
+        logging.info(f"Updated Network Routes of {len(df_routes)} Routes")
     logging.info("Finished simplifying network")
+    return link_simplification_map
 
 
 def update_link_ids(old_route, link_mapping):
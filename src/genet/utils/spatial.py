@@ -1,21 +1,28 @@
+import heapq
+import itertools
 import json
 import logging
+import numbers
 import statistics
-from typing import Union
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Iterable, Optional, Union
 
 import geopandas as gpd
-import networkx as nx
 import numpy as np
 import pandas as pd
 import polyline
+import pyproj
 import s2sphere as s2
+import shapely
 from shapely.geometry import GeometryCollection, LineString, MultiLineString, Point, shape
+from shapely.geometry.base import BaseGeometry
 from shapely.ops import linemerge, split
 from sklearn.neighbors import BallTree
 
 import genet
-import genet.output.spatial as spatial_output
 from genet.exceptions import EmptySpatialTree
+from genet.utils import persistence
 
 APPROX_EARTH_RADIUS = 6371008.8
 S2_LEVELS_FOR_SPATIAL_INDEXING = [0, 6, 8, 12, 18, 24, 30]
@@ -153,6 +160,50 @@ def decode_polyline_to_shapely_linestring(_polyline: str) -> LineString:
     return LineString(decoded)
 
 
+def decode_polylines_to_shapely_linestrings(
+    polylines: Iterable[str], precision: int = 5
+) -> np.ndarray:
+    """Decodes many google encoded polylines in one vectorised pass.
+
+    Gives the same linestrings as applying `decode_polyline_to_shapely_linestring` to each polyline.
+
+    Args:
+        polylines (Iterable[str]): google encoded polylines.
+        precision (int, optional): Number of decimal places the coordinates were encoded with. Defaults to 5.
+
+    Returns:
+        np.ndarray: Shapely linestring representations of input polylines, in input order.
+    """
+    polylines = list(polylines)
+    linestrings = np.full(len(polylines), LineString(), dtype=object)
+    # empty polylines decode to empty linestrings, `shapely.linestrings` cannot build those
+    non_empty = np.flatnonzero([len(_polyline) > 0 for _polyline in polylines])
+    if len(non_empty) == 0:
+        return linestrings
+    polylines = [polylines[i] for i in non_empty]
+    chars = np.frombuffer("".join(polylines).encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    # each value is a little-endian run of 5-bit chunks, all but the last flagged with 0x20
+    value_ends = chars < 0x20
+    value_starts = np.flatnonzero(np.concatenate(([True], value_ends[:-1])))
+    chunk_positions = np.arange(len(chars)) - np.repeat(
+        value_starts, np.diff(np.append(value_starts, len(chars)))
+    )
+    values = np.add.reduceat((chars & 0x1F) << (5 * chunk_positions), value_starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1).reshape(-1, 2)
+
+    polyline_ends = np.cumsum([len(_polyline) for _polyline in polylines]) - 1
+    coords_per_polyline = np.diff(np.cumsum(value_ends)[polyline_ends], prepend=0) // 2
+    coords = np.cumsum(deltas, axis=0)
+    polyline_offsets = np.concatenate(([[0, 0]], coords[np.cumsum(coords_per_polyline)[:-1] - 1]))
+    coords = (coords - np.repeat(polyline_offsets, coords_per_polyline, axis=0)) / float(
+        10**precision
+    )
+    linestrings[non_empty] = shapely.linestrings(
+        coords, indices=np.repeat(np.arange(len(polylines)), coords_per_polyline)
+    )
+    return linestrings
+
+
 def compute_average_proximity_to_polyline(poly_1: str, poly_2: str) -> float:
     """Computes average distance between points in poly_1 and closest points in poly_2.
 
@@ -194,6 +245,76 @@ def s2_hex_to_cell_union(hex_area):
     return s2.CellUnion(cell_ids=cell_ids)
 
 
+def read_region(
+    region: Union[str, Path, BaseGeometry, s2.CellUnion, Sequence[float]]
+) -> Union[BaseGeometry, s2.CellUnion]:
+    """Reads a region to filter data on spatially.
+
+    Args:
+        region (Union[str, Path, BaseGeometry, s2.CellUnion, Sequence[float]]):
+            - (min lon, min lat, max lon, max lat) bounding box, as any sequence (e.g. tuple or list) of 4 numbers.
+            - shapely.geometry object, e.g. Polygon, in EPSG:4326.
+            - path to a geojson file, can have multiple features.
+            - string with comma separated hex tokens of Google's S2 geometry, or an S2 cell union.
+
+    Raises:
+        ValueError: A bounding box must have 4 numbers.
+        TypeError: Region must be of one of the types above.
+
+    Returns:
+        Union[BaseGeometry, s2.CellUnion]: Region in EPSG:4326. Shapely geometries are prepared for repeated queries.
+    """
+    if isinstance(region, Path):
+        region = read_geojson_to_shapely(region)
+    elif isinstance(region, str):
+        if persistence.is_geojson(region):
+            region = read_geojson_to_shapely(region)
+        else:
+            region = s2_hex_to_cell_union(region)
+    elif isinstance(region, (Sequence, np.ndarray)):
+        if len(region) != 4 or not all(
+            isinstance(value, numbers.Real) and not isinstance(value, bool) for value in region
+        ):
+            raise ValueError(
+                "A bounding box region must be 4 numbers: (min lon, min lat, max lon, max lat). "
+                f"Got: {region}"
+            )
+        region = shapely.box(*region)
+    elif not isinstance(region, (BaseGeometry, s2.CellUnion)):
+        raise TypeError(
+            f"Unrecognised region of type {type(region)}. Expected a bounding box of 4 numbers, a shapely geometry, a "
+            "path to a geojson file or comma separated hex tokens of S2 cells."
+        )
+    if isinstance(region, BaseGeometry):
+        shapely.prepare(region)
+    return region
+
+
+def points_in_region(
+    lons: np.ndarray, lats: np.ndarray, region: Union[BaseGeometry, s2.CellUnion]
+) -> np.ndarray:
+    """Checks which points lie within a region.
+
+    Args:
+        lons (np.ndarray): Longitudes of points.
+        lats (np.ndarray): Latitudes of points.
+        region (Union[BaseGeometry, s2.CellUnion]): Region in EPSG:4326, e.g. from `read_region`.
+
+    Returns:
+        np.ndarray: Boolean mask of points within the region.
+    """
+    if isinstance(region, BaseGeometry):
+        return shapely.intersects_xy(region, lons, lats)
+    return np.fromiter(
+        (
+            region.intersects(s2.CellId(generate_index_s2(lat, lon)))
+            for lon, lat in zip(np.asarray(lons).tolist(), np.asarray(lats).tolist())
+        ),
+        dtype=bool,
+        count=len(lons),
+    )
+
+
 def generate_index_s2(lat: float, lng: float) -> int:
     """Returns s2.CellId from lat and lon
 
@@ -358,10 +479,26 @@ def approximate_metres_distance_in_4326_degrees(distance, lat):
     ) / 2
 
 
-class SpatialTree(nx.DiGraph):
+class SpatialTree:
+    """Link-to-link adjacency of a network, used for snapping and routing PT services.
+
+    Nodes of the spatial tree are the links of the network.
+    Edges of the spatial tree connect network links which share `to` and `from` nodes;
+    i.e. the two links are connected at a node.
+    The adjacency is stored in a compact CSR form: `link_ids[i]` gives the ID of the link with integer code `i`,
+    the successors of link `i` are `indices[indptr[i]:indptr[i + 1]]` and `lengths[i]` is the routing weight of
+    leaving link `i` (its own length).
+    """
+
     def __init__(self, n=None):
-        super().__init__()
         self.links = gpd.GeoDataFrame(columns=["link_id", "modes", "geometry"])
+        self.link_ids = np.array([], dtype=object)
+        self.lengths = np.array([], dtype=float)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.array([], dtype=np.int64)
+        self._link_index = pd.Index([])
+        self._metric_crs = None
+        self._metric_tree = None
         if n is not None:
             self.add_links(n)
 
@@ -375,35 +512,69 @@ class SpatialTree(nx.DiGraph):
         Args:
             n (genet.core.Network): GeNet network.
         """
-        self.links = n.to_geodataframe()["links"].to_crs("epsg:4326")
-        self.links = self.links.rename(columns={"id": "link_id"})
-        self.links = self.links.set_index("link_id", drop=False)
-
-        nodes = self.links.set_index("link_id").T.to_dict()
-        self.add_nodes_from(nodes)
+        links = n.to_geodataframe()["links"].to_crs("epsg:4326")
+        links = links.rename(columns={"id": "link_id"})
+        self.links = links.set_index("link_id", drop=False)
 
-        cols = ["from", "to", "link_id"]
-        edge_data_cols = list(
-            set(self.links.columns) - set(cols + ["modes", "geometry", "u", "v", "key"])
-        )
-        edges = pd.merge(
-            self.links[cols + edge_data_cols],
-            self.links[cols],
-            left_on="to",
-            right_on="from",
-            suffixes=("_to", "_from"),
-        )
-        edge_data = edges[edge_data_cols].T.to_dict()
-        self.add_edges_from(
-            list(
-                zip(
-                    edges["link_id_to"],
-                    edges["link_id_from"],
-                    [edge_data[idx] for idx in edges["link_id_to"].index],
-                )
-            )
+        if "length" in self.links.columns:
+            lengths = pd.to_numeric(self.links["length"], errors="coerce").fillna(1).to_numpy()
+        else:
+            lengths = np.ones(len(self.links))
+        node_codes, _ = pd.factorize(pd.concat([self.links["from"], self.links["to"]]))
+        self._build_adjacency(
+            link_ids=self.links["link_id"].to_numpy(dtype=object),
+            from_codes=node_codes[: len(self.links)],
+            to_codes=node_codes[len(self.links) :],
+            lengths=lengths,
         )
 
+    def _build_adjacency(
+        self,
+        link_ids: np.ndarray,
+        from_codes: np.ndarray,
+        to_codes: np.ndarray,
+        lengths: np.ndarray,
+    ):
+        """Builds the CSR link-to-link adjacency from integer coded link end nodes.
+
+        Link `i` connects to link `j` if `to_codes[i] == from_codes[j]`.
+        Successors of each link are ordered as the links appear in `link_ids`.
+
+        Args:
+            link_ids (np.ndarray): Link IDs, position in the array is the integer code of the link.
+            from_codes (np.ndarray): Integer codes of the `from` node of each link.
+            to_codes (np.ndarray): Integer codes of the `to` node of each link.
+            lengths (np.ndarray): Routing weight of each link.
+        """
+        n_links = len(link_ids)
+        n_nodes = int(max(from_codes.max(initial=-1), to_codes.max(initial=-1))) + 1
+        links_by_from_node = np.argsort(from_codes, kind="stable")
+        out_links_per_node = np.bincount(from_codes, minlength=n_nodes)
+        first_out_link = np.concatenate([[0], np.cumsum(out_links_per_node)[:-1]])
+
+        out_degree = out_links_per_node[to_codes]
+        indptr = np.concatenate([[0], np.cumsum(out_degree)]).astype(np.int64)
+        rows = np.repeat(np.arange(n_links), out_degree)
+        offsets = np.arange(indptr[-1]) - indptr[rows]
+
+        self.link_ids = link_ids
+        self.lengths = np.asarray(lengths, dtype=float)
+        self.indptr = indptr
+        self.indices = links_by_from_node[first_out_link[to_codes[rows]] + offsets].astype(np.int64)
+        self._link_index = pd.Index(link_ids)
+
+    def successors(self, link_id: str) -> list[str]:
+        """Links which can be travelled to directly from link `link_id`.
+
+        Args:
+            link_id (str): ID of the link in the spatial tree.
+
+        Returns:
+            list[str]: IDs of successor links.
+        """
+        i = self._link_index.get_loc(link_id)
+        return self.link_ids[self.indices[self.indptr[i] : self.indptr[i + 1]]].tolist()
+
     def modal_links_geodataframe(self, modes: Union[str, set[str]]) -> gpd.GeoDataFrame:
         """Subsets the links geodataframe on modes
 
@@ -418,68 +589,239 @@ class SpatialTree(nx.DiGraph):
         """
         if isinstance(modes, str):
             modes = {modes}
-        _df = self.links[self.links.apply(lambda x: spatial_output.modal_subset(x, modes), axis=1)]
+        _df = self.links[self.links["modes"].map(lambda x: bool(modes & set(x))).astype(bool)]
         if _df.empty:
             raise EmptySpatialTree(f"No links found satisfying modes: {modes}")
         return _df
 
-    def modal_subtree(self, modes: Union[str, set[str]]) -> nx.Graph:
-        """Create a networkx subgraph from subset of links which match the input modes.
+    def modal_subtree(self, modes: Union[str, set[str]]) -> "SpatialTree":
+        """Create a spatial tree from subset of links which match the input modes.
 
         Args:
             modes (Union[str, set[str]]): single or set of modes.
 
         Returns:
-            nx.Graph: Subgraph of Self.
+            SpatialTree: Subtree of Self.
         """
+        links = gpd.GeoDataFrame(self.modal_links_geodataframe(modes))
+        keep = self._link_index.get_indexer(links["link_id"])
+
+        new_codes = np.full(len(self.link_ids), -1, dtype=np.int64)
+        new_codes[keep] = np.arange(len(keep))
+        out_degree = np.diff(self.indptr)[keep]
+        rows = np.repeat(keep, out_degree)
+        entries = (
+            np.repeat(self.indptr[keep], out_degree)
+            + np.arange(out_degree.sum())
+            - np.repeat(np.concatenate([[0], np.cumsum(out_degree)[:-1]]), out_degree)
+        )
+        successors = new_codes[self.indices[entries]]
+        kept_entries = successors >= 0
 
         sub_tree = self.__class__()
-        links = gpd.GeoDataFrame(self.modal_links_geodataframe(modes))
-        sub_tree = self.subgraph(links["link_id"])
         sub_tree.links = links
+        sub_tree.link_ids = self.link_ids[keep]
+        sub_tree.lengths = self.lengths[keep]
+        sub_tree.indptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(new_codes[rows[kept_entries]], minlength=len(keep)))]
+        ).astype(np.int64)
+        sub_tree.indices = successors[kept_entries]
+        sub_tree._link_index = pd.Index(sub_tree.link_ids)
         return sub_tree
 
+    def _metric_links(self) -> tuple[pyproj.CRS, shapely.STRtree]:
+        """Lazily projects the links to a metric (UTM) CRS and indexes them in an STRtree.
+
+        Returns:
+            tuple[pyproj.CRS, shapely.STRtree]: Metric CRS and the tree over link geometries in that CRS.
+            Positions in the tree are the integer codes of the links.
+        """
+        if self._metric_tree is None:
+            self._metric_crs = self.links.estimate_utm_crs()
+            self._metric_tree = shapely.STRtree(
+                np.asarray(self.links.geometry.to_crs(self._metric_crs).array)
+            )
+        return self._metric_crs, self._metric_tree
+
     def closest_links(
-        self, gdf_points: gpd.GeoDataFrame, distance_radius: float
+        self,
+        gdf_points: gpd.GeoDataFrame,
+        distance_radius: Optional[float],
+        step_size: Optional[float] = None,
     ) -> gpd.GeoDataFrame:
         """Finds closest links from a list of points within a given radius.
 
         Given a GeoDataFrame `gdf_points` with a `geometry` column of shapely.geometry.Points,
         finds closest links within `distance_radius` from the spatial tree which accept `mode`.
+        Points and links are projected to a metric CRS and matched in a single query of an STRtree,
+        which gives the exact distance between each point and the links found for it.
 
-        Does not work very close to the poles.
+        If `step_size` is given, the radius is split into catchment rings of `step_size` metres.
+        Each point is assigned the smallest ring containing its nearest link (`catchment`) and only the links within
+        that ring are kept, which is the same as growing the search radius by `step_size` until at least one link
+        is found.
 
         Args:
             gdf_points (gpd.GeoDataFrame): Uniquely indexed, in crs: EPSG:4326 and only containing shapely.geometry.Points (lon,lat).
-            distance_radius (float): Metres in which to consider possible links.
+            distance_radius (Optional[float]):
+                Metres in which to consider possible links.
+                If None, there is no limit and each point is matched to (at least) its nearest link.
+            step_size (Optional[float], optional):
+                Metres by which to grow the catchment of each point. Defaults to None (no catchment rings).
 
         Returns:
-            gpd.GeoDataFrame: Closest links to points.
+            gpd.GeoDataFrame:
+                Closest links to points, indexed by point with columns `link_id` and `distance` (in metres) and,
+                if `step_size` is given, `catchment`. Points without links within the radius have null `link_id`.
         """
-        bdds = gdf_points["geometry"].bounds
-        approx_lat = (bdds["miny"].mean() + bdds["maxy"].mean()) / 2
-        approx_degree_radius = approximate_metres_distance_in_4326_degrees(
-            distance_radius, approx_lat
-        )
-        gdf_points["geometry"] = gdf_points["geometry"].apply(
-            lambda x: grow_point(x, approx_degree_radius)
-        )
-        try:
-            closest_links = gpd.sjoin(
-                self.links[["link_id", "geometry"]], gdf_points, how="right", predicate="intersects"
-            )
-            return closest_links
-        except EmptySpatialTree:
+        columns = list(gdf_points.columns) + ["link_id", "distance"]
+        if step_size is not None:
+            columns.append("catchment")
+        if self.links.empty or gdf_points.empty:
             return gpd.GeoDataFrame(
-                columns=set(gdf_points.columns) | {"index_left", "link_id", "geometry"},
-                crs="epsg:4326",
+                gdf_points.reindex(columns=columns), geometry="geometry", crs="epsg:4326"
             )
 
-    def path(self, G, source, target, weight=None):
+        metric_crs, tree = self._metric_links()
+        geometry = gdf_points.geometry
+        if geometry.crs is None:
+            geometry = geometry.set_crs("epsg:4326")
+        points = np.asarray(geometry.to_crs(metric_crs).array)
+        if distance_radius is None or step_size is not None:
+            nearest_idx, nearest_distance = tree.query_nearest(points, return_distance=True)
+            radius = np.full(len(points), np.nan)
+            radius[nearest_idx[0]] = nearest_distance
+            if step_size is not None:
+                radius = np.maximum(np.ceil(radius / step_size), 1) * step_size
+                if distance_radius is not None:
+                    radius[radius > np.ceil(distance_radius / step_size) * step_size] = np.nan
+        else:
+            radius = np.full(len(points), float(distance_radius))
+
+        within = ~np.isnan(radius)
+        point_idx, link_idx = tree.query(
+            points[within], predicate="dwithin", distance=radius[within]
+        )
+        point_idx = np.flatnonzero(within)[point_idx]
+        # GEOS flags zero length segments (e.g. of self-loop links) as invalid, their distances are still exact
+        with np.errstate(invalid="ignore"):
+            distances = shapely.distance(points[point_idx], tree.geometries[link_idx])
+        matches = pd.DataFrame(
+            {"link_id": self.link_ids[link_idx], "distance": distances},
+            index=gdf_points.index[point_idx],
+        )
+        if step_size is not None:
+            matches["catchment"] = radius[point_idx]
+
+        closest_links = gdf_points.drop(columns=matches.columns, errors="ignore").join(
+            matches, how="left"
+        )
+        return gpd.GeoDataFrame(closest_links[columns], geometry="geometry", crs="epsg:4326")
+
+    def _edge_weights(self, weight: Optional[str]) -> np.ndarray:
+        """Weight of leaving each link, in order of link codes.
+
+        Args:
+            weight (Optional[str]): Numeric link attribute, links missing a value weigh 1. None for unweighted.
+
+        Raises:
+            ValueError: `weight` must be a numeric attribute of the links.
+
+        Returns:
+            np.ndarray: Weight of each link.
+        """
+        if weight is None:
+            return np.ones(len(self.link_ids))
+        if weight == "length":
+            return self.lengths
+        if weight not in self.links.columns:
+            raise ValueError(f"Cannot route on `{weight}`, it is not an attribute of the links.")
         try:
-            return nx.shortest_path(G, source, target, weight=weight)
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
-            pass
+            weights = pd.to_numeric(self.links[weight].reindex(self.link_ids))
+        except (ValueError, TypeError) as e:
+            raise ValueError(
+                f"Cannot route on `{weight}`, the link attribute has non-numeric values."
+            ) from e
+        return weights.fillna(1).to_numpy(dtype=float)
+
+    def _dijkstra(
+        self, source: int, targets: set[int], weights: np.ndarray
+    ) -> tuple[dict[int, float], dict[int, int]]:
+        """Single source Dijkstra on integer link codes, which stops once all `targets` are settled.
+
+        Mirrors networkx's Dijkstra (heap ties broken by insertion order, predecessors updated only on strictly
+        shorter paths) so that the same paths are found.
+
+        Args:
+            source (int): Code of the source link.
+            targets (set[int]): Codes of the links for which paths are required.
+            weights (np.ndarray): Weight of leaving each link.
+
+        Returns:
+            tuple[dict[int, float], dict[int, int]]:
+                Distances to, and predecessors of, settled links.
+        """
+        dist = {}
+        seen = {source: 0}
+        pred = {source: -1}
+        remaining = set(targets)
+        counter = itertools.count()
+        fringe = [(0, next(counter), source)]
+        while fringe and remaining:
+            d, _, v = heapq.heappop(fringe)
+            if v in dist:
+                continue
+            dist[v] = d
+            remaining.discard(v)
+            start, end = self.indptr[v], self.indptr[v + 1]
+            if start == end:
+                continue
+            vu_dist = d + float(weights[v])
+            for u in self.indices[start:end].tolist():
+                if u in dist:
+                    continue
+                if u not in seen or vu_dist < seen[u]:
+                    seen[u] = vu_dist
+                    pred[u] = v
+                    heapq.heappush(fringe, (vu_dist, next(counter), u))
+        return dist, pred
+
+    def _route_pairs(
+        self, sources: pd.Series, targets: pd.Series, weight: Optional[str], return_paths: bool
+    ) -> list:
+        """Computes shortest path lengths, or paths, between pairs of link IDs.
+
+        Pairs are grouped by source link so that one search serves all targets of that source.
+
+        Args:
+            sources (pd.Series): Link IDs of path sources.
+            targets (pd.Series): Link IDs of path targets, aligned with `sources`.
+            weight (Optional[str]): Numeric link attribute, or None for unweighted.
+            return_paths (bool): Return paths (list of link IDs) rather than path lengths.
+
+        Returns:
+            list: Path length or path for each pair, None if no path exists.
+        """
+        weights = self._edge_weights(weight)
+        source_codes = self._link_index.get_indexer(sources)
+        target_codes = self._link_index.get_indexer(targets)
+        results = [None] * len(source_codes)
+
+        pairs = pd.DataFrame({"source": source_codes, "target": target_codes})
+        pairs = pairs[(pairs["source"] >= 0) & (pairs["target"] >= 0)]
+        for source, group in pairs.groupby("source", sort=False):
+            dist, pred = self._dijkstra(source, set(group["target"]), weights)
+            for position, target in zip(group.index, group["target"]):
+                if target not in dist:
+                    continue
+                if return_paths:
+                    path = [target]
+                    while path[-1] != source:
+                        path.append(pred[path[-1]])
+                    results[position] = self.link_ids[path[::-1]].tolist()
+                else:
+                    results[position] = dist[target]
+        return results
 
     def shortest_paths(
         self,
@@ -495,7 +837,7 @@ class SpatialTree(nx.DiGraph):
                 DataFrame with a `from_col` and `to_col` defining links stored in the graph for which a path is required
             from_col (str, optional): Name of the column which gives ID for the source link. Defaults to "u".
             to_col (str, optional): Name of the column which gives ID for the target link. Defaults to "v".
-            weight (str, optional): Weight for routing. Defaults to "length".
+            weight (str, optional): Numeric link attribute to use as the weight for routing. Defaults to "length".
 
         Returns:
             pd.DataFrame: `df_pt_edges` with an extra column 'shortest_path'
@@ -503,24 +845,15 @@ class SpatialTree(nx.DiGraph):
         if df_pt_edges.empty:
             df_pt_edges["shortest_path"] = None
         else:
-            try:
-                df_pt_edges["shortest_path"] = df_pt_edges.apply(
-                    lambda x: self.path(
-                        G=self, source=x[from_col], target=x[to_col], weight=weight
-                    ),
-                    axis=1,
-                )
-            except EmptySpatialTree:
-                logging.warning("Shortest path could not be found due to an empty SpatialTree")
-                df_pt_edges["shortest_path"] = None
+            df_pt_edges["shortest_path"] = pd.Series(
+                self._route_pairs(
+                    df_pt_edges[from_col], df_pt_edges[to_col], weight, return_paths=True
+                ),
+                index=df_pt_edges.index,
+                dtype=object,
+            )
         return df_pt_edges
 
-    def path_length(self, G, source, target, weight=None):
-        try:
-            return nx.dijkstra_path_length(G, source=source, target=target, weight=weight)
-        except nx.NetworkXNoPath:
-            pass
-
     def shortest_path_lengths(
         self,
         df_pt_edges: pd.DataFrame,
@@ -535,7 +868,7 @@ class SpatialTree(nx.DiGraph):
                 DataFrame with a `from_col` and `to_col` defining links stored in the graph for which a path length is required.
             from_col (str, optional): Name of the column which gives ID for the source link. Defaults to "u".
             to_col (str, optional): Name of the column which gives ID for the target link. Defaults to "v".
-            weight (str, optional): Weight for routing. Defaults to "length".
+            weight (str, optional): Numeric link attribute to use as the weight for routing. Defaults to "length".
 
         Returns:
             pd.DataFrame: `df_pt_edges` with an extra column 'shortest_path'
@@ -543,13 +876,13 @@ class SpatialTree(nx.DiGraph):
         if df_pt_edges.empty:
             df_pt_edges["path_lengths"] = None
         else:
-            try:
-                df_pt_edges["path_lengths"] = df_pt_edges.apply(
-                    lambda x: self.path_length(
-                        G=self, source=x[from_col], target=x[to_col], weight=weight
+            df_pt_edges["path_lengths"] = pd.to_numeric(
+                pd.Series(
+                    self._route_pairs(
+                        df_pt_edges[from_col], df_pt_edges[to_col], weight, return_paths=False
                     ),
-                    axis=1,
+                    index=df_pt_edges.index,
+                    dtype=object,
                 )
-            except EmptySpatialTree:
-                df_pt_edges["path_lengths"] = None
+            )
         return df_pt_edges
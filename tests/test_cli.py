@@ -169,6 +169,42 @@ class TestCLI:
             expected_files=["network.xml"],
         )
 
+    def test_make_road_only_network_clipped_to_bounding_box(self, invoke_runner_and_check_files):
+        invoke_runner_and_check_files(
+            "make_road_only_network",
+            args=[
+                f'--osm={os.path.join(EXAMPLE_DATA_DIR, "example.osm")}',
+                f'--osm_config={os.path.join(GENET_SRC_DIR, "configs", "OSM", "slim_config.yml")}',
+                "--osm_bbox",
+                "-0.176",
+                "51.507",
+                "-0.145",
+                "51.517",
+                "--keep_crossing_ways",
+                f"--projection={PROJECTION}",
+            ],
+            expected_files=["network.xml"],
+        )
+
+    def test_make_road_only_network_with_bounding_box_and_region_fails(self, tmp_path):
+        result = CliRunner().invoke(
+            cli.make_road_only_network,
+            [
+                f'--osm={os.path.join(EXAMPLE_DATA_DIR, "example.osm")}',
+                f'--osm_config={os.path.join(GENET_SRC_DIR, "configs", "OSM", "slim_config.yml")}',
+                "--osm_bbox",
+                "-0.176",
+                "51.507",
+                "-0.145",
+                "51.517",
+                "--osm_region=487604",
+                f"--projection={PROJECTION}",
+                f"--output_dir={tmp_path}",
+            ],
+        )
+        assert result.exit_code != 0
+        assert "Only one of `--osm_bbox` and `--osm_region` can be given" in result.output
+
     def test_reproject_network(self, invoke_runner_and_check_files):
         invoke_runner_and_check_files(
             "reproject_network",
@@ -2174,6 +2174,26 @@ def test_links_on_spatial_condition_with_shapely_geom(network_object_from_test_d
     assert set(links) == {"1", "2"}
 
 
+@pytest.mark.parametrize(
+    "region",
+    [
+        test_geojson,
+        Polygon([(-0.1509, 51.5197), (-0.1386, 51.5197), (-0.1386, 51.5256), (-0.1509, 51.5256)]),
+        Polygon([(1, 1), (2, 1), (2, 2), (1, 2)]),
+        "48761ad04d,48761ad054,48761ad05c,48761ad061,48761ad085,48761ad08c,48761ad094,48761ad09c,48761ad0b",
+        "48761ad3d7f,48761b2a04",
+    ],
+)
+def test_nodes_in_region_from_spatial_index_match_nodes_on_spatial_condition(
+    network_object_from_test_data, region
+):
+    network_object_from_test_data.add_node("1", {"id": "1", "x": 508400, "y": 162050})
+
+    assert set(network_object_from_test_data._nodes_in_region(region)) == set(
+        network_object_from_test_data.nodes_on_spatial_condition(region)
+    )
+
+
 def test_links_on_spatial_condition_with_s2_region(network_object_from_test_data):
     region = "48761ad04d,48761ad054,48761ad05c,48761ad061,48761ad085,48761ad08c,48761ad094,48761ad09c,48761ad0b,48761ad0d,48761ad0f,48761ad14,48761ad182c,48761ad19c,48761ad1a4,48761ad1ac,48761ad1b4,48761ad1bac,48761ad3d7f,48761ad3dc,48761ad3e4,48761ad3ef,48761ad3f4,48761ad3fc,48761ad41,48761ad43,48761ad5d,48761ad5e4,48761ad5ec,48761ad5fc,48761ad7,48761ad803,48761ad81c,48761ad824,48761ad82c,48761ad9d,48761ad9e4,48761ad9e84,48761ad9fc,48761ada04,48761ada0c,48761b2804,48761b2814,48761b281c,48761b283,48761b2844,48761b284c,48761b2995,48761b29b4,48761b29bc,48761b29d,48761b29f,48761b2a04"
     network_object_from_test_data.add_node("1", {"id": "1", "x": 508400, "y": 162050})
@@ -3628,6 +3648,29 @@ def test_schedule_routes_with_disconnected_routes(network_object_from_test_data)
     assert correct_routes == routes
 
 
+def test_reads_osm_network_in_two_passes_into_the_same_graph(
+    assert_semantically_equal, full_fat_default_config_path, osm_test_file
+):
+    network = read.read_osm(osm_test_file, full_fat_default_config_path, 1, "epsg:27700")
+    two_pass_network = read.read_osm(
+        osm_test_file, full_fat_default_config_path, 1, "epsg:27700", two_pass=True
+    )
+
+    assert_semantically_equal(dict(two_pass_network.nodes()), dict(network.nodes()))
+    assert sorted(two_pass_network.graph.edges(data="attributes"), key=str) == sorted(
+        network.graph.edges(data="attributes"), key=str
+    )
+
+
+def test_reads_osm_network_clipped_to_region(full_fat_default_config_path, osm_test_file):
+    network = read.read_osm(
+        osm_test_file, full_fat_default_config_path, 1, "epsg:27700", region=(-1, 0, 1, 1)
+    )
+
+    assert set(network.graph.nodes) == {"0", "1"}
+    assert {(u, v) for u, v in network.graph.edges()} == {("0", "1"), ("1", "0")}
+
+
 def test_reads_osm_network_into_the_right_schema(
     assert_semantically_equal, full_fat_default_config_path, osm_test_file
 ):
@@ -5562,7 +5605,7 @@ def test_saving_network_to_csv(assert_semantically_equal, network1, correct_sche
         output_links.to_dict(),
         {
             "index": {0: 0},
-            "modes": {0: "['car']"},
+            "modes": {0: '["car"]'},
             "to": {0: 101986},
             "s2_from": {0: 5221390329378179879},
             "length": {0: 52.76515108787025},
@@ -5577,12 +5620,30 @@ def test_saving_network_to_csv(assert_semantically_equal, network1, correct_sche
             "freespeed": {0: 4.166666666666667},
             "permlanes": {0: 1.0},
             "attributes": {
-                0: "{'osm:way:access': {'name': 'osm:way:access', 'class': 'java.lang.String', 'text': 'permissive'}, 'osm:way:highway': {'name': 'osm:way:highway', 'class': 'java.lang.String', 'text': 'unclassified'}, 'osm:way:id': {'name': 'osm:way:id', 'class': 'java.lang.Long', 'text': '26997928'}, 'osm:way:name': {'name': 'osm:way:name', 'class': 'java.lang.String', 'text': 'Brunswick Place'}}"
+                0: '{"osm:way:access": {"name": "osm:way:access", "class": "java.lang.String", "text": "permissive"}, "osm:way:highway": {"name": "osm:way:highway", "class": "java.lang.String", "text": "unclassified"}, "osm:way:id": {"name": "osm:way:id", "class": "java.lang.Long", "text": "26997928"}, "osm:way:name": {"name": "osm:way:name", "class": "java.lang.String", "text": "Brunswick Place"}}'
             },
         },
     )
 
 
+def test_network_csv_round_trip_preserves_links(network1, tmpdir):
+    network1.apply_attributes_to_link(
+        "0", {"modes": {"car", "bus"}, "attributes": {"osm:way:lanes": {"1", "2"}}}
+    )
+    network1.write_to_csv(tmpdir)
+
+    n = read.read_csv(
+        os.path.join(tmpdir, "network", "nodes.csv"),
+        os.path.join(tmpdir, "network", "links.csv"),
+        "epsg:27700",
+    )
+
+    assert n.link("0")["modes"] == {"car", "bus"}
+    assert n.link("0")["attributes"] == network1.link("0")["attributes"]
+    assert n.link("0")["attributes"]["osm:way:lanes"] == {"1", "2"}
+    assert n.link_id_mapping == network1.link_id_mapping
+
+
 def test_reads_node_elevations_from_tif_file(network3):
     elevation_test_folder = pytest.test_data_dir / "elevation"
 
@@ -5876,3 +5937,76 @@ def test_generating_summary_report(assert_semantically_equal, network_for_summar
         },
     }
     assert_semantically_equal(report, correct_report)
+
+
+@pytest.fixture()
+def network_with_a_branching_chain():
+    # 1 -> 2 -> 3 -> 4 -> 5 -> 6 with a branch at 3 -> 7
+    n = Network("epsg:4326")
+    n.add_nodes({str(i): {"x": float(i), "y": 0.0} for i in range(1, 7)})
+    n.add_node("7", {"x": 3.0, "y": 1.0})
+    link_attribs = {"freespeed": 1, "capacity": 1, "permlanes": 1, "length": 1, "modes": {"car"}}
+    n.add_links(
+        {
+            f"{u}_{v}": {"from": u, "to": v, **link_attribs}
+            for u, v in [("1", "2"), ("2", "3"), ("3", "4"), ("4", "5"), ("5", "6"), ("3", "7")]
+        }
+    )
+    return n
+
+
+def test_simplifying_network_in_a_region_only_simplifies_paths_within_it(
+    network_with_a_branching_chain,
+):
+    n = network_with_a_branching_chain
+    n.simplify(region={"1", "2", "3", "5", "6"})
+
+    assert set(n.link_simplification_map) == {"1_2", "2_3"}
+    assert set(n.graph.nodes) == {"1", "3", "4", "5", "6", "7"}
+    assert {"3_4", "4_5", "5_6", "3_7"}.issubset(set(n.link_id_mapping))
+    assert not n.is_simplified()
+
+
+def test_simplifying_network_in_a_polygon_region(network_with_a_branching_chain):
+    n = network_with_a_branching_chain
+    n.simplify(region=Polygon([(2.5, -1), (6.5, -1), (6.5, 0.5), (2.5, 0.5)]))
+
+    assert set(n.link_simplification_map) == {"3_4", "4_5", "5_6"}
+    assert set(n.graph.nodes) == {"1", "2", "3", "6", "7"}
+
+
+def test_simplifying_network_in_a_region_composes_simplification_map(
+    network_with_a_branching_chain,
+):
+    n = network_with_a_branching_chain
+    n.simplify(region={"1", "2", "3"})
+    first_simplified_link = n.link_simplification_map["1_2"]
+    n.remove_link("3_7")
+    n.simplify(region=set(n.graph.nodes))
+
+    assert set(n.link_simplification_map) == {
+        "1_2",
+        "2_3",
+        "3_4",
+        "4_5",
+        "5_6",
+        first_simplified_link,
+    }
+    assert len(set(n.link_simplification_map.values())) == 1
+    assert len(n.link_id_mapping) == 1
+
+
+def test_simplifying_whole_network_after_a_region_keeps_regional_simplification_map(
+    network_with_a_branching_chain,
+):
+    n = network_with_a_branching_chain
+    n.simplify(region={"1", "2", "3"})
+    regionally_simplified_link = n.link_simplification_map["1_2"]
+    n.simplify()
+
+    assert set(n.link_simplification_map) == {"1_2", "2_3", "3_4", "4_5", "5_6"}
+    assert n.link_simplification_map["1_2"] == regionally_simplified_link
+    assert n.link_simplification_map["2_3"] == regionally_simplified_link
+    assert n.link_simplification_map["3_4"] == n.link_simplification_map["5_6"]
+    assert set(n.link_simplification_map.values()).issubset(set(n.link_id_mapping))
+    assert n.is_simplified()
@@ -2266,7 +2266,11 @@ def test_read_matsim_schedule_delegates_to_matsim_reader_read_schedule(mocker, r
     mocker.patch.object(
         matsim_reader,
         "read_schedule",
-        return_value=([Service(id="1", routes=[route])], {}, {}, {"attributes": {}}),
+        return_value=(
+            Schedule(services=[Service(id="1", routes=[route])], epsg="epsg:27700").graph(),
+            {},
+            {"attributes": {}},
+        ),
     )
 
     schedule = read.read_matsim_schedule(pt2matsim_schedule_file, epsg="epsg:27700")
@@ -1,7 +1,10 @@
+import os
+
+import numpy as np
 import pytest
 from genet.input import gtfs_reader
 from genet.schedule_elements import change_log
-from pandas import DataFrame
+from pandas import DataFrame, Series
 from pandas.testing import assert_frame_equal
 
 gtfs_test_file = pytest.test_data_dir / "gtfs"
@@ -13,22 +16,12 @@ def correct_stop_times_db():
     return DataFrame(
         {
             "trip_id": {0: "BT1", 1: "BT1", 2: "RT1", 3: "RT1"},
-            "arrival_time": {0: "03:21:00", 1: "03:23:00", 2: "03:21:00", 3: "03:23:00"},
-            "departure_time": {0: "03:21:00", 1: "03:23:00", 2: "03:21:00", 3: "03:23:00"},
+            "arrival_time": {0: 12060, 1: 12180, 2: 12060, 3: 12180},
+            "departure_time": {0: 12060, 1: 12180, 2: 12060, 3: 12180},
             "stop_id": {0: "BSE", 1: "BSN", 2: "RSN", 3: "RSE"},
             "stop_sequence": {0: 0, 1: 1, 2: 0, 3: 1},
-            "stop_headsign": {0: float("nan"), 1: float("nan"), 2: float("nan"), 3: float("nan")},
-            "pickup_type": {0: 0, 1: 0, 2: 0, 3: 0},
-            "drop_off_type": {0: 1, 1: 0, 2: 0, 3: 1},
-            "timepoint": {0: 1, 1: 0, 2: 0, 3: 1},
-            "stop_direction_name": {
-                0: float("nan"),
-                1: float("nan"),
-                2: float("nan"),
-                3: float("nan"),
-            },
         }
-    )
+    ).astype(gtfs_reader.STOP_TIMES_DTYPES | {"arrival_time": "int32", "departure_time": "int32"})
 
 
 @pytest.fixture()
@@ -71,13 +64,8 @@ def correct_trips_db():
             "route_id": {0: "1001", 1: "1002"},
             "service_id": {0: "6630", 1: "6631"},
             "trip_id": {0: "BT1", 1: "RT1"},
-            "trip_headsign": {0: "Bus Test trip", 1: "Rail Test trip"},
-            "block_id": {0: float("nan"), 1: float("nan")},
-            "wheelchair_accessible": {0: 0, 1: 0},
-            "trip_direction_name": {0: float("nan"), 1: float("nan")},
-            "exceptional": {0: float("nan"), 1: float("nan")},
         }
-    )
+    ).astype(gtfs_reader.TRIPS_DTYPES)
 
 
 @pytest.fixture()
@@ -241,24 +229,203 @@ def correct_schedule_graph_data_from_test_gtfs():
     }
 
 
-def test_read_services_from_calendar_correct():
-    services = gtfs_reader.read_services_from_calendar(gtfs_test_file, "20190604")
+@pytest.mark.parametrize("path", [gtfs_test_file, gtfs_test_zip_file])
+def test_read_services_from_calendar_correct(path):
+    services = gtfs_reader.read_services_from_calendar(path, "20190604")
     assert services == ["6630", "6631"]
 
 
+@pytest.mark.parametrize("path", [gtfs_test_file, gtfs_test_zip_file])
+@pytest.mark.parametrize("csv_engine", ["c", "pyarrow"])
 def test_read_gtfs_to_db_like_tables_correct(
-    correct_stop_times_db, correct_stops_db, correct_trips_db, correct_routes_db
+    path, csv_engine, correct_stop_times_db, correct_stops_db, correct_trips_db, correct_routes_db
 ):
     stop_times_db, stops_db, trips_db, routes_db = gtfs_reader.read_gtfs_to_db_like_tables(
-        gtfs_test_file
+        path, csv_engine=csv_engine
     )
 
-    assert_frame_equal(stop_times_db, correct_stop_times_db)
+    # pyarrow orders categories as they appear in the table
+    assert_frame_equal(stop_times_db, correct_stop_times_db, check_categorical=False)
     assert_frame_equal(stops_db, correct_stops_db)
-    assert_frame_equal(trips_db, correct_trips_db)
+    assert_frame_equal(trips_db, correct_trips_db, check_categorical=False)
     assert_frame_equal(routes_db, correct_routes_db)
 
 
+def test_reading_zipped_gtfs_does_not_extract_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    gtfs_reader.read_gtfs_to_schedule_graph(gtfs_test_zip_file, "20190604")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_finding_gtfs_tables_nested_in_zip_folder():
+    assert gtfs_reader.find_gtfs_tables(gtfs_test_zip_file) == {
+        "stop_times": "gtfs/stop_times.txt",
+        "trips": "gtfs/trips.txt",
+        "stops": "gtfs/stops.txt",
+        "calendar": "gtfs/calendar.txt",
+        "routes": "gtfs/routes.txt",
+    }
+
+
+def test_pyarrow_engine_keeps_leading_zeros_of_ids(tmp_path):
+    (tmp_path / "trips.txt").write_text("route_id,service_id,trip_id\n01,002,0003\n")
+    with gtfs_reader.open_gtfs_table(tmp_path, "trips.txt") as table:
+        trips_db = gtfs_reader.read_gtfs_table_columns(table, gtfs_reader.TRIPS_DTYPES, "pyarrow")
+    assert trips_db.iloc[0].tolist() == ["01", "002", "0003"]
+
+
+def test_sanitising_categorical_ids_which_clash_with_existing_ids():
+    ids = gtfs_reader.sanitise_ids(DataFrame({"id": ["a b", "a_b", "c"]}).astype("category")["id"])
+    assert ids.tolist() == ["a_b", "a_b", "c"]
+    assert ids.cat.categories.tolist() == ["a_b", "c"]
+
+
+def test_zipped_and_extracted_gtfs_have_the_same_fingerprint():
+    assert gtfs_reader.gtfs_fingerprint(gtfs_test_file) == gtfs_reader.gtfs_fingerprint(
+        gtfs_test_zip_file
+    )
+
+
+def test_different_gtfs_feeds_have_different_fingerprints():
+    assert gtfs_reader.gtfs_fingerprint(gtfs_test_file) != gtfs_reader.gtfs_fingerprint(
+        pytest.test_data_dir / "gtfs_with_spaces"
+    )
+
+
+def test_reading_gtfs_with_cache_reuses_parsed_tables(mocker, tmp_path):
+    tables = gtfs_reader.read_gtfs_to_db_like_tables(gtfs_test_file, cache_dir=tmp_path)
+    assert sorted(os.listdir(tmp_path / gtfs_reader.gtfs_fingerprint(gtfs_test_file))) == [
+        "routes.parquet",
+        "stop_times.parquet",
+        "stops.parquet",
+        "trips.parquet",
+    ]
+
+    mocker.patch.object(gtfs_reader, "_parse_gtfs_tables")
+    cached_tables = gtfs_reader.read_gtfs_to_db_like_tables(gtfs_test_zip_file, cache_dir=tmp_path)
+
+    gtfs_reader._parse_gtfs_tables.assert_not_called()
+    for cached_table, table in zip(cached_tables, tables):
+        assert_frame_equal(cached_table, table)
+
+
+def test_reading_gtfs_from_cache_gives_the_same_schedule_graph(tmp_path, assert_semantically_equal):
+    schedule_graph = gtfs_reader.read_gtfs_to_schedule_graph(gtfs_test_file, "20190604")
+    gtfs_reader.read_gtfs_to_schedule_graph(gtfs_test_file, "20190604", cache_dir=tmp_path)
+    cached_schedule_graph = gtfs_reader.read_gtfs_to_schedule_graph(
+        gtfs_test_file, "20190604", cache_dir=tmp_path
+    )
+
+    assert_semantically_equal(
+        dict(cached_schedule_graph.nodes(data=True)), dict(schedule_graph.nodes(data=True))
+    )
+    assert_semantically_equal(cached_schedule_graph.edges._adjdict, schedule_graph.edges._adjdict)
+    del schedule_graph.graph["change_log"]
+    del cached_schedule_graph.graph["change_log"]
+    assert_semantically_equal(cached_schedule_graph.graph, schedule_graph.graph)
+
+
+def test_merging_gtfs_feeds_gives_clashing_ids_new_ids():
+    feed = gtfs_reader.read_gtfs_feeds_to_db_like_tables([gtfs_test_file], "20190604")[0]
+    moved_stops_feed = (feed[0], feed[1].assign(stop_lat=feed[1]["stop_lat"] + 0.01), *feed[2:])
+
+    stop_times_db, stops_db, trips_db, routes_db = gtfs_reader.merge_gtfs_tables(
+        [feed, feed, moved_stops_feed]
+    )
+
+    assert routes_db["route_id"].tolist() == [
+        "1001",
+        "1002",
+        "1001_1",
+        "1002_1",
+        "1001_2",
+        "1002_2",
+    ]
+    assert trips_db.astype(str).to_dict("list") == {
+        "route_id": ["1001", "1002", "1001_1", "1002_1", "1001_2", "1002_2"],
+        "service_id": ["6630", "6631", "6630", "6631", "6630", "6631"],
+        "trip_id": ["BT1", "RT1", "BT1_1", "RT1_1", "BT1_2", "RT1_2"],
+    }
+    # stops at the same location as stops of earlier feeds are shared
+    assert stops_db["stop_id"].tolist() == [
+        "BSE",
+        "BSN",
+        "RSE",
+        "RSN",
+        "BSE_1",
+        "BSN_1",
+        "RSE_1",
+        "RSN_1",
+    ]
+    assert stop_times_db.astype(str)[["trip_id", "stop_id"]].to_dict("list") == {
+        "trip_id": ["BT1", "BT1", "RT1", "RT1"]
+        + ["BT1_1", "BT1_1", "RT1_1", "RT1_1"]
+        + ["BT1_2", "BT1_2", "RT1_2", "RT1_2"],
+        "stop_id": ["BSE", "BSN", "RSN", "RSE"] * 2 + ["BSE_1", "BSN_1", "RSN_1", "RSE_1"],
+    }
+
+
+def test_merging_gtfs_feeds_shares_stops_under_the_new_ids_of_earlier_feeds():
+    feed = gtfs_reader.read_gtfs_feeds_to_db_like_tables([gtfs_test_file], "20190604")[0]
+    moved_stops_feed = (feed[0], feed[1].assign(stop_lat=feed[1]["stop_lat"] + 0.01), *feed[2:])
+
+    stop_times_db, stops_db, _, _ = gtfs_reader.merge_gtfs_tables(
+        [feed, moved_stops_feed, moved_stops_feed]
+    )
+
+    assert stops_db["stop_id"].tolist() == [
+        "BSE",
+        "BSN",
+        "RSE",
+        "RSN",
+        "BSE_1",
+        "BSN_1",
+        "RSE_1",
+        "RSN_1",
+    ]
+    assert stop_times_db.astype(str)[["trip_id", "stop_id"]].to_dict("list") == {
+        "trip_id": ["BT1", "BT1", "RT1", "RT1"]
+        + ["BT1_1", "BT1_1", "RT1_1", "RT1_1"]
+        + ["BT1_2", "BT1_2", "RT1_2", "RT1_2"],
+        "stop_id": ["BSE", "BSN", "RSN", "RSE"] + ["BSE_1", "BSN_1", "RSN_1", "RSE_1"] * 2,
+    }
+
+
+def test_clashing_ids_are_given_ids_unused_by_any_feed():
+    new_ids = gtfs_reader._reindex_clashing_ids(
+        [Series(["a", "b"]), Series(["a", "a_1"]), Series(["a"])]
+    )
+    assert new_ids == [{}, {"a": "a_2"}, {"a": "a_3"}]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_reading_gtfs_feeds_builds_a_single_schedule_graph(processes):
+    schedule_graph = gtfs_reader.read_gtfs_feeds_to_schedule_graph(
+        [gtfs_test_file, pytest.test_data_dir / "gtfs_with_spaces", gtfs_test_zip_file],
+        "20190604",
+        processes=processes,
+    )
+
+    assert schedule_graph.graph["service_to_route_map"] == {
+        "1001": ["1001_0"],
+        "1001_1": ["1001_1_0"],
+        "1002": ["1002_0"],
+        "1002_1": ["1002_1_0"],
+        "100_1": ["100_1_0"],
+        "100_2": ["100_2_0"],
+    }
+    assert set(schedule_graph.nodes) == {"BSE", "BSN", "RSE", "RSN", "BS_E", "BS_N", "RS_E", "RS_N"}
+    assert schedule_graph.nodes["BSE"]["services"] == {"1001", "1001_1"}
+
+
+def test_reading_gtfs_feeds_without_services_on_the_day_raises_error():
+    with pytest.raises(RuntimeError) as error_info:
+        gtfs_reader.read_gtfs_feeds_to_schedule_graph(
+            [gtfs_test_file, gtfs_test_zip_file], "20210604"
+        )
+    assert "None of the GTFS feeds have services" in str(error_info.value)
+
+
 def test_read_gtfs_calendar_with_spaces_fills_in_with_character():
     services = gtfs_reader.read_services_from_calendar(
         pytest.test_data_dir / "gtfs_with_spaces", "20190604"
@@ -276,26 +443,13 @@ def test_read_gtfs_with_spaces_fills_in_with_character():
         DataFrame(
             {
                 "trip_id": {0: "BT_1", 1: "BT_1", 2: "RT_1", 3: "RT_1"},
-                "arrival_time": {0: "03:21:00", 1: "03:23:00", 2: "03:21:00", 3: "03:23:00"},
-                "departure_time": {0: "03:21:00", 1: "03:23:00", 2: "03:21:00", 3: "03:23:00"},
+                "arrival_time": {0: 12060, 1: 12180, 2: 12060, 3: 12180},
+                "departure_time": {0: 12060, 1: 12180, 2: 12060, 3: 12180},
                 "stop_id": {0: "BS_E", 1: "BS_N", 2: "RS_N", 3: "RS_E"},
                 "stop_sequence": {0: 0, 1: 1, 2: 0, 3: 1},
-                "stop_headsign": {
-                    0: float("nan"),
-                    1: float("nan"),
-                    2: float("nan"),
-                    3: float("nan"),
-                },
-                "pickup_type": {0: 0, 1: 0, 2: 0, 3: 0},
-                "drop_off_type": {0: 1, 1: 0, 2: 0, 3: 1},
-                "timepoint": {0: 1, 1: 0, 2: 0, 3: 1},
-                "stop_direction_name": {
-                    0: float("nan"),
-                    1: float("nan"),
-                    2: float("nan"),
-                    3: float("nan"),
-                },
             }
+        ).astype(
+            gtfs_reader.STOP_TIMES_DTYPES | {"arrival_time": "int32", "departure_time": "int32"}
         ),
     )
     assert_frame_equal(
@@ -347,13 +501,8 @@ def test_read_gtfs_with_spaces_fills_in_with_character():
                 "route_id": {0: "100_1", 1: "100_2"},
                 "service_id": {0: "663_0", 1: "663_1"},
                 "trip_id": {0: "BT_1", 1: "RT_1"},
-                "trip_headsign": {0: "Bus Test trip", 1: "Rail Test trip"},
-                "block_id": {0: float("nan"), 1: float("nan")},
-                "wheelchair_accessible": {0: 0, 1: 0},
-                "trip_direction_name": {0: float("nan"), 1: float("nan")},
-                "exceptional": {0: float("nan"), 1: float("nan")},
             }
-        ),
+        ).astype(gtfs_reader.TRIPS_DTYPES),
     )
     assert_frame_equal(
         routes_db,
@@ -409,7 +558,7 @@ def test_zip_read_to_schedule_correct(
     correct_schedule_graph_edges_from_test_gtfs,
     correct_schedule_graph_data_from_test_gtfs,
 ):
-    schedule_graph = gtfs_reader.read_gtfs_to_schedule_graph(gtfs_test_file, "20190604")
+    schedule_graph = gtfs_reader.read_gtfs_to_schedule_graph(gtfs_test_zip_file, "20190604")
     assert_semantically_equal(
         dict(schedule_graph.nodes(data=True)), correct_schedule_graph_nodes_from_test_gtfs
     )
@@ -426,3 +575,87 @@ def test_reading_loopy_gtfs_removes_duplicated_stops():
         pytest.test_data_dir / "loopy_gtfs", "20190604"
     )
     assert schedule_graph.graph["routes"]["1001_0"]["ordered_stops"] == ["BSE", "BSN", "BSE", "BSN"]
+
+
+def test_converting_gtfs_times_past_midnight_to_seconds():
+    seconds = gtfs_reader.hms_to_seconds(
+        DataFrame({"time": ["03:21:00", "25:00:30", " 7:05:03", "03:21:00"]})["time"]
+    )
+    assert seconds.tolist() == [12060, 90030, 25503, 12060]
+
+
+def test_formatting_seconds_as_times_of_day_wraps_around_midnight():
+    times = gtfs_reader.seconds_to_hms(np.array([0, 12060, 90030, -60]))
+    assert times.tolist() == ["00:00:00", "03:21:00", "01:00:30", "+23:59:00"]
+
+
+def test_trips_visiting_the_same_stops_make_up_a_route():
+    stop_times_db = DataFrame(
+        {
+            "trip_id": ["T2", "T2", "T1", "T1", "T3", "T3", "T4"],
+            "arrival_time": [
+                "25:02:00",
+                "25:00:00",
+                "04:00:00",
+                "04:03:00",
+                "05:00:00",
+                "05:04:00",
+                "06:00:00",
+            ],
+            "departure_time": [
+                "25:02:00",
+                "25:00:30",
+                "04:00:30",
+                "04:03:00",
+                "05:00:00",
+                "05:04:00",
+                "06:00:00",
+            ],
+            "stop_id": ["B", "A", "A", "B", "B", "A", "A"],
+            "stop_sequence": [2, 1, 1, 2, 1, 2, 1],
+        }
+    )
+    stops_db = DataFrame(
+        {
+            "stop_id": ["A", "B"],
+            "stop_lat": [51.5, 51.6],
+            "stop_lon": [-0.1, -0.2],
+            "stop_name": ["A", "B"],
+        }
+    )
+    trips_db = DataFrame(
+        {"route_id": ["1001"] * 4, "service_id": ["6630"] * 4, "trip_id": ["T1", "T2", "T3", "T4"]}
+    )
+    routes_db = DataFrame(
+        {
+            "route_id": ["1001"],
+            "route_short_name": ["BTR"],
+            "route_long_name": [""],
+            "route_type": [3],
+            "route_color": ["CE312D"],
+        }
+    )
+
+    g = gtfs_reader.gtfs_db_to_schedule_graph(
+        stop_times_db, stops_db, trips_db, routes_db, services=["6630"]
+    )
+
+    assert g.graph["service_to_route_map"] == {"1001": ["1001_0", "1001_1"]}
+    assert g.graph["routes"]["1001_0"]["ordered_stops"] == ["A", "B"]
+    assert g.graph["routes"]["1001_0"]["trips"] == {
+        "trip_id": ["T1", "T2"],
+        "trip_departure_time": ["04:00:00", "01:00:00"],
+        "vehicle_id": ["veh_0", "veh_1"],
+    }
+    assert g.graph["routes"]["1001_0"]["arrival_offsets"] == ["00:00:00", "00:03:00"]
+    assert g.graph["routes"]["1001_0"]["departure_offsets"] == ["00:00:30", "00:03:00"]
+    assert g.graph["routes"]["1001_1"]["ordered_stops"] == ["B", "A"]
+    assert g.graph["routes"]["1001_1"]["trips"]["trip_id"] == ["T3"]
+    assert g.graph["services"] == {"1001": {"id": "1001", "name": "BTR"}}
+    assert g.nodes["A"]["routes"] == {"1001_0", "1001_1"}
+    assert g.edges["A", "B"]["routes"] == {"1001_0"}
+
+
+def test_converting_missing_gtfs_times_raises_error():
+    with pytest.raises(RuntimeError, match="1 stop times are missing"):
+        gtfs_reader.hms_to_seconds(DataFrame({"time": ["03:21:00", None]})["time"])
@@ -1,12 +1,14 @@
+import gzip
 import os
+import re
 from dataclasses import dataclass, field
 
 import pytest
 from genet.input import matsim_reader, read
-from genet.schedule_elements import Route, Service, Stop
+from genet.schedule_elements import Route, Schedule, Service, Stop
 from genet.utils import java_dtypes
 from pyproj import Proj, Transformer
-from shapely.geometry import LineString
+from shapely.geometry import LineString, Polygon
 
 MATSIM_DATA_DIR = pytest.test_data_dir / "matsim"
 pt2matsim_network_test_file = MATSIM_DATA_DIR / "network.xml"
@@ -368,6 +370,287 @@ def test_read_network_builds_graph_with_unique_links_given_matsim_network_with_c
     assert_semantically_equal(duplicated_link_ids, {"1": ["1_1"]})
 
 
+def test_read_network_reads_additional_attributes_of_nodes_links_and_network(tmpdir):
+    network_path = os.path.join(tmpdir, "network.xml")
+    with open(network_path, "w") as f:
+        f.write(
+            """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE network SYSTEM "http://www.matsim.org/files/dtd/network_v2.dtd">
+<network>
+<nodes>
+<node id="A" x="528504.1342843144" y="182155.7435136598">
+<attributes><attribute name="osm:node:id" class="java.lang.Long">1</attribute></attributes>
+</node>
+<node id="B" x="528489.467895946" y="182206.20303669578"/>
+</nodes>
+<links>
+<link id="1" from="A" to="B" length="52.7" freespeed="4.1" capacity="600.0" permlanes="1.0" modes="car">
+<attributes><attribute name="osm:way:name" class="java.lang.String">Brunswick Place</attribute></attributes>
+</link>
+<link id="2" from="B" to="A" length="52.7" freespeed="4.1" capacity="600.0" permlanes="1.0" modes="car"/>
+</links>
+<attributes><attribute name="simplified" class="java.lang.String">True</attribute></attributes>
+</network>
+"""
+        )
+    transformer = Transformer.from_proj(Proj("epsg:27700"), Proj("epsg:4326"), always_xy=True)
+
+    (g, _, _, _, network_attributes) = matsim_reader.read_network(network_path, transformer)
+
+    assert g.nodes["A"]["attributes"] == {"osm:node:id": 1}
+    assert "attributes" not in g.nodes["B"]
+    assert g["A"]["B"][0]["attributes"] == {"osm:way:name": "Brunswick Place"}
+    assert "attributes" not in g["B"]["A"][0]
+    assert network_attributes == {"simplified": "True"}
+
+
+def test_splitting_network_file_into_chunks_aligns_them_on_elements():
+    sections = matsim_reader._find_network_sections(pt2matsim_network_multiple_edges_test_file)
+    chunks = matsim_reader._split_network_sections(
+        pt2matsim_network_multiple_edges_test_file, sections, no_chunks=100
+    )
+
+    with open(pt2matsim_network_multiple_edges_test_file, "rb") as f:
+        data = f.read()
+    assert [chunk[1] for chunk in chunks] == ["nodes", "nodes", "links", "links"]
+    for _, section, start, end in chunks:
+        assert data[start:end].strip().startswith(f"<{section[:-1]} ".encode())
+        assert data[start:end].count(f"<{section[:-1]} ".encode()) == 1
+    assert chunks[0][2] == sections["nodes"][0]
+    assert chunks[-1][3] == sections["links"][1]
+
+
+@pytest.mark.parametrize(
+    "network_file",
+    [
+        pt2matsim_network_test_file,
+        pt2matsim_network_multiple_edges_test_file,
+        pt2matsim_network_clashing_link_ids_test_file,
+        pt2matsim_network_clashing_node_ids_test_file,
+        pt2matsim_network_with_geometry_file,
+        matsim_output_network_path,
+    ],
+)
+def test_reading_network_in_parallel_chunks_gives_same_result_as_sequential_read(
+    assert_semantically_equal, network_file
+):
+    transformer = Transformer.from_proj(Proj("epsg:27700"), Proj("epsg:4326"), always_xy=True)
+
+    g, *network_data = matsim_reader.read_network(network_file, transformer)
+    g_parallel, *network_data_parallel = matsim_reader.read_network(
+        network_file, transformer, processes=2
+    )
+
+    assert_semantically_equal(dict(g_parallel.nodes(data=True)), dict(g.nodes(data=True)))
+    assert list(g_parallel.edges(keys=True)) == list(g.edges(keys=True))
+    for u, v, k, data in g.edges(keys=True, data=True):
+        assert_semantically_equal(g_parallel[u][v][k], data)
+    assert_semantically_equal(network_data_parallel, network_data)
+
+
+def test_reading_gzipped_network_in_parallel_falls_back_to_single_process(tmpdir):
+    network_path = os.path.join(tmpdir, "network.xml.gz")
+    with open(pt2matsim_network_multiple_edges_test_file, "rb") as f:
+        with gzip.open(network_path, "wb") as f_out:
+            f_out.write(f.read())
+    transformer = Transformer.from_proj(Proj("epsg:27700"), Proj("epsg:4326"), always_xy=True)
+
+    g, link_id_mapping, *_ = matsim_reader.read_network(network_path, transformer, processes=2)
+
+    assert set(g.nodes) == {"25508485", "21667818"}
+    assert set(link_id_mapping) == {"1", "2"}
+
+
+def test_reading_non_utf8_network_in_parallel_keeps_its_encoding(tmpdir):
+    network_path = os.path.join(tmpdir, "network.xml")
+    nodes = "\n".join(f'<node id="{i}" x="{528504 + i}" y="{182155 + i}"/>' for i in range(20))
+    links = "\n".join(
+        f'<link id="{i}" from="{i}" to="{i + 1}" length="52.7" freespeed="4.1" capacity="600.0" '
+        f'permlanes="1.0" modes="car"><attributes>'
+        f'<attribute name="osm:way:name" class="java.lang.String">Stra\u00dfe {i}</attribute>'
+        f"</attributes></link>"
+        for i in range(19)
+    )
+    with open(network_path, "w", encoding="iso-8859-1") as f:
+        f.write(
+            f"""<?xml version="1.0" encoding="ISO-8859-1"?>
+<network>
+<nodes>
+{nodes}
+</nodes>
+<links>
+{links}
+</links>
+</network>
+"""
+        )
+    transformer = Transformer.from_proj(Proj("epsg:27700"), Proj("epsg:4326"), always_xy=True)
+
+    g, *_ = matsim_reader.read_network(network_path, transformer)
+    g_parallel, *_ = matsim_reader.read_network(network_path, transformer, processes=2)
+
+    assert g_parallel["0"]["1"][0]["attributes"]["osm:way:name"] == "Stra\u00dfe 0"
+    for u, v, k, data in g.edges(keys=True, data=True):
+        assert g_parallel[u][v][k]["attributes"] == data["attributes"]
+
+
+@pytest.fixture()
+def network_with_commented_out_elements_path(tmpdir):
+    network_path = os.path.join(tmpdir, "network.xml")
+    nodes = "\n".join(f'<node id="{i}" x="{528504 + i}" y="{182155 + i}"/>' for i in range(20))
+    links = "\n".join(
+        f'<link id="{i}" from="{i}" to="{i + 1}" length="52.7" freespeed="4.1" capacity="600.0" '
+        f'permlanes="1.0" modes="car"/>'
+        for i in range(19)
+    )
+    commented_out_nodes = "\n".join(f'<node id="X{i}" x="0" y="0"/>' for i in range(20))
+    commented_out_links = "\n".join(
+        f'<link id="X{i}" from="0" to="1" length="1" freespeed="1" capacity="1" permlanes="1" '
+        f'modes="car"/>'
+        for i in range(20)
+    )
+    with open(network_path, "w") as f:
+        f.write(
+            f"""<?xml version="1.0" encoding="UTF-8"?>
+<network>
+<!-- <nodes> -->
+<nodes>
+{nodes}
+<!--
+{commented_out_nodes}
+</nodes>
+-->
+</nodes>
+<links>
+<![CDATA[
+{commented_out_links}
+</links>
+]]>
+{links}
+</links>
+</network>
+"""
+        )
+    return network_path
+
+
+def test_splitting_network_file_into_chunks_skips_comments_and_cdata(
+    network_with_commented_out_elements_path,
+):
+    sections = matsim_reader._find_network_sections(network_with_commented_out_elements_path)
+    chunks = matsim_reader._split_network_sections(
+        network_with_commented_out_elements_path, sections, no_chunks=100
+    )
+
+    with open(network_with_commented_out_elements_path, "rb") as f:
+        data = f.read()
+    assert data[sections["nodes"][0] : sections["nodes"][1]].count(b"<node ") == 40
+    assert data[sections["links"][0] : sections["links"][1]].count(b"<link ") == 39
+    boundaries = [start for _, section, start, _ in chunks if start != sections[section][0]]
+    assert boundaries
+    for start in boundaries:
+        assert re.match(rb'<(node|link) id="\d+"', data[start:])
+
+
+def test_reading_network_with_commented_out_elements_in_parallel_gives_same_result_as_sequential_read(
+    network_with_commented_out_elements_path,
+):
+    transformer = Transformer.from_proj(Proj("epsg:27700"), Proj("epsg:4326"), always_xy=True)
+
+    g, link_id_mapping, *_ = matsim_reader.read_network(
+        network_with_commented_out_elements_path, transformer
+    )
+    g_parallel, link_id_mapping_parallel, *_ = matsim_reader.read_network(
+        network_with_commented_out_elements_path, transformer, processes=2
+    )
+
+    assert set(g_parallel.nodes) == set(g.nodes) == {str(i) for i in range(20)}
+    assert list(g_parallel.edges(keys=True)) == list(g.edges(keys=True))
+    assert set(link_id_mapping_parallel) == set(link_id_mapping) == {str(i) for i in range(19)}
+
+
+@pytest.fixture()
+def network_to_filter_path(tmpdir):
+    network_path = os.path.join(tmpdir, "network.xml")
+    with open(network_path, "w") as f:
+        f.write(
+            """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE network SYSTEM "http://www.matsim.org/files/dtd/network_v2.dtd">
+<network>
+<nodes>
+<node id="A" x="528504.1342843144" y="182155.7435136598">
+<attributes><attribute name="osm:node:id" class="java.lang.Long">1</attribute></attributes>
+</node>
+<node id="B" x="528489.467895946" y="182206.20303669578"/>
+<node id="C" x="538489.467895946" y="192206.20303669578"/>
+</nodes>
+<links>
+<link id="1" from="A" to="B" length="52.7" freespeed="4.1" capacity="600.0" permlanes="1.0" modes="car,walk">
+<attributes>
+<attribute name="osm:way:name" class="java.lang.String">Brunswick Place</attribute>
+<attribute name="osm:way:highway" class="java.lang.String">unclassified</attribute>
+<attribute name="geometry" class="java.lang.String">ez~hinaBc~sze@kdAmoB</attribute>
+</attributes>
+</link>
+<link id="2" from="B" to="A" length="52.7" freespeed="4.1" capacity="600.0" permlanes="1.0" modes="bus"/>
+<link id="3" from="B" to="C" length="1000.0" freespeed="4.1" capacity="600.0" permlanes="1.0" modes="car"/>
+</links>
+</network>
+"""
+        )
+    return network_path
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+@pytest.mark.parametrize(
+    "region",
+    [
+        (-0.2, 51.5, -0.1, 51.6),
+        Polygon([(-0.2, 51.5), (-0.1, 51.5), (-0.1, 51.6), (-0.2, 51.6)]),
+        "48761ac",
+    ],
+)
+def test_reading_network_within_region_drops_nodes_and_links_outside_of_it(
+    network_to_filter_path, region, processes
+):
+    n = read.read_matsim_network(
+        network_to_filter_path, "epsg:27700", processes=processes, region=region
+    )
+
+    assert set(n.graph.nodes) == {"A", "B"}
+    assert set(n.link_id_mapping) == {"1", "2"}
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_reading_network_with_modes_drops_links_without_them_and_unused_nodes(
+    network_to_filter_path, processes
+):
+    n = read.read_matsim_network(
+        network_to_filter_path, "epsg:27700", processes=processes, modes={"walk", "bus"}
+    )
+
+    assert set(n.graph.nodes) == {"A", "B"}
+    assert set(n.link_id_mapping) == {"1", "2"}
+    assert n.link("1")["modes"] == {"car", "walk"}
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_reading_network_with_attribute_keys_drops_other_additional_attributes(
+    network_to_filter_path, processes
+):
+    n = read.read_matsim_network(
+        network_to_filter_path,
+        "epsg:27700",
+        processes=processes,
+        attribute_keys={"osm:way:highway"},
+    )
+
+    assert set(n.link_id_mapping) == {"1", "2", "3"}
+    assert n.link("1")["attributes"] == {"osm:way:highway": "unclassified"}
+    assert "geometry" in n.link("1")
+    assert "attributes" not in n.node("A")
+
+
 def test_read_network_rejects_non_unique_nodes(assert_semantically_equal):
     correct_nodes = {
         "21667818": {
@@ -698,19 +981,56 @@ def test_forcing_long_form_in_network_with_additional_node_attributes_reads_netw
 def test_read_schedule_reads_the_data_correctly(
     assert_semantically_equal, correct_services_from_test_pt2matsim_schedule
 ):
-    (services, minimalTransferTimes, _, _) = matsim_reader.read_schedule(
+    (schedule_graph, minimalTransferTimes, _) = matsim_reader.read_schedule(
         pt2matsim_schedule_file, "epsg:27700"
     )
+    schedule = Schedule(epsg="epsg:27700", _graph=schedule_graph)
 
     correct_minimalTransferTimes = {
         "26997928P": {"26997928P.link:1": 0.0},
         "26997928P.link:1": {"26997928P": 0.0},
     }
 
-    assert correct_services_from_test_pt2matsim_schedule == services
+    assert correct_services_from_test_pt2matsim_schedule == list(schedule.services())
     assert_semantically_equal(minimalTransferTimes, correct_minimalTransferTimes)
 
 
+def test_read_schedule_reindexes_clashing_service_and_route_ids(tmpdir):
+    schedule_path = os.path.join(tmpdir, "schedule.xml")
+    route = """<transitRoute id="r1">
+<transportMode>bus</transportMode>
+<routeProfile>
+<stop refId="s1" departureOffset="00:00:00" awaitDeparture="true"/>
+<stop refId="s2" arrivalOffset="00:02:00" awaitDeparture="true"/>
+</routeProfile>
+<route><link refId="1"/></route>
+<departures><departure id="t1" departureTime="04:40:00" vehicleRefId="veh_1"/></departures>
+</transitRoute>"""
+    with open(schedule_path, "w") as f:
+        f.write(
+            f"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE transitSchedule SYSTEM "http://www.matsim.org/files/dtd/transitSchedule_v2.dtd">
+<transitSchedule>
+<transitStops>
+<stopFacility id="s1" x="528464.1342843144" y="182179.7435136598" linkRefId="1"/>
+<stopFacility id="s2" x="528504.1342843144" y="182155.7435136598" linkRefId="1"/>
+</transitStops>
+<transitLine id="l1" name="12">{route}</transitLine>
+<transitLine id="l1" name="12">{route}</transitLine>
+</transitSchedule>
+"""
+        )
+
+    (g, _, _) = matsim_reader.read_schedule(schedule_path, "epsg:27700")
+
+    assert g.graph["service_to_route_map"] == {"l1": ["r1"], "l1_0": ["l1_0_r1"]}
+    assert g.graph["routes"]["l1_0_r1"]["arrival_offsets"] == ["00:00:00", "00:02:00"]
+    assert g.graph["routes"]["l1_0_r1"]["departure_offsets"] == ["00:00:00", "00:02:00"]
+    assert g.nodes["s1"]["routes"] == {"r1", "l1_0_r1"}
+    assert g.edges["s1", "s2"]["services"] == {"l1", "l1_0"}
+    assert g.graph["change_log"]["object_type"].to_list() == ["service", "route"]
+
+
 def test_schedule_with_additional_stop_attributes_reads_data_correctly(
     assert_semantically_equal,
     schedule_with_additional_attrib_stop_xml_file,
@@ -1,3 +1,6 @@
+import numpy as np
+import osmium
+import pytest
 from genet.input import osm_reader
 
 
@@ -567,3 +570,237 @@ def test_generate_graph_edges_with_node_reindexing(
             },
         ],
     )
+
+
+def test_read_osm_data_reads_nodes_and_ways_into_arrays(full_fat_default_config, osm_test_file):
+    osm_data = osm_reader.read_osm_data(osm_test_file, full_fat_default_config)
+
+    assert osm_data.node_ids.tolist() == [0, 1, 2]
+    assert osm_data.node_lat.tolist() == pytest.approx([0.0085544, 0.0242785, -0.0071698])
+    assert osm_data.way_ids.tolist() == [0, 100, 400, 700, 47007861, 47007862]
+    assert osm_data.way_node_offsets.tolist() == [0, 2, 4, 6, 8, 11, 13]
+    assert osm_data.way_nodes.tolist() == [0, 1, 0, 2, 1, 0, 2, 0, 2, 1, 0, 1, 0]
+    assert osm_data.way_tags[0] == {"highway": "unclassified"}
+    assert osm_data.way_tags[4] == {"highway": "tertiary", "lanes": "3", "oneway": "yes"}
+
+
+@pytest.fixture()
+def osm_file_with_building(tmp_path):
+    osm_file = tmp_path / "building.osm"
+    osm_file.write_text(
+        """<?xml version="1.0" encoding="UTF-8"?><osm version="0.6">
+  <node id="1" lat="0.0" lon="0.0"/>
+  <node id="2" lat="0.0" lon="0.001"/>
+  <node id="3" lat="0.001" lon="0.001"/>
+  <way id="10"><nd ref="1"/><nd ref="3"/><tag k="building" v="yes"/></way>
+  <way id="11"><nd ref="2"/><nd ref="1"/><tag k="highway" v="footway"/></way>
+</osm>"""
+    )
+    return osm_file
+
+
+def test_read_osm_data_skips_ways_without_useful_tags(
+    full_fat_default_config, osm_file_with_building
+):
+    osm_data = osm_reader.read_osm_data(osm_file_with_building, full_fat_default_config)
+
+    assert osm_data.way_ids.tolist() == [11]
+    assert list(osm_data.ways())[0][1].tolist() == [2, 1]
+
+
+def test_read_osm_data_in_two_passes_reads_only_nodes_used_by_ways(
+    full_fat_default_config, osm_file_with_building
+):
+    osm_data = osm_reader.read_osm_data(
+        osm_file_with_building, full_fat_default_config, two_pass=True
+    )
+
+    assert osm_data.node_ids.tolist() == [1, 2]
+    assert osm_data.node_lon.tolist() == pytest.approx([0.0, 0.001])
+    assert osm_data.way_ids.tolist() == [11]
+    assert osm_data.way_nodes.tolist() == [2, 1]
+
+
+def test_read_node_locations_skips_nodes_missing_from_file(osm_file_with_building):
+    node_ids, lon, lat = osm_reader.read_node_locations(osm_file_with_building, np.array([2, 3, 4]))
+
+    assert node_ids.tolist() == [2, 3]
+    assert lon.tolist() == pytest.approx([0.001, 0.001])
+    assert lat.tolist() == pytest.approx([0.0, 0.001])
+
+
+def test_mode_tag_values_compiles_mode_indicators_of_useful_tags(full_fat_default_config):
+    tag_values = osm_reader.mode_tag_values(full_fat_default_config)
+
+    assert set(tag_values) == {"highway", "railway"}
+    assert {"motorway", "footway", "road"} <= tag_values["highway"]
+    assert tag_values["railway"] is None
+
+
+def test_mode_tag_values_skips_values_without_modes_and_tags_not_kept_for_paths(
+    full_fat_default_config,
+):
+    full_fat_default_config.USEFUL_TAGS_PATH = ["highway", "railway", "lanes"]
+    full_fat_default_config.MODE_INDICATORS = {
+        "highway": {"primary": ["car"], "construction": ["car"], "track": []},
+        "railway": ["rail"],
+        "route": ["bus"],
+    }
+
+    assert osm_reader.mode_tag_values(full_fat_default_config) == {
+        "highway": {"primary"},
+        "railway": None,
+    }
+
+
+def test_read_osm_data_skips_ways_which_can_not_be_assigned_modes(
+    full_fat_default_config, tmp_path
+):
+    osm_file = tmp_path / "modes.osm"
+    osm_file.write_text(
+        """<?xml version="1.0" encoding="UTF-8"?><osm version="0.6">
+  <node id="1" lat="0.0" lon="0.0"/>
+  <node id="2" lat="0.0" lon="0.001"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><tag k="highway" v="construction"/></way>
+  <way id="11"><nd ref="1"/><nd ref="2"/><tag k="highway" v="unknown"/><tag k="lanes" v="2"/></way>
+  <way id="12"><nd ref="1"/><nd ref="2"/><tag k="highway" v="road"/></way>
+  <way id="13"><nd ref="1"/><nd ref="2"/><tag k="railway" v="rail"/><tag k="lanes" v="1"/></way>
+</osm>"""
+    )
+
+    osm_data = osm_reader.read_osm_data(osm_file, full_fat_default_config)
+
+    assert osm_data.way_ids.tolist() == [12, 13]
+    assert osm_data.way_tags == [{"highway": "road"}, {"lanes": "1", "railway": "rail"}]
+
+
+@pytest.fixture()
+def osm_data_crossing_region():
+    # nodes 1, 2 and 4 lie within the (0, 0, 1, 1) bounding box
+    return osm_reader.OSMData(
+        node_ids=np.array([4, 3, 2, 1]),
+        node_lon=np.array([0.7, 2.0, 0.5, 0.1]),
+        node_lat=np.array([0.2, 0.5, 0.5, 0.5]),
+        way_ids=np.array([10, 11, 12]),
+        way_node_offsets=np.array([0, 5, 7, 9]),
+        way_nodes=np.array([1, 2, 3, 2, 4, 3, 2, 3, 5]),
+        way_tags=[{"highway": "primary"}, {"highway": "secondary"}, {"highway": "tertiary"}],
+    )
+
+
+def test_clip_osm_data_cuts_ways_at_region_boundary(osm_data_crossing_region):
+    osm_data = osm_reader.clip_osm_data(osm_data_crossing_region, (0, 0, 1, 1))
+
+    assert osm_data.way_ids.tolist() == [10, 10]
+    assert [node_refs.tolist() for _, node_refs, _ in osm_data.ways()] == [[1, 2], [2, 4]]
+    assert osm_data.way_tags == [{"highway": "primary"}, {"highway": "primary"}]
+    assert osm_data.node_ids.tolist() == [4, 3, 2, 1]
+
+
+def test_clip_osm_data_keeps_crossing_ways_whole(osm_data_crossing_region):
+    osm_data = osm_reader.clip_osm_data(
+        osm_data_crossing_region, (0, 0, 1, 1), keep_crossing_ways=True
+    )
+
+    assert osm_data.way_ids.tolist() == [10, 11]
+    assert [node_refs.tolist() for _, node_refs, _ in osm_data.ways()] == [[1, 2, 3, 2, 4], [3, 2]]
+    assert osm_data.way_tags == [{"highway": "primary"}, {"highway": "secondary"}]
+
+
+@pytest.fixture()
+def multi_block_osm_pbf_file(tmp_path):
+    osm_file = tmp_path / "multi_block.osm.pbf"
+    writer = osmium.SimpleWriter(str(osm_file))
+    for i in range(1, 20001):
+        writer.add_node(osmium.osm.mutable.Node(id=i, location=(0.0001 * (i % 1000), 0.001 * i)))
+    for i in range(1, 20000, 2):
+        tags = {"highway": "primary"} if i % 3 else {"building": "yes"}
+        writer.add_way(osmium.osm.mutable.Way(id=i, nodes=[i, i + 1], tags=tags))
+    writer.close()
+    return osm_file
+
+
+def test_find_pbf_blocks_covers_whole_file(multi_block_osm_pbf_file):
+    blocks = osm_reader._find_pbf_blocks(multi_block_osm_pbf_file)
+
+    assert blocks[0][0] == "OSMHeader"
+    assert {blob_type for blob_type, _, _ in blocks[1:]} == {"OSMData"}
+    assert len(blocks) > 3
+    assert blocks[0][1] == 0
+    assert all(end == start for (_, _, end), (_, start, _) in zip(blocks[:-1], blocks[1:]))
+    assert blocks[-1][2] == multi_block_osm_pbf_file.stat().st_size
+
+
+def test_find_pbf_blocks_returns_none_for_xml_file(osm_test_file):
+    assert osm_reader._find_pbf_blocks(osm_test_file) is None
+
+
+def test_deal_pbf_chunks_then_combine_keeps_file_order():
+    dealt = osm_reader._deal_pbf_chunks(list(range(7)), processes=3)
+
+    assert dealt == [[0, 3, 6], [1, 4], [2, 5]]
+    assert osm_reader._combine_dealt_pbf_chunks(dealt) == list(range(7))
+
+
+@pytest.mark.parametrize("two_pass", [False, True])
+def test_read_osm_data_across_processes_matches_single_process(
+    full_fat_default_config, multi_block_osm_pbf_file, two_pass
+):
+    osm_data = osm_reader.read_osm_data(
+        multi_block_osm_pbf_file, full_fat_default_config, two_pass=two_pass
+    )
+    parallel_osm_data = osm_reader.read_osm_data(
+        multi_block_osm_pbf_file, full_fat_default_config, two_pass=two_pass, processes=2
+    )
+
+    assert len(osm_data.way_ids) == 6667
+    for array_name in [
+        "node_ids",
+        "node_lon",
+        "node_lat",
+        "way_ids",
+        "way_node_offsets",
+        "way_nodes",
+    ]:
+        np.testing.assert_array_equal(
+            getattr(parallel_osm_data, array_name), getattr(osm_data, array_name)
+        )
+    assert parallel_osm_data.way_tags == osm_data.way_tags
+
+
+def test_concatenating_osm_data_shifts_way_node_offsets():
+    osm_data = osm_reader.OSMData.concat(
+        [
+            osm_reader.OSMData(
+                node_ids=np.array([1, 2]),
+                node_lon=np.array([0.0, 0.1]),
+                node_lat=np.array([0.0, 0.1]),
+                way_ids=np.array([10]),
+                way_node_offsets=np.array([0, 2]),
+                way_nodes=np.array([1, 2]),
+                way_tags=[{"highway": "primary"}],
+            ),
+            osm_reader.OSMData(
+                node_ids=np.array([3]),
+                node_lon=np.array([0.2]),
+                node_lat=np.array([0.2]),
+                way_ids=np.array([11, 12]),
+                way_node_offsets=np.array([0, 2, 5]),
+                way_nodes=np.array([2, 3, 3, 2, 1]),
+                way_tags=[{"highway": "secondary"}, {"railway": "rail"}],
+            ),
+        ]
+    )
+
+    assert osm_data.node_ids.tolist() == [1, 2, 3]
+    assert osm_data.way_ids.tolist() == [10, 11, 12]
+    assert [node_refs.tolist() for _, node_refs, _ in osm_data.ways()] == [
+        [1, 2],
+        [2, 3],
+        [3, 2, 1],
+    ]
+    assert osm_data.way_tags == [
+        {"highway": "primary"},
+        {"highway": "secondary"},
+        {"railway": "rail"},
+    ]
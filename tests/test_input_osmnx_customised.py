@@ -1,4 +1,5 @@
-from genet.input import osmnx_customised
+import numpy as np
+from genet.input import osm_reader, osmnx_customised
 
 
 def test_return_edges_handles_regular_non_oneway_paths(
@@ -99,3 +100,57 @@ def test_return_edges_handles_roundabouts_as_oneway(
                 "junction": "roundabout",
             },
         )
+
+
+def test_parse_osm_nodes_paths_keeps_only_nodes_used_by_paths(full_fat_default_config):
+    osm_data = osm_reader.OSMData(
+        node_ids=np.array([1, 2, 3]),
+        node_lon=np.array([0.0, 0.001, 0.002]),
+        node_lat=np.array([0.0, 0.0, 0.0]),
+        way_ids=np.array([10]),
+        way_node_offsets=np.array([0, 3]),
+        way_nodes=np.array([3, 1, 1]),
+        way_tags=[{"highway": "unclassified"}],
+    )
+
+    nodes, paths = osmnx_customised.parse_osm_nodes_paths(osm_data, full_fat_default_config)
+
+    assert list(nodes) == ["1", "3"]
+    assert nodes["3"]["x"] == 0.002
+    assert paths["10"]["nodes"] == ["3", "1"]
+    assert paths["10"]["osmid"] == "10"
+
+
+def test_parse_osm_nodes_paths_drops_nodes_of_paths_without_edges(full_fat_default_config):
+    osm_data = osm_reader.OSMData(
+        node_ids=np.array([1, 2, 3]),
+        node_lon=np.array([0.0, 0.001, 0.002]),
+        node_lat=np.array([0.0, 0.0, 0.0]),
+        way_ids=np.array([10, 11]),
+        way_node_offsets=np.array([0, 2, 4]),
+        way_nodes=np.array([1, 2, 3, 3]),
+        way_tags=[{"highway": "unclassified"}, {"highway": "unclassified"}],
+    )
+
+    nodes, paths = osmnx_customised.parse_osm_nodes_paths(osm_data, full_fat_default_config)
+
+    assert list(nodes) == ["1", "2"]
+    assert paths["11"]["nodes"] == ["3"]
+
+
+def test_parse_osm_nodes_paths_keeps_all_paths_of_a_way_split_by_clipping(full_fat_default_config):
+    osm_data = osm_reader.OSMData(
+        node_ids=np.array([1, 2, 3, 4]),
+        node_lon=np.array([0.0, 0.001, 0.002, 0.003]),
+        node_lat=np.array([0.0, 0.0, 0.0, 0.0]),
+        way_ids=np.array([10, 10]),
+        way_node_offsets=np.array([0, 2, 4]),
+        way_nodes=np.array([1, 2, 3, 4]),
+        way_tags=[{"highway": "unclassified"}, {"highway": "unclassified"}],
+    )
+
+    nodes, paths = osmnx_customised.parse_osm_nodes_paths(osm_data, full_fat_default_config)
+
+    assert list(nodes) == ["1", "2", "3", "4"]
+    assert [path["nodes"] for path in paths.values()] == [["1", "2"], ["3", "4"]]
+    assert {path["osmid"] for path in paths.values()} == {"10"}
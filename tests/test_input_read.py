@@ -1,6 +1,7 @@
 import os
 
 import pytest
+from genet.exceptions import NetworkSchemaError
 from genet.input import read
 from genet.schedule_elements import Route, Service, Stop
 from shapely.geometry import LineString
@@ -459,6 +460,62 @@ def test_reading_network_csv(assert_semantically_equal):
     )
 
 
+@pytest.fixture()
+def json_encoded_network_csv(tmp_path):
+    nodes = tmp_path / "nodes.csv"
+    nodes.write_text(
+        "id,lat,lon\n"
+        "1,51.52416253323928,-0.14930198709481451\n"
+        "2,51.52370573323939,-0.14910908709500162\n"
+    )
+    links = tmp_path / "links.csv"
+    links.write_text(
+        "id,from,to,modes,attributes\n"
+        '10,1,2,"[""bus"", ""car""]","{""osm:way:id"": 26997928}"\n'
+        '11,2,1,"[""walk""]","{""osm:way:lanes"": {\'1\', \'2\'}}"\n'
+        '12,2,1,"[""walk""]",\n'
+    )
+    return nodes, links
+
+
+def test_reading_json_encoded_network_csv_decodes_modes_and_attributes(json_encoded_network_csv):
+    n = read.read_csv(*json_encoded_network_csv, "epsg:27700")
+
+    assert n.link("10")["modes"] == {"bus", "car"}
+    assert n.link("10")["attributes"] == {"osm:way:id": 26997928}
+    assert n.link("11")["modes"] == {"walk"}
+    assert n.link("11")["attributes"] == {"osm:way:lanes": {"1", "2"}}
+    assert "attributes" not in n.link("12")
+
+
+def test_reading_network_csv_gives_each_link_its_own_modes(json_encoded_network_csv):
+    n = read.read_csv(*json_encoded_network_csv, "epsg:27700")
+
+    assert n.link("11")["modes"] is not n.link("12")["modes"]
+
+
+def test_reading_network_csv_fills_in_node_coordinates_and_link_lengths(json_encoded_network_csv):
+    n = read.read_csv(*json_encoded_network_csv, "epsg:27700")
+
+    assert round(n.node("1")["x"]) == 528489
+    assert round(n.node("1")["y"]) == 182206
+    assert "s2_id" in n.node("1")
+    assert n.link("10")["length"] == 53
+    assert n.link_id_mapping == {
+        "10": {"from": "1", "to": "2", "multi_edge_idx": 0},
+        "11": {"from": "2", "to": "1", "multi_edge_idx": 0},
+        "12": {"from": "2", "to": "1", "multi_edge_idx": 1},
+    }
+
+
+def test_reading_network_csv_with_duplicated_link_ids_raises_error(tmp_path):
+    links = tmp_path / "links.csv"
+    links.write_text("id,from,to\n1,25508485,21667818\n1,21667818,25508485\n")
+
+    with pytest.raises(NetworkSchemaError, match="must be unique"):
+        read.read_csv(os.path.join(csv_test_folder, "nodes.csv"), links, "epsg:27700")
+
+
 def test_read_gtfs_returns_expected_schedule(
     assert_semantically_equal,
     correct_stops_to_service_mapping_from_test_gtfs,
@@ -512,3 +569,15 @@ def test_read_gtfs_returns_expected_schedule(
     assert_semantically_equal(
         schedule.stop_to_route_ids_map(), correct_stops_to_route_mapping_from_test_gtfs
     )
+
+
+def test_read_gtfs_feeds_combines_feeds_with_clashing_ids_into_one_schedule():
+    schedule = read.read_gtfs_feeds(
+        [gtfs_test_folder, pytest.test_data_dir / "gtfs.zip"], "20190604", epsg="epsg:27700"
+    )
+
+    assert set(schedule.service_ids()) == {"1001", "1002", "1001_1", "1002_1"}
+    assert schedule.route("1001_1_0").ordered_stops == schedule.route("1001_0").ordered_stops
+    assert schedule.route("1001_1_0").trips["trip_id"] == ["BT1_1"]
+    assert set(schedule.reference_nodes()) == {"BSE", "BSN", "RSE", "RSN"}
+    assert schedule.epsg == "epsg:27700"
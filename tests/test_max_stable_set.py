@@ -1,11 +1,19 @@
 import shutil
 
+import genet.max_stable_set
 import genet.utils.spatial as spatial
-import networkx as nx
+import numpy as np
 import pyomo.environ as pe
 import pytest
 from genet import MaxStableSet, Network, Route, Schedule, Service, Stop
-from genet.max_stable_set import get_indices_of_chosen_problem_graph_nodes
+from genet.max_stable_set import (
+    decompose_problem,
+    get_indices_of_chosen_problem_graph_nodes,
+    grouped_mean,
+    solve_problem_arrays,
+    solve_with_greedy_heuristic,
+    solve_with_scipy_milp,
+)
 from pandas import DataFrame
 
 
@@ -315,7 +323,9 @@ def test_detects_stops_that_lack_nearest_links(mocker, network, network_spatial_
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
 
     mss = MaxStableSet(
         pt_graph=network.schedule["bus_service"].graph(),
@@ -353,6 +363,12 @@ def test_stops_missing_nearest_links_identifies_stops_with_missing_closest_links
     assert mss.stops_missing_nearest_links() == {"stop_1"}
 
 
+def test_grouped_mean_gives_nan_for_groups_without_values():
+    means = grouped_mean(np.array([0, 0, 2]), np.array([1.0, 3.0, 5.0]), 4)
+
+    np.testing.assert_array_equal(means, [2.0, np.nan, 5.0, np.nan])
+
+
 def test_build_graph_for_maximum_stable_set_problem_with_non_trivial_closest_link_selection_pool(
     assert_semantically_equal, mocker, network, network_spatial_tree
 ):
@@ -379,7 +395,9 @@ def test_build_graph_for_maximum_stable_set_problem_with_non_trivial_closest_lin
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
 
     mss = MaxStableSet(
         pt_graph=network.schedule["bus_service"].graph(),
@@ -473,7 +491,9 @@ def test_build_graph_for_maximum_stable_set_problem_with_no_path_between_isolate
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
 
     network.add_nodes(
         {
@@ -581,7 +601,9 @@ def test_problem_with_distinct_catchments_is_viable(mocker, network, network_spa
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
 
     mss = MaxStableSet(
         pt_graph=network.schedule["bus_service"].graph(),
@@ -609,7 +631,9 @@ def test_problem_with_isolated_catchment_is_not_viable(mocker, network):
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
 
     network.add_nodes(
         {
@@ -664,7 +688,9 @@ def test_problem_with_isolated_catchment_is_partially_viable(mocker, network):
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
 
     network.add_nodes(
         {
@@ -732,10 +758,18 @@ def path_lengths_with_clear_preference(*args, **kwargs):
     return path_lengths[kwargs["source"]][kwargs["target"]]
 
 
+def shortest_path_lengths_with_clear_preference(df_pt_edges, from_col, to_col, weight):
+    df_pt_edges["path_lengths"] = df_pt_edges.apply(
+        lambda x: path_lengths_with_clear_preference(source=x[from_col], target=x[to_col]), axis=1
+    )
+    return df_pt_edges
+
+
+@pytest.mark.parametrize("solver", ["cbc", "scipy", "greedy"])
 def test_solving_problem_with_isolated_catchments(
-    mocker, assert_semantically_equal, network, network_spatial_tree
+    mocker, assert_semantically_equal, network, network_spatial_tree, solver
 ):
-    if not shutil.which("cbc"):
+    if solver == "cbc" and not shutil.which("cbc"):
         pytest.skip("CBC solver not installed")
 
     closest_links = DataFrame(
@@ -761,15 +795,21 @@ def test_solving_problem_with_isolated_catchments(
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
-    mocker.patch.object(nx, "dijkstra_path_length", side_effect=path_lengths_with_clear_preference)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
+    mocker.patch.object(
+        spatial.SpatialTree,
+        "shortest_path_lengths",
+        side_effect=shortest_path_lengths_with_clear_preference,
+    )
 
     mss = MaxStableSet(
         pt_graph=network.schedule["bus_service"].graph(),
         network_spatial_tree=network_spatial_tree,
         modes={"car", "bus"},
     )
-    mss.solve()
+    mss.solve(solver=solver)
 
     assert mss.solution == {
         "stop_1": "link_1_2_bus",
@@ -825,6 +865,109 @@ def test_solving_problem_with_isolated_catchments(
     )
 
 
+@pytest.mark.parametrize("solve", [solve_with_scipy_milp, solve_with_greedy_heuristic])
+def test_array_solvers_pick_heavier_middle_of_a_path(solve):
+    chosen = solve(np.array([1.0, 3.0, 1.0]), np.array([[0, 1], [1, 2]]))
+    assert chosen.tolist() == [1]
+
+
+@pytest.mark.parametrize("solve", [solve_with_scipy_milp, solve_with_greedy_heuristic])
+def test_array_solvers_pick_heavier_ends_of_a_path(solve):
+    chosen = solve(np.array([2.0, 3.0, 2.0]), np.array([[0, 1], [1, 2]]))
+    assert chosen.tolist() == [0, 2]
+
+
+def test_greedy_heuristic_local_search_improves_on_greedy_choice():
+    # greedy picks the centre of the star (weight 5 / degree 3 is best), swapping in leaves (3 * 2) is better
+    chosen = solve_with_greedy_heuristic(
+        np.array([5.0, 2.0, 2.0, 2.0]), np.array([[0, 1], [0, 2], [0, 3]])
+    )
+    assert chosen.tolist() == [1, 2, 3]
+
+
+def test_greedy_heuristic_never_chooses_nodes_in_conflict_with_themselves():
+    chosen = solve_with_greedy_heuristic(np.array([5.0, 1.0]), np.array([[0, 0]]))
+    assert chosen.tolist() == [1]
+
+
+@pytest.mark.parametrize("solver", [solve_with_scipy_milp, solve_with_greedy_heuristic])
+def test_array_solvers_treat_infinite_coefficients_as_largest(solver):
+    coeffs = np.array([np.inf, 1.0, 1.0])
+
+    chosen = solver(coeffs, np.array([[0, 1], [0, 2]]))
+
+    assert chosen.tolist() == [0]
+    assert np.isinf(coeffs[0])
+
+
+def test_pyomo_solvers_are_given_infinite_coefficients_as_they_are(mocker):
+    mocker.patch("genet.max_stable_set.solve_with_pyomo", return_value=np.array([0]))
+    coeffs = np.array([np.inf, 1.0, 1.0])
+    edges = np.array([[0, 1], [0, 2]])
+
+    solve_problem_arrays(coeffs, edges, solver="cbc")
+
+    assert genet.max_stable_set.solve_with_pyomo.call_args.args[0].tolist() == [np.inf, 1.0, 1.0]
+
+
+def test_decomposing_problem_solves_singletons_and_cliques_in_closed_form():
+    coeffs = np.array([1.0, 3.0, 2.0, 1.0, 1.0, 1.0, 1.0])
+    edges = np.array([[0, 1], [1, 2], [2, 0], [1, 0], [4, 5], [6, 5]])
+
+    chosen, components = decompose_problem(coeffs, edges)
+
+    assert sorted(chosen.tolist()) == [1, 3]
+    assert len(components) == 1
+    members, component_coeffs, component_edges = components[0]
+    assert members.tolist() == [4, 5, 6]
+    assert component_coeffs.tolist() == [1.0, 1.0, 1.0]
+    assert component_edges.tolist() == [[0, 1], [1, 2]]
+
+
+def test_decomposing_problem_leaves_nodes_in_conflict_with_themselves_to_the_solver():
+    chosen, components = decompose_problem(np.array([1.0, 2.0]), np.array([[0, 0]]))
+
+    assert chosen.tolist() == [1]
+    assert len(components) == 1
+    assert components[0][0].tolist() == [0]
+    assert components[0][2].tolist() == [[0, 0]]
+
+
+def test_solving_problem_across_processes_gives_the_same_solution(
+    mocker, network, network_spatial_tree
+):
+    closest_links = DataFrame(
+        {
+            "id": {0: "stop_2", 1: "stop_2", 2: "stop_3", 3: "stop_3", 4: "stop_1", 5: "stop_1"},
+            "link_id": {
+                0: "link_4_5_car",
+                1: "link_5_6_car",
+                2: "link_7_8_car",
+                3: "link_8_9_car",
+                4: "link_1_2_car",
+                5: "link_1_2_bus",
+            },
+        }
+    ).set_index("id", drop=False)
+    closest_links.index.rename(name="index", inplace=True)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
+
+    solutions = []
+    for processes in [1, 2]:
+        mss = MaxStableSet(
+            pt_graph=network.schedule["bus_service"].graph(),
+            network_spatial_tree=network_spatial_tree,
+            modes={"car", "bus"},
+        )
+        mss.solve(solver="scipy", processes=processes)
+        solutions.append(mss.solution)
+
+    assert solutions[0] == solutions[1]
+    assert set(solutions[0]) == {"stop_1", "stop_2", "stop_3"}
+
+
 def test_problem_with_isolated_catchment_finds_solution_for_viable_stops(
     assert_semantically_equal, mocker, network
 ):
@@ -844,7 +987,9 @@ def test_problem_with_isolated_catchment_finds_solution_for_viable_stops(
         }
     ).set_index("id", drop=False)
     closest_links.index.rename(name="index", inplace=True)
-    mocker.patch.object(spatial.SpatialTree, "closest_links", return_value=closest_links)
+    mocker.patch.object(
+        spatial.SpatialTree, "closest_links", return_value=closest_links.assign(catchment=10)
+    )
 
     network.add_nodes(
         {
@@ -1,9 +1,11 @@
+import logging
 import shutil
 
 import genet.utils.spatial as spatial
 import networkx as nx
 import pytest
 from genet import MaxStableSet, Route, Schedule, Service, Stop
+from genet.exceptions import RoutingCheckpointError
 from genet.input import read
 from genet.modify import schedule as mod_schedule
 from pandas import DataFrame
@@ -129,10 +131,11 @@ def test_service():
     )
 
 
+@pytest.mark.parametrize("solver", ["cbc", "scipy", "greedy"])
 def test_snapping_pt_route_results_in_all_stops_with_link_references_and_routes_between_them(
-    test_network, test_spatialtree
+    test_network, test_spatialtree, solver
 ):
-    if not shutil.which("cbc"):
+    if solver == "cbc" and not shutil.which("cbc"):
         pytest.skip("CBC solver not installed")
     mss = MaxStableSet(
         pt_graph=test_network.schedule.route("40230_1").graph(),
@@ -142,7 +145,7 @@ def test_snapping_pt_route_results_in_all_stops_with_link_references_and_routes_
         step_size=10,
     )
 
-    mss.solve()
+    mss.solve(solver=solver)
     assert mss.all_stops_solved()
     mss.route_edges()
     assert mss.pt_edges["shortest_path"].notna().all()
@@ -994,3 +997,232 @@ def test_rerouting_with_additional_mode_updates_mode_on_links(test_network, mock
     test_network.reroute("7797_0", additional_modes="car")
     assert test_network.link("new_link")["modes"] == {"car", "bus"}
     assert test_network.link("new_link_2")["modes"] == {"car", "bus"}
+
+
+def test_freshly_read_network_has_no_services_affected_by_changes(test_network):
+    assert test_network.services_affected_by_changes() == set()
+
+
+def test_changing_link_used_by_route_marks_its_service_as_affected(test_network):
+    link_id = test_network.schedule.route("7797_0").network_links[2]
+    test_network.apply_attributes_to_link(link_id, {"freespeed": 1.0})
+
+    assert "7797" in test_network.services_affected_by_changes()
+
+
+def test_removing_link_used_by_route_marks_its_service_as_affected(test_network):
+    link_id = test_network.schedule.route("7797_0").network_links[2]
+    test_network.remove_link(link_id)
+
+    assert "7797" in test_network.services_affected_by_changes()
+
+
+def test_new_link_within_stop_catchment_marks_service_as_affected(test_network):
+    stop = next(test_network.schedule.route("7797_0").stops())
+    test_network.add_nodes(
+        {
+            "new_node_1": {"x": stop.x + 5, "y": stop.y + 5},
+            "new_node_2": {"x": stop.x + 50, "y": stop.y + 50},
+        }
+    )
+    test_network.add_link("new_link", u="new_node_1", v="new_node_2", attribs={"modes": {"bus"}})
+
+    assert "7797" in test_network.services_affected_by_changes(distance_threshold=10)
+
+
+def test_new_link_far_from_stops_does_not_affect_services(test_network):
+    test_network.add_nodes({"far_node_1": {"x": 0, "y": 0}, "far_node_2": {"x": 10, "y": 10}})
+    test_network.add_link("far_link", u="far_node_1", v="far_node_2", attribs={"modes": {"bus"}})
+
+    assert test_network.services_affected_by_changes() == set()
+
+
+def test_incremental_routing_only_routes_affected_services(test_network, mocker):
+    link_id = test_network.schedule.route("7797_0").network_links[2]
+    test_network.apply_attributes_to_link(link_id, {"freespeed": 1.0})
+    affected_services = test_network.services_affected_by_changes()
+    unaffected_routes_before = {
+        route.id: route.network_links
+        for route in test_network.schedule_routes()
+        if test_network.schedule.graph().graph["route_to_service_map"][route.id]
+        not in affected_services
+    }
+    mocker.spy(mod_schedule, "route_pt_graph")
+
+    test_network.route_schedule(incremental=True, solver="scipy")
+
+    assert mod_schedule.route_pt_graph.call_count == len(affected_services)
+    assert {
+        route_id: test_network.schedule.route(route_id).network_links
+        for route_id in unaffected_routes_before
+    } == unaffected_routes_before
+    assert test_network.services_affected_by_changes() == set()
+
+
+def test_incremental_routing_with_no_changes_does_not_route(test_network, mocker):
+    mocker.spy(mod_schedule, "route_pt_graph")
+
+    assert test_network.route_schedule(incremental=True, solver="scipy") == set()
+    mod_schedule.route_pt_graph.assert_not_called()
+
+
+def test_incremental_routing_routes_never_routed_services(mocker):
+    n = read.read_matsim(path_to_network=network_test_file, epsg="epsg:27700")
+    n.schedule = read.read_matsim_schedule(schedule_test_file, "epsg:27700")
+    mocker.spy(mod_schedule, "route_pt_graph")
+
+    n.route_schedule(services=["7797"], incremental=True, solver="scipy")
+
+    assert mod_schedule.route_pt_graph.call_count == 1
+    assert "7797" in n.service_routing_versions
+    assert "7797" not in n.services_affected_by_changes()
+
+
+def test_service_with_stop_missing_link_reference_is_affected(test_network):
+    stop = next(test_network.schedule.route("7797_0").stops())
+    del test_network.schedule._graph.nodes[stop.id]["linkRefId"]
+
+    assert "7797" in test_network.services_affected_by_changes()
+
+
+def test_rerouting_service_brings_it_up_to_date_with_network_changes(test_network):
+    link_id = test_network.schedule.route("7797_0").network_links[2]
+    test_network.apply_attributes_to_link(link_id, {"freespeed": 1.0})
+
+    test_network.reroute("7797")
+
+    assert "7797" not in test_network.services_affected_by_changes()
+
+
+def test_network_fingerprint_does_not_depend_on_order_of_links():
+    n_1 = read.read_matsim(path_to_network=network_test_file, epsg="epsg:27700")
+    n_2 = read.read_matsim(path_to_network=network_test_file, epsg="epsg:27700")
+    link_id = next(iter(n_2.link_id_mapping))
+    link_data = n_2.link(link_id)
+    n_2.remove_link(link_id, silent=True)
+    n_2.add_link(link_id, u=link_data["from"], v=link_data["to"], attribs=link_data, silent=True)
+
+    assert n_1.fingerprint() == n_2.fingerprint()
+
+
+def test_network_fingerprint_changes_with_link_modes(test_network):
+    fingerprint = test_network.fingerprint()
+    link_id = test_network.schedule.route("7797_0").network_links[2]
+
+    test_network.apply_attributes_to_link(link_id, {"modes": {"bike"}})
+
+    assert test_network.fingerprint() != fingerprint
+
+
+def test_routing_schedule_with_checkpoint_saves_each_service(test_network, tmpdir):
+    test_network.route_schedule(solver="scipy", checkpoint_dir=tmpdir)
+
+    checkpoint = mod_schedule.read_routing_checkpoints(
+        tmpdir
+        / read.read_matsim(
+            path_to_network=network_test_file,
+            epsg="epsg:27700",
+            path_to_schedule=schedule_test_file,
+        ).fingerprint()
+    )
+    assert set(checkpoint) == set(test_network.schedule.service_ids())
+    assert all(record["changeset"] is not None for record in checkpoint.values())
+
+
+def test_rerouting_schedule_with_checkpoint_skips_checkpointed_services(
+    test_network, tmpdir, mocker
+):
+    routed_network = read.read_matsim(
+        path_to_network=network_test_file, epsg="epsg:27700", path_to_schedule=schedule_test_file
+    )
+    routed_network.route_schedule(solver="scipy", checkpoint_dir=tmpdir)
+    mocker.spy(mod_schedule, "route_pt_graph")
+
+    assert test_network.route_schedule(solver="scipy", checkpoint_dir=tmpdir) == set()
+
+    mod_schedule.route_pt_graph.assert_not_called()
+    assert {route.id: route.network_links for route in test_network.schedule_routes()} == {
+        route.id: route.network_links for route in routed_network.schedule_routes()
+    }
+
+
+def test_routing_schedule_with_partial_checkpoint_routes_remaining_services(
+    test_network, tmpdir, mocker
+):
+    routed_network = read.read_matsim(
+        path_to_network=network_test_file, epsg="epsg:27700", path_to_schedule=schedule_test_file
+    )
+    routed_network.route_schedule(services=["7797"], solver="scipy", checkpoint_dir=tmpdir)
+    mocker.spy(mod_schedule, "route_pt_graph")
+
+    test_network.route_schedule(solver="scipy", checkpoint_dir=tmpdir)
+
+    assert mod_schedule.route_pt_graph.call_count == len(test_network.schedule) - 1
+    assert test_network.schedule.route("7797_0").network_links == (
+        routed_network.schedule.route("7797_0").network_links
+    )
+
+
+def test_resuming_checkpoint_with_different_parameters_throws_error(test_network, tmpdir):
+    routed_network = read.read_matsim(
+        path_to_network=network_test_file, epsg="epsg:27700", path_to_schedule=schedule_test_file
+    )
+    routed_network.route_schedule(services=["7797"], solver="scipy", checkpoint_dir=tmpdir)
+
+    with pytest.raises(RoutingCheckpointError) as e:
+        test_network.route_schedule(solver="scipy", distance_threshold=50, checkpoint_dir=tmpdir)
+    assert "different" in str(e.value)
+
+
+def test_rerouting_schedule_with_checkpoint_reroutes_services_with_changed_stops(
+    test_network, tmpdir, mocker, caplog
+):
+    routed_network = read.read_matsim(
+        path_to_network=network_test_file, epsg="epsg:27700", path_to_schedule=schedule_test_file
+    )
+    routed_network.route_schedule(services=["7797"], solver="scipy", checkpoint_dir=tmpdir)
+    stop_id = test_network.schedule.route("7797_0").ordered_stops[0]
+    stop = test_network.schedule.stop(stop_id)
+    test_network.schedule.apply_attributes_to_stops({stop_id: {"x": stop.x + 10}})
+    mocker.spy(mod_schedule, "route_pt_graph")
+
+    with caplog.at_level(logging.WARNING):
+        test_network.route_schedule(services=["7797"], solver="scipy", checkpoint_dir=tmpdir)
+
+    assert mod_schedule.route_pt_graph.call_count > 0
+    assert "Skipping routing results of Service `7797`" in caplog.text
+
+
+def test_applying_routing_checkpoint_skips_services_with_changed_routes(
+    test_network, tmpdir, caplog
+):
+    routed_network = read.read_matsim(
+        path_to_network=network_test_file, epsg="epsg:27700", path_to_schedule=schedule_test_file
+    )
+    routed_network.route_schedule(services=["7797"], solver="scipy", checkpoint_dir=tmpdir)
+    test_network.schedule.apply_attributes_to_routes({"7797_0": {"mode": "rail"}})
+    routes_before = {route.id: route.network_links for route in test_network.schedule_routes()}
+
+    with caplog.at_level(logging.WARNING):
+        assert test_network.apply_routing_checkpoint(tmpdir) == set()
+
+    assert "Skipping routing results of Service `7797`" in caplog.text
+    assert {
+        route.id: route.network_links for route in test_network.schedule_routes()
+    } == routes_before
+
+
+def test_applying_routing_checkpoint_updates_checkpointed_services_only(test_network, tmpdir):
+    routed_network = read.read_matsim(
+        path_to_network=network_test_file, epsg="epsg:27700", path_to_schedule=schedule_test_file
+    )
+    routed_network.route_schedule(services=["7797"], solver="scipy", checkpoint_dir=tmpdir)
+    routes_before = {route.id: route.network_links for route in test_network.schedule_routes()}
+
+    assert test_network.apply_routing_checkpoint(tmpdir) == set()
+
+    for route in test_network.schedule_routes():
+        if route.id in test_network.schedule["7797"].route_ids():
+            assert route.network_links == routed_network.schedule.route(route.id).network_links
+        else:
+            assert route.network_links == routes_before[route.id]
@@ -11,6 +11,7 @@ from genet.exceptions import MalformedAdditionalAttributeError
 from genet.input import read
 from genet.output import matsim_xml_writer
 from genet.schedule_elements import read_vehicle_types
+from genet.utils import persistence
 from shapely.geometry import LineString
 
 MATSIM_DATA_DIR = pytest.test_data_dir / "matsim"
@@ -52,6 +53,39 @@ def test_generates_valid_matsim_network_xml_file(
     )
 
 
+@pytest.mark.parametrize(
+    ["compression", "compression_threads", "suffix"],
+    [("gzip", 1, ".gz"), ("gzip", 2, ".gz"), ("zstd", 2, ".zst")],
+)
+def test_compressed_matsim_files_match_uncompressed_outputs_and_read_back(
+    network_object_from_test_data, tmpdir, compression, compression_threads, suffix
+):
+    compressed_dir = os.path.join(tmpdir, "compressed")
+    uncompressed_dir = os.path.join(tmpdir, "uncompressed")
+    network_object_from_test_data.write_to_matsim(
+        compressed_dir, compression=compression, compression_threads=compression_threads
+    )
+    network_object_from_test_data.write_to_matsim(uncompressed_dir)
+
+    for file_name in ["network.xml", "schedule.xml", "vehicles.xml"]:
+        assert not os.path.exists(os.path.join(compressed_dir, file_name))
+        with persistence.open_file(os.path.join(compressed_dir, file_name + suffix)) as f:
+            decompressed = f.read()
+        with open(os.path.join(uncompressed_dir, file_name), "rb") as f:
+            assert decompressed == f.read()
+
+    network = read.read_matsim(
+        path_to_network=os.path.join(compressed_dir, f"network.xml{suffix}"),
+        path_to_schedule=os.path.join(compressed_dir, f"schedule.xml{suffix}"),
+        path_to_vehicles=os.path.join(compressed_dir, f"vehicles.xml{suffix}"),
+        epsg="epsg:27700",
+    )
+    assert set(network.link_id_mapping) == set(network_object_from_test_data.link_id_mapping)
+    assert set(network.schedule.route_ids()) == set(
+        network_object_from_test_data.schedule.route_ids()
+    )
+
+
 def test_network_from_test_osm_data_produces_valid_matsim_network_xml_file(
     full_fat_default_config_path, network_dtd, tmpdir, osm_test_file
 ):
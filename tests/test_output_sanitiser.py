@@ -13,6 +13,16 @@ def test_sanitising_set():
     assert sanitised == "3"
 
 
+def test_encoding_dictionary_for_csv_gives_json():
+    encoded = sanitiser.encode_for_csv({"osm:way:id": {"text": "1"}, "lanes": [1, 2]})
+    assert encoded == '{"osm:way:id": {"text": "1"}, "lanes": [1, 2]}'
+
+
+def test_encoding_dictionary_with_sets_for_csv_gives_python_literal():
+    encoded = sanitiser.encode_for_csv({"osm:way:lanes": {"1"}})
+    assert encoded == "{'osm:way:lanes': {'1'}}"
+
+
 def test_sanitising_geodataframes_with_ids_list(assert_semantically_equal):
     n = Network("epsg:27700")
     n.add_node(
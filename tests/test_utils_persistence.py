@@ -1,5 +1,7 @@
+import gzip
 import os
 
+import pytest
 from genet.utils import persistence
 
 
@@ -130,3 +132,64 @@ def test_zipping_folder(tmpdir):
     persistence.zip_folder(folder)
 
     assert os.path.exists(os.path.join(tmpdir, "folder_to_zip_up.zip"))
+
+
+@pytest.mark.parametrize(
+    ["file_name", "compression"],
+    [("file.xml", None), ("file.xml.gz", "gzip"), ("file.xml.zst", "zstd"), ("file.GZ", "gzip")],
+)
+def test_detecting_compression_from_file_extension(file_name, compression):
+    assert persistence.compression_of(file_name) == compression
+
+
+@pytest.mark.parametrize("file_name", ["file.xml", "file.xml.gz", "file.xml.zst"])
+@pytest.mark.parametrize("compression_threads", [1, 2])
+def test_compressed_files_read_back_what_was_written(tmpdir, file_name, compression_threads):
+    path = os.path.join(tmpdir, file_name)
+    data = b"".join(b"<node id='%d'/>\n" % i for i in range(10000))
+
+    with persistence.open_file(path, "wb", compression_threads=compression_threads) as f:
+        f.write(data)
+    with persistence.open_file(path) as f:
+        assert f.read() == data
+
+
+def test_parallel_gzip_writer_produces_single_valid_gzip_stream_across_many_blocks(tmpdir, mocker):
+    mocker.patch.object(persistence.ParallelGzipWriter, "BLOCK_SIZE", 1000)
+    path = os.path.join(tmpdir, "file.xml.gz")
+    data = b"".join(b"<link id='%d' from='a' to='b'/>\n" % i for i in range(5000))
+
+    with persistence.ParallelGzipWriter(path, compression_level=6, threads=3) as f:
+        for i in range(0, len(data), 777):
+            f.write(data[i : i + 777])
+
+    with gzip.open(path) as f:
+        assert f.read() == data
+    # a single gzip member, much smaller than independently compressed blocks would be
+    with open(path, "rb") as f:
+        assert f.read().count(b"\x1f\x8b\x08") == 1
+    assert os.path.getsize(path) < len(gzip.compress(data[:1000])) * len(data) / 1000
+
+
+def test_parallel_gzip_writer_removes_partial_file_when_compressing_fails(tmpdir, mocker):
+    mocker.patch.object(persistence.ParallelGzipWriter, "BLOCK_SIZE", 1000)
+    mocker.patch.object(persistence, "_deflate_block", side_effect=MemoryError("out of memory"))
+    path = os.path.join(tmpdir, "file.xml.gz")
+
+    with pytest.raises(MemoryError):
+        with persistence.ParallelGzipWriter(path, threads=2) as f:
+            for _ in range(10):
+                f.write(b"x" * 1000)
+
+    assert not os.path.exists(path)
+
+
+def test_parallel_gzip_writer_removes_partial_file_when_writing_is_interrupted(tmpdir):
+    path = os.path.join(tmpdir, "file.xml.gz")
+
+    with pytest.raises(RuntimeError):
+        with persistence.ParallelGzipWriter(path, threads=2) as f:
+            f.write(b"<network>")
+            raise RuntimeError("failed to build the output")
+
+    assert not os.path.exists(path)
@@ -1,5 +1,6 @@
 import genet.utils.simplification as simplification
 import networkx as nx
+import numpy as np
 import pytest
 from shapely.geometry import LineString
 
@@ -40,12 +41,9 @@ def simple_graph_with_junctions():
 
 def test_getting_endpoints_with_simple_graph_with_junctions(simple_graph_with_junctions):
     g = simple_graph_with_junctions
-    endpts = simplification._is_endpoint(
-        {
-            node: {"successors": set(g.successors(node)), "predecessors": set(g.predecessors(node))}
-            for node in g.nodes
-        }
-    )
+    nodes, u, v = simplification._graph_adjacency(g)
+    is_endpoint = simplification._is_endpoint(u, v, len(nodes))
+    endpts = [node for node, endpoint in zip(nodes, is_endpoint) if endpoint]
     assert set(endpts) == {1, 2, 5, 6, 11}
 
 
@@ -94,12 +92,9 @@ def test_getting_endpoints_with_graph_with_junctions_directed_both_ways(
     graph_with_junctions_directed_both_ways_and_loop,
 ):
     g = graph_with_junctions_directed_both_ways_and_loop
-    endpts = simplification._is_endpoint(
-        {
-            node: {"successors": set(g.successors(node)), "predecessors": set(g.predecessors(node))}
-            for node in g.nodes
-        }
-    )
+    nodes, u, v = simplification._graph_adjacency(g)
+    is_endpoint = simplification._is_endpoint(u, v, len(nodes))
+    endpts = [node for node, endpoint in zip(nodes, is_endpoint) if endpoint]
     assert set(endpts) == {1, 2, 5, 6, 11}
 
 
@@ -122,12 +117,9 @@ def graph_with_loop_at_the_end():
 
 def test_getting_endpoints_with_graph_with_loop_at_the_end(graph_with_loop_at_the_end):
     g = graph_with_loop_at_the_end
-    endpts = simplification._is_endpoint(
-        {
-            node: {"successors": set(g.successors(node)), "predecessors": set(g.predecessors(node))}
-            for node in g.nodes
-        }
-    )
+    nodes, u, v = simplification._graph_adjacency(g)
+    is_endpoint = simplification._is_endpoint(u, v, len(nodes))
+    endpts = [node for node, endpoint in zip(nodes, is_endpoint) if endpoint]
     assert set(endpts) == {0, 2, 4}
 
 
@@ -475,44 +467,108 @@ def test_merging_set_attribute_values(assert_semantically_equal):
     )
 
 
+def test_merging_edge_data_of_many_paths_at_once(assert_semantically_equal):
+    node_data = {i: {"x": float(i), "y": 0.0, "s2_id": i} for i in range(1, 6)}
+    links_to_add = simplification._process_path(
+        {
+            "a": {
+                "path": [1, 2, 3],
+                "link_data": {
+                    "id": ["1_2", "2_3"],
+                    "freespeed": [10.0, 20.0],
+                    "capacity": [100.0, 301.0],
+                    "permlanes": [1.0, 2.0],
+                    "length": [1.0, 1.0],
+                    "modes": [{"car"}, {"car", "bus"}],
+                    "oneway": ["1", "1"],
+                    "attributes": [{"osm:way:name": None}, {"osm:way:name": "High Street"}],
+                },
+                "node_data": {i: node_data[i] for i in [1, 2, 3]},
+            },
+            "b": {
+                "path": [3, 4, 5],
+                "link_data": {
+                    "id": ["3_4", "4_5"],
+                    "freespeed": [5.0, 5.0],
+                    "capacity": [50.0, 50.0],
+                    "permlanes": [1.0, 1.0],
+                    "length": [2.0, 3.0],
+                    "modes": [["walk"], ["walk"]],
+                    "oneway": ["1", "0"],
+                },
+                "node_data": {i: node_data[i] for i in [3, 4, 5]},
+            },
+        }
+    )
+
+    assert sorted(links_to_add["b"].pop("oneway")) == ["0", "1"]
+    assert_semantically_equal(
+        links_to_add,
+        {
+            "a": {
+                "id": "a",
+                "ids": ["1_2", "2_3"],
+                "from": 1,
+                "to": 3,
+                "s2_from": 1,
+                "s2_to": 3,
+                "freespeed": 20.0,
+                "capacity": 201,
+                "permlanes": 2,
+                "length": 2.0,
+                "modes": {"car", "bus"},
+                "oneway": "1",
+                "attributes": {"osm:way:name": "High Street"},
+                "geometry": LineString([(1, 0), (2, 0), (3, 0)]),
+            },
+            "b": {
+                "id": "b",
+                "ids": ["3_4", "4_5"],
+                "from": 3,
+                "to": 5,
+                "s2_from": 3,
+                "s2_to": 5,
+                "freespeed": 5.0,
+                "capacity": 50,
+                "permlanes": 1,
+                "length": 5.0,
+                "modes": {"walk"},
+                "geometry": LineString([(3, 0), (4, 0), (5, 0)]),
+            },
+        },
+    )
+
+
+def _build_paths(edges, endpoints):
+    g = nx.MultiDiGraph(edges)
+    nodes, u, v = simplification._graph_adjacency(g)
+    is_endpoint = np.array([node in endpoints for node in nodes])
+    return [[nodes[i] for i in path] for path in simplification._build_paths(u, v, is_endpoint)]
+
+
 def test_building_paths():
-    path_start_points = {(1, 2), (1, 22)}
-    endpoints = {1, 4}
-    neighbours = {1: {2, 22}, 2: {3}, 3: {4}, 4: {}, 22: {33}, 33: {44}, 44: {4}}
-    paths = simplification._build_paths(path_start_points, endpoints, neighbours)
-    assert paths == [[1, 2, 3, 4], [1, 22, 33, 44, 4]]
+    paths = _build_paths(
+        [(1, 2), (2, 3), (3, 4), (1, 22), (22, 33), (33, 44), (44, 4)], endpoints={1, 4}
+    )
+    assert sorted(paths) == [[1, 2, 3, 4], [1, 22, 33, 44, 4]]
 
 
 def test_building_path_for_link_that_is_already_simple_enough():
     # i.e. the from and to nodes are both endpoints
-    path_start_points = {(1, 2)}
-    endpoints = {1, 2}
-    neighbours = {1: {2}, 2: {}}
-    paths = simplification._build_paths(path_start_points, endpoints, neighbours)
+    paths = _build_paths([(1, 2)], endpoints={1, 2})
     assert paths == []
 
 
 def test_building_path_for_loop():
-    path_start_points = {(1, 2)}
-    endpoints = {1}
-    neighbours = {1: {2}, 2: {3}, 3: {4}, 4: {1}}
-    paths = simplification._build_paths(path_start_points, endpoints, neighbours)
+    paths = _build_paths([(1, 2), (2, 3), (3, 4), (4, 1)], endpoints={1})
     assert paths == [[1, 2, 3, 4, 1]]
 
 
 def test_building_path_for_bidirected_links():
-    path_start_points = {(1, 2), (4, 3)}
-    endpoints = {1, 4}
-    neighbours = {1: {2}, 2: {3, 1}, 3: {2, 4}, 4: {3}}
-    paths = simplification._build_paths(path_start_points, endpoints, neighbours)
-    assert paths == [[1, 2, 3, 4], [4, 3, 2, 1]]
-
-
-def test_building_path_throws_error_when_there_is_undetected_branching():
-    # i.e. shouldnt happen as the condition automatically makes anything with more than two neighbours an endpoint but..
-    path_start_points = {(1, 2)}
-    endpoints = {1}
-    neighbours = {1: {2}, 2: {3, 1}, 3: {2, 4, 11}, 4: {3}}
-    with pytest.raises(RuntimeError) as error_info:
-        simplification._build_paths(path_start_points, endpoints, neighbours)
-    assert "branching" in str(error_info.value)
+    paths = _build_paths([(1, 2), (2, 1), (2, 3), (3, 2), (3, 4), (4, 3)], endpoints={1, 4})
+    assert sorted(paths) == [[1, 2, 3, 4], [4, 3, 2, 1]]
+
+
+def test_building_paths_ignores_multi_edges():
+    paths = _build_paths([(1, 2), (1, 2), (2, 3)], endpoints={1, 3})
+    assert paths == [[1, 2, 3]]
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 import s2sphere
 from genet import Network
@@ -214,6 +215,36 @@ def test_splitting_curved_line_with_a_super_close_point_warns_of_closeness(caplo
     )
 
 
+def test_decoding_polylines_in_bulk_matches_decoding_them_one_by_one():
+    polylines = [
+        "ahmyHzvYkCvCuCdDcBrB",
+        "ahmyHzvYGJyBbCGHq@r@EDIJGBu@~@SToAzAEFEDIJ",
+        "ez~hinaBc~sze|`@gx|~W|uo|J",
+    ]
+
+    linestrings = spatial.decode_polylines_to_shapely_linestrings(polylines)
+
+    assert [list(line.coords) for line in linestrings] == [
+        list(spatial.decode_polyline_to_shapely_linestring(_polyline).coords)
+        for _polyline in polylines
+    ]
+
+
+@pytest.mark.parametrize(
+    "polylines", [["??_ibE_ibE", ""], ["??_ibE_ibE", "", "ahmyHzvYkCvCuCdDcBrB"], ["", ""]]
+)
+def test_decoding_empty_polylines_in_bulk_gives_empty_linestrings(polylines):
+    linestrings = spatial.decode_polylines_to_shapely_linestrings(polylines)
+
+    assert [line.wkt for line in linestrings] == [
+        spatial.decode_polyline_to_shapely_linestring(_polyline).wkt for _polyline in polylines
+    ]
+
+
+def test_decoding_no_polylines_in_bulk_gives_empty_array():
+    assert len(spatial.decode_polylines_to_shapely_linestrings([])) == 0
+
+
 def test_compute_average_proximity_to_polyline():
     poly_1 = "ahmyHzvYkCvCuCdDcBrB"
     poly_2 = "ahmyHzvYGJyBbCGHq@r@EDIJGBu@~@SToAzAEFEDIJ"
@@ -243,6 +274,53 @@ def test_reading_geojson_to_shapely():
     ]
 
 
+def test_read_region_reads_bounding_box_to_polygon():
+    region = spatial.read_region((-1.0, 50.0, 1.0, 52.0))
+    assert isinstance(region, Polygon)
+    assert region.bounds == (-1.0, 50.0, 1.0, 52.0)
+
+
+def test_read_region_reads_bounding_box_list_to_polygon():
+    region = spatial.read_region([-1, 50, 1.0, 52.0])
+    assert isinstance(region, Polygon)
+    assert region.bounds == (-1.0, 50.0, 1.0, 52.0)
+
+
+@pytest.mark.parametrize("bbox", [[-1.0, 50.0, 1.0], (-1.0, 50.0, "1.0", 52.0)])
+def test_read_region_with_invalid_bounding_box_raises_error(bbox):
+    with pytest.raises(ValueError, match="4 numbers"):
+        spatial.read_region(bbox)
+
+
+def test_read_region_with_unrecognised_region_type_raises_error():
+    with pytest.raises(TypeError, match="Unrecognised region"):
+        spatial.read_region({"min_lon": -1.0})
+
+
+def test_read_region_reads_geojson_file():
+    region = spatial.read_region(test_geojson)
+    assert region.equals(spatial.read_geojson_to_shapely(test_geojson))
+
+
+def test_read_region_reads_s2_tokens_to_cell_union():
+    region = spatial.read_region("48761ad71,48761ad723")
+    assert isinstance(region, s2sphere.CellUnion)
+    assert len(region.cell_ids()) == 2
+
+
+def test_points_in_region_with_shapely_geometry():
+    in_region = spatial.points_in_region(
+        np.array([0.5, 1.5, 0.0]), np.array([0.5, 0.5, 1.0]), spatial.read_region((0, 0, 1, 1))
+    )
+    assert in_region.tolist() == [True, False, True]
+
+
+def test_points_in_region_with_s2_cell_union():
+    region = spatial.read_region("48761")
+    in_region = spatial.points_in_region(np.array([-0.15, 2.35]), np.array([51.52, 48.86]), region)
+    assert in_region.tolist() == [True, False]
+
+
 def test_s2_hex_to_cell_union():
     hex_area = (
         "48761ad71,48761ad723,48761ad724c,48761ad73c,48761ad744,48761ad75d3,48761ad75d5,48761ad765,48761ad767,"
@@ -419,19 +497,28 @@ def test_SpatialTree_adds_links(assert_semantically_equal, network):
     spatial_tree = spatial.SpatialTree(network)
 
     assert_semantically_equal(
-        list(spatial_tree.edges(data=True)),
-        [
-            ("link_1", "link_2", {"length": 153.0294}),
-            ("link_1", "link_3", {"length": 153.0294}),
-            ("link_2", "link_4", {"length": 78.443}),
-            ("link_3", "link_4", {"length": 78.443}),
-            ("link_4", "link_2", {"length": 78.443}),
-            ("link_4", "link_3", {"length": 78.443}),
-        ],
+        {link_id: spatial_tree.successors(link_id) for link_id in spatial_tree.link_ids},
+        {
+            "link_1": ["link_2", "link_3"],
+            "link_2": ["link_4"],
+            "link_3": ["link_4"],
+            "link_4": ["link_2", "link_3"],
+        },
     )
     assert_semantically_equal(
-        dict(spatial_tree.nodes(data=True)),
-        {"link_1": {}, "link_2": {}, "link_3": {}, "link_4": {}},
+        dict(zip(spatial_tree.link_ids, spatial_tree.lengths)),
+        {"link_1": 153.0294, "link_2": 78.443, "link_3": 78.443, "link_4": 78.443},
+    )
+
+
+def test_SpatialTree_modal_subtree_drops_connections_to_links_of_other_modes(
+    assert_semantically_equal, network
+):
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+
+    assert_semantically_equal(
+        {link_id: spatial_tree.successors(link_id) for link_id in spatial_tree.link_ids},
+        {"link_1": ["link_2"], "link_2": ["link_4"], "link_4": ["link_2"]},
     )
 
 
@@ -630,3 +717,112 @@ def test_SpatialTree_shortest_path_lengths(assert_semantically_equal, network):
             3: {"u": "link_1", "v": "link_4", "path_lengths": 231.4724},
         },
     )
+
+
+def test_SpatialTree_shortest_path_lengths_weighted_by_numeric_link_attribute(network):
+    network.apply_attributes_to_links(
+        {
+            "link_1": {"travel_time": 10},
+            "link_2": {"travel_time": 2.5},
+            "link_4": {"travel_time": 1},
+        }
+    )
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+    df = DataFrame({"u": ["link_1", "link_1"], "v": ["link_2", "link_4"]})
+
+    df = spatial_tree.shortest_path_lengths(df, weight="travel_time")
+    assert df["path_lengths"].tolist() == [10.0, 12.5]
+
+
+def test_SpatialTree_routing_on_missing_link_attribute_raises_error(network):
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+    df = DataFrame({"u": ["link_1"], "v": ["link_2"]})
+
+    with pytest.raises(ValueError, match="`travel_time`"):
+        spatial_tree.shortest_paths(df, weight="travel_time")
+
+
+def test_SpatialTree_routing_on_non_numeric_link_attribute_raises_error(network):
+    network.apply_attributes_to_links({"link_1": {"road_name": "Baker Street"}})
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+    df = DataFrame({"u": ["link_1"], "v": ["link_2"]})
+
+    with pytest.raises(ValueError, match="`road_name`"):
+        spatial_tree.shortest_paths(df, weight="road_name")
+
+
+def test_SpatialTree_closest_links_reports_distances_in_metres(network):
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+    stops = GeoDataFrame(
+        {
+            "id": {0: "stop_10m_to_link_1", 1: "stop_20m_to_link_1"},
+            "geometry": {
+                0: Point(-0.15186089346604492, 51.51950409732838),
+                1: Point(-0.1520233977548685, 51.51952913606585),
+            },
+        },
+        crs=CRS("epsg:4326"),
+    )
+
+    closest_links = spatial_tree.closest_links(stops, 30).set_index("id")
+
+    assert closest_links.loc["stop_10m_to_link_1", "distance"] == pytest.approx(10, abs=1)
+    assert closest_links.loc["stop_20m_to_link_1", "distance"] == pytest.approx(20, abs=1)
+
+
+def test_SpatialTree_closest_links_with_step_size_keeps_links_in_nearest_catchment(
+    assert_semantically_equal, network
+):
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+    stops = GeoDataFrame(
+        {
+            "id": {0: "stop_10m_to_link_1", 1: "stop_15m_to_link_2", 2: "stop_20m_to_link_1"},
+            "geometry": {
+                0: Point(-0.15186089346604492, 51.51950409732838),
+                1: Point(-0.15164747576623197, 51.520660715220636),
+                2: Point(-0.1520233977548685, 51.51952913606585),
+            },
+        },
+        crs=CRS("epsg:4326"),
+    )
+
+    closest_links = spatial_tree.closest_links(stops, 30, step_size=5)
+
+    assert_semantically_equal(
+        closest_links.groupby("id")["catchment"].first().to_dict(),
+        {"stop_10m_to_link_1": 10, "stop_15m_to_link_2": 20, "stop_20m_to_link_1": 25},
+    )
+    assert (closest_links["distance"] <= closest_links["catchment"]).all()
+
+
+def test_SpatialTree_closest_links_with_step_size_leaves_stops_beyond_threshold_without_links(
+    network,
+):
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+    stops = GeoDataFrame(
+        {
+            "id": {0: "stop_20m_to_link_1"},
+            "geometry": {0: Point(-0.1520233977548685, 51.51952913606585)},
+        },
+        crs=CRS("epsg:4326"),
+    )
+
+    closest_links = spatial_tree.closest_links(stops, 10, step_size=5)
+
+    assert closest_links["link_id"].isna().all()
+
+
+def test_SpatialTree_closest_links_without_threshold_finds_nearest_catchment(network):
+    spatial_tree = spatial.SpatialTree(network).modal_subtree(modes="car")
+    stops = GeoDataFrame(
+        {
+            "id": {0: "stop_20m_to_link_1"},
+            "geometry": {0: Point(-0.1520233977548685, 51.51952913606585)},
+        },
+        crs=CRS("epsg:4326"),
+    )
+
+    closest_links = spatial_tree.closest_links(stops, None, step_size=10)
+
+    assert closest_links["link_id"].tolist() == ["link_1"]
+    assert closest_links["catchment"].tolist() == [30]